@@ -17,6 +17,12 @@ class Agenda(models.Model):
     class Meta:
         managed = True
         db_table = 'agenda'
+        indexes = [
+            models.Index(fields=['tenant_id', 'fecha_inicio'], name='agenda_tenant_inicio_idx'),
+            models.Index(fields=['tenant_id', 'user_id', 'fecha_inicio'], name='agenda_tenant_user_inicio_idx'),
+            models.Index(fields=['tenant_id', 'estado'], name='agenda_tenant_estado_idx'),
+            models.Index(fields=['tenant_id', 'created_at'], name='agenda_tenant_created_idx'),
+        ]
 
     def __str__(self):
         return f"{self.titulo} - {self.fecha_inicio}"
\ No newline at end of file
@@ -22,4 +22,32 @@ class AgendaSerializer(serializers.ModelSerializer):
         if fecha_inicio and fecha_fin and fecha_inicio >= fecha_fin:
             raise serializers.ValidationError("La fecha de fin debe ser posterior a la fecha de inicio")
         
+        self.validate_availability(data)
         return data
+    
+    def validate_availability(self, data):
+        """Rechazar citas que se solapan con otra cita activa del mismo usuario."""
+        from .services import AgendaAvailabilityService
+        
+        def valor(campo):
+            if campo in data:
+                return data[campo]
+            return getattr(self.instance, campo, None)
+        
+        fecha_inicio = valor('fecha_inicio')
+        if not fecha_inicio or valor('estado') in AgendaAvailabilityService.ESTADOS_LIBRES:
+            return
+        
+        fecha_fin = valor('fecha_fin')
+        if fecha_fin and fecha_fin - fecha_inicio > AgendaAvailabilityService.max_duration():
+            raise serializers.ValidationError("La cita supera la duración máxima permitida")
+        
+        conflictos = AgendaAvailabilityService.find_conflicts(
+            valor('tenant_id'), valor('user_id'), fecha_inicio, fecha_fin,
+            exclude_id=getattr(self.instance, 'id', None)
+        )
+        if conflictos:
+            raise serializers.ValidationError({
+                'fecha_inicio': "El usuario ya tiene una cita en ese horario",
+                'conflictos': [cita.id for cita in conflictos],
+            })
@@ -0,0 +1,319 @@
+"""
+Servicios para la app de agenda.
+"""
+
+from collections import defaultdict
+from datetime import date, datetime, time, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from .models import Agenda
+from .serializers import AgendaSerializer
+
+
+class AgendaCalendarService:
+    """Calendario de citas por rangos [inicio, fin) con cache por día.
+    
+    Las citas se filtran por rango sobre fecha_inicio (sin DATE()), de modo
+    que la consulta usa el índice (tenant_id, fecha_inicio). Cada día del
+    rango se guarda en cache unos segundos; al navegar solo se consultan
+    los días que no estén en cache, con una única consulta.
+    """
+    
+    CACHE_PREFIX = 'agenda:dia'
+    VISTAS = ('dia', 'semana', 'mes')
+    
+    @staticmethod
+    def get_cache_ttl() -> int:
+        return getattr(settings, 'AGENDA_CALENDAR_CACHE_TTL', 30)
+    
+    @classmethod
+    def cache_key(cls, tenant_id, user_id, dia: date) -> str:
+        return f"{cls.CACHE_PREFIX}:{tenant_id or 'all'}:{user_id or 'all'}:{dia.isoformat()}"
+    
+    @staticmethod
+    def day_start(dia: date) -> datetime:
+        return timezone.make_aware(datetime.combine(dia, time.min))
+    
+    @classmethod
+    def parse_moment(cls, valor: str) -> datetime:
+        """Fecha-hora ISO (o fecha, como inicio del día) en la zona horaria activa."""
+        fecha_hora = parse_datetime(valor)
+        if fecha_hora is None:
+            dia = parse_date(valor)
+            if dia is None:
+                raise ValueError(valor)
+            return cls.day_start(dia)
+        if timezone.is_naive(fecha_hora):
+            fecha_hora = timezone.make_aware(fecha_hora)
+        return fecha_hora
+    
+    @classmethod
+    def view_range(cls, vista: str, fecha: date) -> Tuple[datetime, datetime]:
+        """Rango [inicio, fin) de la vista de día, semana (lunes a lunes) o mes."""
+        if vista == 'semana':
+            inicio = fecha - timedelta(days=fecha.weekday())
+            fin = inicio + timedelta(days=7)
+        elif vista == 'mes':
+            inicio = fecha.replace(day=1)
+            fin = (inicio + timedelta(days=32)).replace(day=1)
+        else:
+            inicio, fin = fecha, fecha + timedelta(days=1)
+        return cls.day_start(inicio), cls.day_start(fin)
+    
+    @staticmethod
+    def get_queryset(tenant_id=None, user_id=None):
+        queryset = Agenda.objects.all()
+        if tenant_id:
+            queryset = queryset.filter(tenant_id=tenant_id)
+        if user_id:
+            queryset = queryset.filter(user_id=user_id)
+        return queryset
+    
+    @classmethod
+    def _load_days(cls, tenant_id, user_id, dias: List[date]) -> Dict[date, List[Dict]]:
+        """Consultar de una vez los días indicados y agruparlos por día."""
+        citas = cls.get_queryset(tenant_id, user_id).filter(
+            fecha_inicio__gte=cls.day_start(min(dias)),
+            fecha_inicio__lt=cls.day_start(max(dias) + timedelta(days=1))
+        ).order_by('fecha_inicio', 'id')
+        
+        buckets = {dia: [] for dia in dias}
+        for cita, data in zip(citas, AgendaSerializer(citas, many=True).data):
+            dia = timezone.localdate(cita.fecha_inicio)
+            if dia in buckets:
+                buckets[dia].append(dict(data))
+        return buckets
+    
+    @classmethod
+    def get_days(cls, tenant_id, user_id, inicio: datetime, fin: datetime) -> Dict[date, List[Dict]]:
+        """Citas por día para todos los días que toca el rango."""
+        primero = timezone.localdate(inicio)
+        ultimo = timezone.localdate(fin - timedelta(microseconds=1))
+        dias = [primero + timedelta(days=n) for n in range((ultimo - primero).days + 1)]
+        
+        claves = {cls.cache_key(tenant_id, user_id, dia): dia for dia in dias}
+        en_cache = cache.get_many(claves.keys())
+        resultado = {claves[clave]: citas for clave, citas in en_cache.items()}
+        
+        faltantes = [dia for dia in dias if dia not in resultado]
+        if faltantes:
+            cargados = cls._load_days(tenant_id, user_id, faltantes)
+            cache.set_many(
+                {cls.cache_key(tenant_id, user_id, dia): citas for dia, citas in cargados.items()},
+                cls.get_cache_ttl()
+            )
+            resultado.update(cargados)
+        return resultado
+    
+    @classmethod
+    def get_calendar(cls, tenant_id, user_id, inicio: datetime, fin: datetime) -> List[Dict]:
+        """Citas del rango [inicio, fin) agrupadas por día."""
+        dias = cls.get_days(tenant_id, user_id, inicio, fin)
+        calendario = []
+        for dia in sorted(dias):
+            citas = [
+                cita for cita in dias[dia]
+                if inicio <= cls._parse(cita['fecha_inicio']) < fin
+            ]
+            calendario.append({'fecha': dia, 'total': len(citas), 'citas': citas})
+        return calendario
+    
+    @staticmethod
+    def _parse(valor) -> datetime:
+        if isinstance(valor, datetime):
+            return valor
+        return datetime.fromisoformat(valor.replace('Z', '+00:00'))
+    
+    @classmethod
+    def invalidate(cls, tenant_id: int, user_id: int, fechas: Iterable[Optional[datetime]]) -> None:
+        """Borrar de la cache los días afectados por una cita."""
+        dias = {timezone.localdate(fecha) for fecha in fechas if fecha}
+        cache.delete_many([
+            cls.cache_key(tenant, user, dia)
+            for dia in dias
+            for tenant in (tenant_id, None)
+            for user in (user_id, None)
+        ])
+
+
+class IntervalTree:
+    """Árbol de intervalos centrado para consultas de solapamiento sobre [inicio, fin).
+    
+    Se construye en O(n log n) y responde qué intervalos se solapan con un
+    rango en O(log n + k).
+    """
+    
+    def __init__(self, intervalos: Iterable[Tuple]):
+        intervalos = [intervalo for intervalo in intervalos if intervalo[0] < intervalo[1]]
+        self.centro = None
+        if not intervalos:
+            return
+        
+        inicios = sorted(intervalo[0] for intervalo in intervalos)
+        self.centro = inicios[len(inicios) // 2]
+        
+        izquierda, derecha, centrados = [], [], []
+        for intervalo in intervalos:
+            if intervalo[1] <= self.centro:
+                izquierda.append(intervalo)
+            elif intervalo[0] > self.centro:
+                derecha.append(intervalo)
+            else:
+                centrados.append(intervalo)
+        
+        self.por_inicio = sorted(centrados, key=lambda intervalo: intervalo[0])
+        self.por_fin = sorted(centrados, key=lambda intervalo: intervalo[1], reverse=True)
+        self.izquierda = IntervalTree(izquierda) if izquierda else None
+        self.derecha = IntervalTree(derecha) if derecha else None
+    
+    def overlaps(self, inicio, fin, primero: bool = False) -> List[Tuple]:
+        """Intervalos que se solapan con [inicio, fin); con primero=True para en el primero."""
+        encontrados = []
+        nodo_pendientes = [self]
+        while nodo_pendientes:
+            nodo = nodo_pendientes.pop()
+            if nodo is None or nodo.centro is None:
+                continue
+            if fin <= nodo.centro:
+                # El rango queda a la izquierda del centro
+                for intervalo in nodo.por_inicio:
+                    if intervalo[0] >= fin:
+                        break
+                    encontrados.append(intervalo)
+                nodo_pendientes.append(nodo.izquierda)
+            elif inicio > nodo.centro:
+                # El rango queda a la derecha del centro
+                for intervalo in nodo.por_fin:
+                    if intervalo[1] <= inicio:
+                        break
+                    encontrados.append(intervalo)
+                nodo_pendientes.append(nodo.derecha)
+            else:
+                # El rango contiene el centro: todos los centrados se solapan
+                encontrados.extend(nodo.por_inicio)
+                nodo_pendientes.append(nodo.izquierda)
+                nodo_pendientes.append(nodo.derecha)
+            if primero and encontrados:
+                return encontrados[:1]
+        return encontrados
+
+
+class AgendaAvailabilityService:
+    """Detección de citas solapadas y búsqueda de horarios libres por usuario."""
+    
+    ESTADOS_LIBRES = ('cancelada',)
+    
+    @staticmethod
+    def default_duration() -> timedelta:
+        return timedelta(minutes=getattr(settings, 'AGENDA_DEFAULT_DURATION_MINUTES', 60))
+    
+    @staticmethod
+    def max_duration() -> timedelta:
+        return timedelta(hours=getattr(settings, 'AGENDA_MAX_DURATION_HOURS', 12))
+    
+    @classmethod
+    def effective_end(cls, inicio: datetime, fin: Optional[datetime]) -> datetime:
+        """Fin de la cita; las citas sin fin duran AGENDA_DEFAULT_DURATION_MINUTES."""
+        return fin or inicio + cls.default_duration()
+    
+    @classmethod
+    def overlapping(cls, tenant_id, user_ids, inicio: datetime, fin: datetime):
+        """Citas activas de los usuarios que se solapan con [inicio, fin).
+        
+        Como ninguna cita dura más de AGENDA_MAX_DURATION_HOURS, basta un rango
+        acotado sobre fecha_inicio, que usa el índice (tenant_id, user_id, fecha_inicio).
+        """
+        queryset = Agenda.objects.filter(
+            fecha_inicio__gt=inicio - cls.max_duration(),
+            fecha_inicio__lt=fin
+        ).filter(
+            Q(fecha_fin__gt=inicio) |
+            Q(fecha_fin__isnull=True, fecha_inicio__gt=inicio - cls.default_duration())
+        ).exclude(estado__in=cls.ESTADOS_LIBRES)
+        if tenant_id:
+            queryset = queryset.filter(tenant_id=tenant_id)
+        if user_ids is not None:
+            queryset = queryset.filter(user_id__in=list(user_ids))
+        return queryset
+    
+    @staticmethod
+    def lock_users(user_ids: Iterable[Optional[int]]) -> None:
+        """Bloquear (SELECT ... FOR UPDATE) las filas de los usuarios en orden de id.
+        
+        Serializa las reservas de un mismo usuario: la segunda espera a que la
+        primera confirme y al revalidar ya ve su cita. Debe llamarse dentro de
+        una transacción.
+        """
+        ids = sorted({user_id for user_id in user_ids if user_id is not None})
+        if ids:
+            list(get_user_model().objects.select_for_update().filter(id__in=ids).order_by('id').values_list('id'))
+    
+    @classmethod
+    def find_conflicts(cls, tenant_id, user_id, inicio: datetime, fin: Optional[datetime],
+                       exclude_id: Optional[int] = None) -> List[Agenda]:
+        """Citas del usuario que chocan con la indicada."""
+        queryset = cls.overlapping(tenant_id, [user_id], inicio, cls.effective_end(inicio, fin))
+        if exclude_id:
+            queryset = queryset.exclude(id=exclude_id)
+        return list(queryset.order_by('fecha_inicio', 'id'))
+    
+    @classmethod
+    def build_trees(cls, tenant_id, user_ids, inicio: datetime, fin: datetime) -> Dict[int, IntervalTree]:
+        """Un árbol de intervalos por usuario con sus citas de la ventana (una consulta)."""
+        intervalos = defaultdict(list)
+        for cita_id, user_id, cita_inicio, cita_fin in cls.overlapping(
+            tenant_id, user_ids, inicio, fin
+        ).values_list('id', 'user_id', 'fecha_inicio', 'fecha_fin'):
+            intervalos[user_id].append((cita_inicio, cls.effective_end(cita_inicio, cita_fin), cita_id))
+        return {user_id: IntervalTree(intervalos.get(user_id, [])) for user_id in user_ids}
+    
+    @staticmethod
+    def staff_ids(tenant_id) -> List[int]:
+        """Usuarios activos del tenant."""
+        usuarios = get_user_model().objects.filter(is_active=True, deleted_at__isnull=True)
+        if tenant_id:
+            usuarios = usuarios.filter(tenant_id=tenant_id)
+        return list(usuarios.order_by('id').values_list('id', flat=True))
+    
+    @staticmethod
+    def _workday(dia: date) -> Tuple[datetime, datetime]:
+        apertura, cierre = getattr(settings, 'AGENDA_WORKDAY', ('09:00', '19:00'))
+        return (
+            timezone.make_aware(datetime.combine(dia, time.fromisoformat(apertura))),
+            timezone.make_aware(datetime.combine(dia, time.fromisoformat(cierre))),
+        )
+    
+    @classmethod
+    def free_slots(cls, tenant_id, user_ids: Optional[List[int]], inicio: datetime, fin: datetime,
+                   duracion: timedelta, limite: int = 20) -> List[Dict]:
+        """Horarios libres de cada usuario dentro de la jornada laboral de la ventana."""
+        if user_ids is None:
+            user_ids = cls.staff_ids(tenant_id)
+        paso = timedelta(minutes=getattr(settings, 'AGENDA_SLOT_STEP_MINUTES', 30))
+        ahora = timezone.now()
+        arboles = cls.build_trees(tenant_id, user_ids, inicio, fin)
+        
+        primero = timezone.localdate(inicio)
+        ultimo = timezone.localdate(fin - timedelta(microseconds=1))
+        dias = [primero + timedelta(days=n) for n in range((ultimo - primero).days + 1)]
+        
+        resultado = []
+        for user_id in user_ids:
+            arbol = arboles[user_id]
+            huecos = []
+            for dia in dias:
+                apertura, cierre = cls._workday(dia)
+                candidato = max(apertura, inicio)
+                while candidato + duracion <= min(cierre, fin) and len(huecos) < limite:
+                    if candidato >= ahora and not arbol.overlaps(candidato, candidato + duracion, primero=True):
+                        huecos.append({'inicio': candidato, 'fin': candidato + duracion})
+                    candidato += paso
+            resultado.append({'user_id': user_id, 'huecos': huecos})
+        return resultado
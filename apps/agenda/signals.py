@@ -0,0 +1,35 @@
+"""
+Señales para la app de agenda.
+
+Invalidan los días del calendario cacheados cuando se crea, modifica
+o elimina una cita.
+"""
+
+from django.db import transaction
+from django.db.models.signals import post_init, post_save, post_delete
+from django.dispatch import receiver
+
+from .models import Agenda
+from .services import AgendaCalendarService
+
+
+@receiver(post_init, sender=Agenda)
+def remember_appointment_slot(sender, instance, **kwargs):
+    """Guardar tenant, usuario y fecha con que se cargó la cita."""
+    instance._slot_original = (instance.tenant_id, instance.user_id, instance.fecha_inicio)
+
+
+@receiver(post_save, sender=Agenda)
+@receiver(post_delete, sender=Agenda)
+def invalidate_calendar_days(sender, instance, **kwargs):
+    """Invalidar el día actual y el anterior de la cita tras el commit."""
+    anterior = instance._slot_original
+    actual = (instance.tenant_id, instance.user_id, instance.fecha_inicio)
+    instance._slot_original = actual
+
+    def _invalidate():
+        AgendaCalendarService.invalidate(actual[0], actual[1], [actual[2]])
+        if anterior != actual and anterior[0] is not None:
+            AgendaCalendarService.invalidate(anterior[0], anterior[1], [anterior[2]])
+
+    transaction.on_commit(_invalidate)
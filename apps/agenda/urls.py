@@ -11,4 +11,5 @@ urlpatterns = [
     path('', views.AppointmentListView.as_view(), name='appointment-list'),
     path('<int:pk>/', views.AppointmentDetailView.as_view(), name='appointment-detail'),
     path('calendar/', views.AppointmentCalendarView.as_view(), name='appointment-calendar'),
+    path('free-slots/', views.AppointmentFreeSlotsView.as_view(), name='appointment-free-slots'),
 ]
@@ -5,39 +5,151 @@ Vistas para la app de agenda.
 from rest_framework import generics, status
 from rest_framework.response import Response
 from rest_framework.views import APIView
+from django.db import transaction
 from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from datetime import timedelta
 from .models import Agenda
 from .serializers import AgendaSerializer
+from .services import AgendaCalendarService, AgendaAvailabilityService
+from apps.tenants.services import get_request_tenant_id
 
 
-class AppointmentListView(generics.ListCreateAPIView):
+class AvailabilityLockMixin:
+    """Guardar citas con el usuario bloqueado, revalidando antes su disponibilidad.
+    
+    Sin el bloqueo dos reservas simultáneas del mismo usuario pasarían ambas
+    la validación del serializer.
+    """
+    
+    def _save_locked(self, serializer):
+        user_ids = [serializer.validated_data.get('user_id', getattr(serializer.instance, 'user_id', None))]
+        if serializer.instance is not None:
+            user_ids.append(serializer.instance.user_id)
+        with transaction.atomic():
+            AgendaAvailabilityService.lock_users(user_ids)
+            serializer.validate_availability(serializer.validated_data)
+            serializer.save()
+    
+    def perform_create(self, serializer):
+        self._save_locked(serializer)
+    
+    def perform_update(self, serializer):
+        self._save_locked(serializer)
+
+
+class AppointmentListView(AvailabilityLockMixin, generics.ListCreateAPIView):
     """Lista y creación de citas."""
     queryset = Agenda.objects.all()
     serializer_class = AgendaSerializer
 
 
-class AppointmentDetailView(generics.RetrieveUpdateDestroyAPIView):
+class AppointmentDetailView(AvailabilityLockMixin, generics.RetrieveUpdateDestroyAPIView):
     """Detalle, actualización y eliminación de citas."""
     queryset = Agenda.objects.all()
     serializer_class = AgendaSerializer
 
 
 class AppointmentCalendarView(APIView):
-    """Citas por fecha."""
+    """Calendario de citas por rango [inicio, fin) o por vista de día, semana o mes.
+    
+    Parámetros: inicio y fin (fecha o fecha-hora ISO), o vista (dia, semana,
+    mes) con fecha de referencia; user_id para filtrar por usuario. Sin
+    parámetros devuelve los próximos 7 días.
+    """
+    
+    MAX_DIAS = 62
+    
+    def get(self, request):
+        params = request.query_params
+        tenant_id = get_request_tenant_id(request)
+        vista = params.get('vista')
+        
+        try:
+            if params.get('inicio') or params.get('fin'):
+                inicio = AgendaCalendarService.parse_moment(params['inicio'])
+                fin = AgendaCalendarService.parse_moment(params['fin'])
+            elif vista or params.get('fecha'):
+                vista = vista or 'dia'
+                if vista not in AgendaCalendarService.VISTAS:
+                    raise ValueError(vista)
+                fecha = parse_date(params['fecha']) if params.get('fecha') else timezone.localdate()
+                if fecha is None:
+                    raise ValueError(params['fecha'])
+                inicio, fin = AgendaCalendarService.view_range(vista, fecha)
+            else:
+                inicio = AgendaCalendarService.day_start(timezone.localdate())
+                fin = inicio + timedelta(days=8)
+            user_id = int(params['user_id']) if params.get('user_id') else None
+        except (KeyError, ValueError):
+            return Response(
+                {'error': 'Parámetros inválidos: use inicio/fin o vista (dia, semana, mes) y fecha, y user_id entero'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        if fin <= inicio or fin - inicio > timedelta(days=self.MAX_DIAS):
+            return Response(
+                {'error': f'El rango debe ser positivo y de como máximo {self.MAX_DIAS} días'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        dias = AgendaCalendarService.get_calendar(tenant_id, user_id, inicio, fin)
+        return Response({
+            'inicio': inicio,
+            'fin': fin,
+            'vista': vista,
+            'total': sum(dia['total'] for dia in dias),
+            'dias': dias,
+        })
+
+
+class AppointmentFreeSlotsView(APIView):
+    """Horarios libres del personal para una duración dada.
+    
+    Parámetros: fecha (día) o vista=semana con fecha, o inicio/fin (máximo
+    7 días); duracion en minutos (por defecto 60); user_id (repetible) para
+    limitar a ciertos usuarios; limite de huecos por usuario.
+    """
+    
+    MAX_DIAS = 7
     
     def get(self, request):
-        fecha = request.query_params.get('fecha')
-        if fecha:
-            appointments = Agenda.objects.filter(fecha_inicio__date=fecha)
-        else:
-            # Si no se especifica fecha, mostrar las próximas 7 días
-            from datetime import timedelta
-            from django.utils import timezone
-            fecha_limite = timezone.now().date() + timedelta(days=7)
-            appointments = Agenda.objects.filter(
-                fecha_inicio__date__lte=fecha_limite,
-                fecha_inicio__date__gte=timezone.now().date()
+        params = request.query_params
+        tenant_id = get_request_tenant_id(request)
+        
+        try:
+            if params.get('inicio') or params.get('fin'):
+                inicio = AgendaCalendarService.parse_moment(params['inicio'])
+                fin = AgendaCalendarService.parse_moment(params['fin'])
+            else:
+                vista = params.get('vista', 'dia')
+                if vista not in ('dia', 'semana'):
+                    raise ValueError(vista)
+                fecha = parse_date(params['fecha']) if params.get('fecha') else timezone.localdate()
+                if fecha is None:
+                    raise ValueError(params['fecha'])
+                inicio, fin = AgendaCalendarService.view_range(vista, fecha)
+            duracion = timedelta(minutes=int(params.get('duracion', 60)))
+            limite = int(params.get('limite', 20))
+            user_ids = [int(user_id) for user_id in params.getlist('user_id')] or None
+        except (KeyError, ValueError):
+            return Response(
+                {'error': 'Parámetros inválidos: use fecha o inicio/fin, duracion (minutos) y user_id'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        if fin <= inicio or fin - inicio > timedelta(days=self.MAX_DIAS) or duracion <= timedelta(0):
+            return Response(
+                {'error': f'La ventana debe ser positiva y de como máximo {self.MAX_DIAS} días'},
+                status=status.HTTP_400_BAD_REQUEST
             )
         
-        serializer = AgendaSerializer(appointments, many=True)
-        return Response(serializer.data)
+        return Response({
+            'inicio': inicio,
+            'fin': fin,
+            'duracion_minutos': int(duracion.total_seconds() // 60),
+            'usuarios': AgendaAvailabilityService.free_slots(
+                tenant_id, user_ids, inicio, fin, duracion, limite=limite
+            ),
+        })
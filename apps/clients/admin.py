@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Cliente
+from .models import Cliente, ClienteBusqueda, ClienteToken
 
 
 @admin.register(Cliente)
@@ -30,3 +30,19 @@ class ClienteAdmin(admin.ModelAdmin):
             'classes': ('collapse',)
         }),
     )
+
+
+@admin.register(ClienteToken)
+class ClienteTokenAdmin(admin.ModelAdmin):
+    list_display = ('id', 'tenant_id', 'cliente_id', 'token', 'peso')
+    search_fields = ('token', 'cliente_id')
+    readonly_fields = ('id',)
+    ordering = ('token',)
+
+
+@admin.register(ClienteBusqueda)
+class ClienteBusquedaAdmin(admin.ModelAdmin):
+    list_display = ('id', 'tenant_id', 'cliente_id', 'telefono')
+    search_fields = ('telefono', 'cliente_id')
+    readonly_fields = ('id', 'updated_at')
+    ordering = ('cliente_id',)
@@ -0,0 +1,22 @@
+"""
+Reconstruye el índice de búsqueda de clientes.
+"""
+
+from django.core.management.base import BaseCommand
+
+from apps.clients.services import ClientSearchService
+
+
+class Command(BaseCommand):
+    help = 'Reconstruye las tablas cliente_token y cliente_busqueda a partir de los clientes.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tenant', type=int, help='Reconstruir solo este tenant')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Clientes por lote')
+
+    def handle(self, *args, **options):
+        total = ClientSearchService.rebuild(
+            tenant_id=options['tenant'],
+            batch_size=options['batch_size']
+        )
+        self.stdout.write(self.style.SUCCESS(f'Índice de búsqueda reconstruido: {total} clientes'))
@@ -19,6 +19,51 @@ class Cliente(models.Model):
     class Meta:
         managed = True
         db_table = 'cliente'
+        indexes = [
+            models.Index(fields=['tenant_id', 'client_type'], name='cliente_tenant_tipo_idx'),
+            models.Index(fields=['tenant_id', 'created_at'], name='cliente_tenant_created_idx'),
+        ]
 
     def __str__(self):
-        return self.name
\ No newline at end of file
+        return self.name
+
+
+class ClienteBusqueda(models.Model):
+    """Teléfono normalizado de cada cliente para búsquedas por prefijo y por terminación."""
+    id = models.AutoField(primary_key=True)
+    tenant_id = models.IntegerField()
+    cliente_id = models.IntegerField(unique=True)
+    telefono = models.CharField(max_length=50, blank=True, null=True)
+    telefono_inverso = models.CharField(max_length=50, blank=True, null=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        managed = True
+        db_table = 'cliente_busqueda'
+        indexes = [
+            models.Index(fields=['tenant_id', 'telefono'], name='cliente_busq_tel_idx'),
+            models.Index(fields=['tenant_id', 'telefono_inverso'], name='cliente_busq_tel_inv_idx'),
+        ]
+
+    def __str__(self):
+        return f"Cliente {self.cliente_id}: {self.telefono}"
+
+
+class ClienteToken(models.Model):
+    """Palabra normalizada (minúsculas, sin acentos) de un cliente con su peso para el ranking."""
+    id = models.AutoField(primary_key=True)
+    tenant_id = models.IntegerField()
+    cliente_id = models.IntegerField()
+    token = models.CharField(max_length=100)
+    peso = models.PositiveSmallIntegerField(default=1)
+
+    class Meta:
+        managed = True
+        db_table = 'cliente_token'
+        unique_together = ('cliente_id', 'token')
+        indexes = [
+            models.Index(fields=['tenant_id', 'token'], name='cliente_token_busq_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.token} -> {self.cliente_id}"
@@ -0,0 +1,210 @@
+"""
+Servicios para la app de clientes.
+"""
+
+import re
+import unicodedata
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from django.db import transaction
+from django.db.models import Case, IntegerField, Value, When
+
+from .models import Cliente, ClienteBusqueda, ClienteToken
+
+
+class ClientSearchService:
+    """Índice de búsqueda de clientes: palabras normalizadas y teléfonos.
+    
+    Las búsquedas usan prefijos sobre columnas indexadas (tenant_id, token) y
+    (tenant_id, telefono), por lo que nunca recorren la tabla de clientes. Se usa
+    istartswith (LIKE 'x%') en lugar de startswith porque en MySQL este último
+    genera LIKE BINARY, que no aprovecha el índice; los valores ya están en minúsculas.
+    """
+    
+    # Peso de cada campo en el ranking
+    PESOS = {
+        'name': 4,
+        'company_name': 3,
+        'contact': 2,
+        'email': 1,
+    }
+    MIN_TERMINO = 2
+    MIN_DIGITOS = 3
+    MAX_CANDIDATOS = 5000
+    PALABRA_RE = re.compile(r'[a-z0-9]+')
+    
+    @staticmethod
+    def normalize(texto: Optional[str]) -> str:
+        """Minúsculas y sin acentos ('Muñoz' -> 'munoz')."""
+        if not texto:
+            return ''
+        descompuesto = unicodedata.normalize('NFKD', texto)
+        return ''.join(c for c in descompuesto if not unicodedata.combining(c)).lower()
+    
+    @staticmethod
+    def digits(texto: Optional[str]) -> str:
+        return re.sub(r'\D', '', texto or '')
+    
+    @classmethod
+    def tokenize(cls, cliente: Cliente) -> Dict[str, int]:
+        """Palabras del cliente con el mayor peso del campo en que aparecen."""
+        tokens = {}
+        for campo, peso in cls.PESOS.items():
+            valor = cls.normalize(getattr(cliente, campo))
+            palabras = cls.PALABRA_RE.findall(valor)
+            if campo == 'email' and valor:
+                palabras.append(valor.strip())
+            for palabra in palabras:
+                palabra = palabra[:100]
+                if len(palabra) >= cls.MIN_TERMINO and tokens.get(palabra, 0) < peso:
+                    tokens[palabra] = peso
+        return tokens
+    
+    @classmethod
+    def index_clients(cls, clientes: Iterable[Cliente]) -> int:
+        """Reemplazar las entradas de índice de los clientes indicados.
+        
+        Los clientes se bloquean y se releen dentro de la transacción: dos
+        reindexaciones simultáneas del mismo cliente se serializan (sin chocar
+        con las claves únicas del índice) y se indexa siempre lo confirmado.
+        Un cliente ya eliminado solo pierde sus entradas.
+        """
+        ids = sorted({cliente.id for cliente in clientes})
+        if not ids:
+            return 0
+        
+        with transaction.atomic():
+            actuales = list(Cliente.objects.select_for_update().filter(id__in=ids).order_by('id'))
+            
+            tokens, telefonos = [], []
+            for cliente in actuales:
+                tokens.extend(
+                    ClienteToken(tenant_id=cliente.tenant_id, cliente_id=cliente.id, token=token, peso=peso)
+                    for token, peso in cls.tokenize(cliente).items()
+                )
+                telefono = cls.digits(cliente.phone) or None
+                telefonos.append(ClienteBusqueda(
+                    tenant_id=cliente.tenant_id,
+                    cliente_id=cliente.id,
+                    telefono=telefono,
+                    telefono_inverso=telefono[::-1] if telefono else None
+                ))
+            
+            ClienteToken.objects.filter(cliente_id__in=ids).delete()
+            ClienteBusqueda.objects.filter(cliente_id__in=ids).delete()
+            ClienteToken.objects.bulk_create(tokens)
+            ClienteBusqueda.objects.bulk_create(telefonos)
+        return len(actuales)
+    
+    @staticmethod
+    def remove_client(cliente_id: int):
+        ClienteToken.objects.filter(cliente_id=cliente_id).delete()
+        ClienteBusqueda.objects.filter(cliente_id=cliente_id).delete()
+    
+    @classmethod
+    def rebuild(cls, tenant_id: Optional[int] = None, batch_size: int = 1000) -> int:
+        """Reconstruir el índice completo (o de un tenant) por lotes de clientes."""
+        clientes = Cliente.objects.order_by('id')
+        tokens = ClienteToken.objects.all()
+        telefonos = ClienteBusqueda.objects.all()
+        if tenant_id:
+            clientes = clientes.filter(tenant_id=tenant_id)
+            tokens = tokens.filter(tenant_id=tenant_id)
+            telefonos = telefonos.filter(tenant_id=tenant_id)
+        tokens.delete()
+        telefonos.delete()
+        
+        total = 0
+        ultimo_id = 0
+        while True:
+            lote = list(clientes.filter(id__gt=ultimo_id)[:batch_size])
+            if not lote:
+                break
+            total += cls.index_clients(lote)
+            ultimo_id = lote[-1].id
+        return total
+    
+    @classmethod
+    def _phone_scores(cls, tenant_id, digitos: str) -> Dict[int, int]:
+        """Coincidencias por prefijo y por terminación del teléfono (3 exacta, 2 prefijo, 1 final)."""
+        telefonos = ClienteBusqueda.objects.all()
+        if tenant_id:
+            telefonos = telefonos.filter(tenant_id=tenant_id)
+        
+        puntuaciones = {}
+        # Ordenado por teléfono (recorriendo el índice): la coincidencia exacta va primero
+        for cliente_id, telefono in telefonos.filter(
+            telefono__istartswith=digitos
+        ).order_by('telefono', 'cliente_id').values_list('cliente_id', 'telefono')[:cls.MAX_CANDIDATOS]:
+            puntuaciones[cliente_id] = 3 if telefono == digitos else 2
+        for cliente_id in telefonos.filter(
+            telefono_inverso__istartswith=digitos[::-1]
+        ).order_by('telefono_inverso', 'cliente_id').values_list('cliente_id', flat=True)[:cls.MAX_CANDIDATOS]:
+            puntuaciones.setdefault(cliente_id, 1)
+        return puntuaciones
+    
+    @classmethod
+    def _text_scores(cls, tenant_id, terminos: List[str]) -> Dict[int, int]:
+        """Suma de pesos por cliente; cada término debe coincidir (AND) como prefijo de una palabra.
+        
+        Una coincidencia exacta de la palabra vale el doble que un prefijo.
+        """
+        # El término más largo suele ser el más selectivo: acota los candidatos
+        terminos = sorted(set(terminos), key=len, reverse=True)
+        candidatos = None
+        puntuaciones = defaultdict(int)
+        
+        for termino in terminos:
+            tokens = ClienteToken.objects.filter(token__istartswith=termino)
+            if tenant_id:
+                tokens = tokens.filter(tenant_id=tenant_id)
+            if candidatos is not None:
+                tokens = tokens.filter(cliente_id__in=candidatos)
+            
+            # Si hay más de MAX_CANDIDATOS coincidencias se conservan las de mayor puntuación
+            tokens = tokens.annotate(
+                exacta=Case(When(token=termino, then=Value(1)), default=Value(0), output_field=IntegerField())
+            ).order_by('-exacta', '-peso', 'cliente_id')
+            
+            mejores = {}
+            for cliente_id, token, peso in tokens.values_list('cliente_id', 'token', 'peso')[:cls.MAX_CANDIDATOS]:
+                valor = peso * 2 if token == termino else peso
+                if valor > mejores.get(cliente_id, 0):
+                    mejores[cliente_id] = valor
+            
+            candidatos = list(mejores)
+            if not candidatos:
+                return {}
+            for cliente_id, valor in mejores.items():
+                puntuaciones[cliente_id] += valor
+        
+        return {cliente_id: puntuaciones[cliente_id] for cliente_id in candidatos}
+    
+    @classmethod
+    def rank(cls, query: str, tenant_id: Optional[int] = None, limite: int = 20) -> List[Tuple[int, int]]:
+        """Pares (cliente_id, puntuación) que coinciden con la búsqueda, de mayor a menor relevancia."""
+        normalizada = cls.normalize(query).strip()
+        digitos = cls.digits(normalizada)
+        
+        if digitos and len(digitos) >= cls.MIN_DIGITOS and not re.search(r'[a-z@]', normalizada):
+            puntuaciones = cls._phone_scores(tenant_id, digitos)
+        else:
+            terminos = [
+                termino for termino in (
+                    [normalizada] if '@' in normalizada else cls.PALABRA_RE.findall(normalizada)
+                )
+                if len(termino) >= cls.MIN_TERMINO
+            ]
+            puntuaciones = cls._text_scores(tenant_id, terminos) if terminos else {}
+        
+        return sorted(puntuaciones.items(), key=lambda item: (-item[1], item[0]))[:limite]
+    
+    @classmethod
+    def search(cls, query: str, tenant_id: Optional[int] = None, limite: int = 20) -> List[Cliente]:
+        """Clientes que coinciden con la búsqueda, ordenados por relevancia."""
+        ranking = cls.rank(query, tenant_id, limite)
+        if not ranking:
+            return []
+        clientes = Cliente.objects.in_bulk([cliente_id for cliente_id, _ in ranking])
+        return [clientes[cliente_id] for cliente_id, _ in ranking if cliente_id in clientes]
@@ -0,0 +1,25 @@
+"""
+Señales para la app de clientes.
+
+Mantienen el índice de búsqueda al crear, modificar o eliminar un cliente.
+"""
+
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .models import Cliente
+from .services import ClientSearchService
+
+
+@receiver(post_save, sender=Cliente)
+def index_client(sender, instance, **kwargs):
+    """Reindexar el cliente tras el commit."""
+    transaction.on_commit(lambda: ClientSearchService.index_clients([instance]))
+
+
+@receiver(post_delete, sender=Cliente)
+def unindex_client(sender, instance, **kwargs):
+    """Quitar el cliente del índice tras el commit."""
+    cliente_id = instance.id
+    transaction.on_commit(lambda: ClientSearchService.remove_client(cliente_id))
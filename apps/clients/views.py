@@ -5,9 +5,10 @@ Vistas para la app de clientes.
 from rest_framework import generics, status
 from rest_framework.response import Response
 from rest_framework.views import APIView
-from django.db.models import Q
+from apps.tenants.services import get_request_tenant_id
 from .models import Cliente
 from .serializers import ClienteSerializer
+from .services import ClientSearchService
 
 
 class ClientListView(generics.ListCreateAPIView):
@@ -23,26 +24,29 @@ class ClientDetailView(generics.RetrieveUpdateDestroyAPIView):
 
 
 class ClientSearchView(APIView):
-    """Búsqueda de clientes."""
+    """Búsqueda de clientes por nombre, empresa, contacto, email o teléfono.
     
-    def get(self, request):
-        query = request.query_params.get('q', '')
-        if query:
-            clients = Cliente.objects.filter(
-                Q(name__icontains=query) | 
-                Q(email__icontains=query) |
-                Q(phone__icontains=query) |
-                Q(company_name__icontains=query)
-            )[:20]
-            serializer = ClienteSerializer(clients, many=True)
-            return Response(serializer.data)
-        return Response([])
-
-
-class SchoolListView(APIView):
-    """Lista de colegios (clientes tipo empresa)."""
+    Usa el índice de búsqueda (palabras sin acentos por prefijo y teléfono
+    por prefijo o terminación) y devuelve los resultados por relevancia.
+    """
+    
+    MAX_LIMITE = 50
     
     def get(self, request):
-        schools = Cliente.objects.filter(client_type='empresa')
-        serializer = ClienteSerializer(schools, many=True)
+        query = request.query_params.get('q', '')
+        if not query:
+            return Response([])
+        try:
+            limite = min(int(request.query_params.get('limite', 20)), self.MAX_LIMITE)
+        except ValueError:
+            return Response({'error': 'limite debe ser un número'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        clients = ClientSearchService.search(query, tenant_id=get_request_tenant_id(request), limite=limite)
+        serializer = ClienteSerializer(clients, many=True)
         return Response(serializer.data)
+
+
+class SchoolListView(generics.ListAPIView):
+    """Lista de colegios (clientes tipo empresa)."""
+    queryset = Cliente.objects.filter(client_type='empresa')
+    serializer_class = ClienteSerializer
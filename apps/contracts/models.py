@@ -17,6 +17,12 @@ class Contrato(models.Model):
     class Meta:
         managed = True
         db_table = 'contrato'
+        indexes = [
+            models.Index(fields=['tenant_id', 'estado'], name='contrato_tenant_estado_idx'),
+            models.Index(fields=['tenant_id', 'fecha_inicio'], name='contrato_tenant_inicio_idx'),
+            models.Index(fields=['cliente_id'], name='contrato_cliente_idx'),
+            models.Index(fields=['tenant_id', 'created_at'], name='contrato_tenant_created_idx'),
+        ]
 
     def __str__(self):
         return f"Contrato {self.id} - {self.fecha_inicio}"
\ No newline at end of file
@@ -2,6 +2,7 @@ from django.contrib import admin
 from django.contrib.admin import AdminSite
 from django.http import HttpResponseRedirect
 from django.urls import reverse
+from .models import ResumenDiarioPedidos
 
 
 class DashboardAdminSite(AdminSite):
@@ -16,3 +17,12 @@ class DashboardAdminSite(AdminSite):
 
 # Registrar el sitio de admin personalizado
 dashboard_admin = DashboardAdminSite(name='dashboard_admin')
+
+
+@admin.register(ResumenDiarioPedidos)
+class ResumenDiarioPedidosAdmin(admin.ModelAdmin):
+    list_display = ('tenant_id', 'fecha', 'total_pedidos', 'ingresos', 'updated_at')
+    list_filter = ('fecha',)
+    search_fields = ('tenant_id',)
+    readonly_fields = ('id', 'updated_at')
+    ordering = ('-fecha',)
@@ -0,0 +1,74 @@
+"""
+Compara la latencia del cálculo de métricas del dashboard sync y async.
+"""
+
+import asyncio
+import statistics
+import time
+from collections import defaultdict
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.dashboard.services import DashboardMetricsService
+
+
+class Command(BaseCommand):
+    help = ('Mide compute_metrics (consultas en serie) frente a acompute_metrics '
+            '(consultas concurrentes) sin pasar por la cache.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tenant', type=int, help='Tenant a medir (por defecto todos)')
+        parser.add_argument('--iterations', type=int, default=20, help='Repeticiones por modo')
+        parser.add_argument('--warmup', type=int, default=2, help='Repeticiones descartadas al inicio')
+
+    @staticmethod
+    def _resumen(tiempos):
+        ordenados = sorted(tiempos)
+        p95 = ordenados[min(len(ordenados) - 1, int(len(ordenados) * 0.95))]
+        return (f'media {statistics.mean(tiempos) * 1000:8.2f} ms  '
+                f'p50 {statistics.median(tiempos) * 1000:8.2f} ms  '
+                f'p95 {p95 * 1000:8.2f} ms')
+
+    def _sync(self, tenant_id, repeticiones, por_consulta):
+        tiempos = []
+        for _ in range(repeticiones):
+            inicio = time.perf_counter()
+            for funcion, args in DashboardMetricsService._queries(tenant_id):
+                inicio_consulta = time.perf_counter()
+                funcion(*args)
+                por_consulta[funcion.__name__].append(time.perf_counter() - inicio_consulta)
+            tiempos.append(time.perf_counter() - inicio)
+        return tiempos
+
+    async def _async(self, tenant_id, repeticiones):
+        tiempos = []
+        for _ in range(repeticiones):
+            inicio = time.perf_counter()
+            await DashboardMetricsService.acompute_metrics(tenant_id)
+            tiempos.append(time.perf_counter() - inicio)
+        return tiempos
+
+    def handle(self, *args, **options):
+        if options['iterations'] < 1:
+            raise CommandError('--iterations debe ser mayor que cero')
+        tenant_id = options['tenant']
+        warmup = options['warmup']
+        repeticiones = options['iterations']
+
+        self._sync(tenant_id, warmup, defaultdict(list))
+        asyncio.run(self._async(tenant_id, warmup))
+
+        por_consulta = defaultdict(list)
+        sync = self._sync(tenant_id, repeticiones, por_consulta)
+        concurrente = asyncio.run(self._async(tenant_id, repeticiones))
+
+        self.stdout.write(f'Métricas del dashboard, {repeticiones} repeticiones (tenant: {tenant_id or "todos"})')
+        for nombre, tiempos in por_consulta.items():
+            self.stdout.write(f'  consulta {nombre:<22} {self._resumen(tiempos)}')
+        mas_lenta = max(statistics.mean(tiempos) for tiempos in por_consulta.values())
+        self.stdout.write(f'  sync  (en serie)              {self._resumen(sync)}')
+        self.stdout.write(f'  async (concurrente)           {self._resumen(concurrente)}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Consulta más lenta: {mas_lenta * 1000:.2f} ms; '
+            f'async/sync: {statistics.mean(concurrente) / statistics.mean(sync):.2f}'
+        ))
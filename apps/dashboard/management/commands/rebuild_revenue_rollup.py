@@ -0,0 +1,39 @@
+"""
+Reconstruye el resumen diario de pedidos a partir del histórico.
+"""
+
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.dashboard.services import DashboardMetricsService, RevenueRollupService
+
+
+class Command(BaseCommand):
+    help = 'Reconstruye la tabla resumen_diario_pedidos en bloques de días.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tenant', type=int, help='Reconstruir solo este tenant')
+        parser.add_argument('--desde', help='Fecha inicial (YYYY-MM-DD); por defecto el primer pedido')
+        parser.add_argument('--hasta', help='Fecha final (YYYY-MM-DD); por defecto hoy')
+        parser.add_argument('--chunk-days', type=int, default=30, help='Días procesados por bloque')
+
+    def handle(self, *args, **options):
+        try:
+            desde = date.fromisoformat(options['desde']) if options['desde'] else None
+            hasta = date.fromisoformat(options['hasta']) if options['hasta'] else None
+        except ValueError as e:
+            raise CommandError(f'Fecha inválida: {e}')
+
+        if options['chunk_days'] < 1:
+            raise CommandError('--chunk-days debe ser mayor que cero')
+
+        filas = RevenueRollupService.rebuild(
+            tenant_id=options['tenant'],
+            desde=desde,
+            hasta=hasta,
+            chunk_days=options['chunk_days']
+        )
+        DashboardMetricsService.invalidate(options['tenant'])
+
+        self.stdout.write(self.style.SUCCESS(f'Resumen diario reconstruido: {filas} filas'))
@@ -1,3 +1,27 @@
 from django.db import models
 
 # Create your models here.
+
+class ResumenDiarioPedidos(models.Model):
+    """Resumen diario de pedidos por tenant (rollup para dashboard)."""
+    id = models.AutoField(primary_key=True)
+    tenant_id = models.IntegerField()
+    fecha = models.DateField()
+    total_pedidos = models.IntegerField(default=0)
+    ingresos = models.DecimalField(max_digits=14, decimal_places=2, default=0.00)
+    pedidos_pendiente = models.IntegerField(default=0)
+    pedidos_en_proceso = models.IntegerField(default=0)
+    pedidos_entregado = models.IntegerField(default=0)
+    pedidos_cancelado = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        managed = True
+        db_table = 'resumen_diario_pedidos'
+        unique_together = ('tenant_id', 'fecha')
+        indexes = [
+            models.Index(fields=['fecha'], name='resumen_diario_fecha_idx'),
+        ]
+
+    def __str__(self):
+        return f"Resumen {self.fecha} - tenant {self.tenant_id}"
@@ -0,0 +1,306 @@
+"""
+Servicios para la app de dashboard.
+"""
+
+import asyncio
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db import close_old_connections, transaction
+from django.db.models import Count, Sum, Q, Exists, OuterRef
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+from datetime import date, datetime, time, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from apps.orders.models import Pedido
+from apps.clients.models import Cliente
+from apps.contracts.models import Contrato
+from apps.agenda.models import Agenda
+from .models import ResumenDiarioPedidos
+
+
+ESTADOS_PEDIDO = [estado for estado, _ in Pedido._meta.get_field('estado').choices]
+TIPOS_CLIENTE = [tipo for tipo, _ in Cliente._meta.get_field('client_type').choices]
+
+
+class DashboardMetricsService:
+    """Servicio que calcula todas las métricas del dashboard en pocas consultas."""
+
+    CACHE_PREFIX = 'dashboard:metrics'
+
+    @classmethod
+    def get_cache_ttl(cls) -> int:
+        """Tiempo de vida (segundos) de las métricas cacheadas."""
+        return getattr(settings, 'DASHBOARD_CACHE_TTL', 10)
+
+    @classmethod
+    def cache_key(cls, tenant_id: Optional[int] = None) -> str:
+        """Clave de cache por tenant ('all' cuando no se filtra por tenant)."""
+        return f"{cls.CACHE_PREFIX}:{tenant_id if tenant_id else 'all'}"
+
+    @classmethod
+    def invalidate(cls, tenant_id: Optional[int] = None):
+        """Invalidar las métricas del tenant y las globales."""
+        keys = [cls.cache_key(None)]
+        if tenant_id:
+            keys.append(cls.cache_key(tenant_id))
+        cache.delete_many(keys)
+
+    @classmethod
+    def get_metrics(cls, tenant_id: Optional[int] = None) -> Dict:
+        """Obtener métricas desde cache o calcularlas si expiraron."""
+        key = cls.cache_key(tenant_id)
+        metrics = cache.get(key)
+        if metrics is None:
+            metrics = cls.compute_metrics(tenant_id)
+            cache.set(key, metrics, cls.get_cache_ttl())
+        return metrics
+
+    @staticmethod
+    def _scope(queryset, tenant_id: Optional[int]):
+        if tenant_id:
+            queryset = queryset.filter(tenant_id=tenant_id)
+        return queryset
+
+    @classmethod
+    def _order_metrics(cls, tenant_id: Optional[int], hoy: date) -> Dict:
+        """Pedidos: se leen del resumen diario para no recorrer la tabla de pedidos."""
+        pedidos_agg = {
+            'cantidad': Sum('total_pedidos'),
+            'mes': Sum('total_pedidos', filter=Q(fecha__gte=hoy.replace(day=1))),
+            'ultimos_30_dias': Sum('total_pedidos', filter=Q(fecha__gt=hoy - timedelta(days=30))),
+            'ingresos_total': Sum('ingresos'),
+            'ingresos_mes': Sum('ingresos', filter=Q(fecha__gte=hoy.replace(day=1))),
+            'ingresos_semana': Sum('ingresos', filter=Q(fecha__gt=hoy - timedelta(days=7))),
+        }
+        for estado in ESTADOS_PEDIDO:
+            pedidos_agg[f'estado_{estado}'] = Sum(f'pedidos_{estado}')
+        return {
+            key: value or 0
+            for key, value in cls._scope(ResumenDiarioPedidos.objects.all(), tenant_id).aggregate(**pedidos_agg).items()
+        }
+
+    @classmethod
+    def _client_metrics(cls, tenant_id: Optional[int], mes_actual: datetime) -> Dict:
+        """Clientes: totales, tipos, nuevos del mes y activos (con pedidos)."""
+        con_pedidos = cls._scope(Pedido.objects.filter(cliente_id=OuterRef('id')), tenant_id)
+        clientes_agg = {
+            'cantidad': Count('id'),
+            'nuevos_mes': Count('id', filter=Q(created_at__gte=mes_actual)),
+            'activos': Count('id', filter=Q(Exists(con_pedidos))),
+        }
+        for tipo in TIPOS_CLIENTE:
+            clientes_agg[f'tipo_{tipo}'] = Count('id', filter=Q(client_type=tipo))
+        return cls._scope(Cliente.objects.all(), tenant_id).aggregate(**clientes_agg)
+
+    @classmethod
+    def _contract_metrics(cls, tenant_id: Optional[int]) -> Dict:
+        return cls._scope(Contrato.objects.all(), tenant_id).aggregate(cantidad=Count('id'))
+
+    @classmethod
+    def _appointment_metrics(cls, tenant_id: Optional[int], inicio_hoy: datetime) -> Dict:
+        return cls._scope(Agenda.objects.all(), tenant_id).aggregate(
+            cantidad=Count('id'),
+            hoy=Count('id', filter=Q(fecha_inicio__gte=inicio_hoy, fecha_inicio__lt=inicio_hoy + timedelta(days=1))),
+        )
+
+    @classmethod
+    def _queries(cls, tenant_id: Optional[int]) -> List[Tuple]:
+        """Consultas independientes (una por tabla) como pares (función, argumentos)."""
+        ahora = timezone.localtime()
+        mes_actual = ahora.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+        inicio_hoy = ahora.replace(hour=0, minute=0, second=0, microsecond=0)
+        return [
+            (cls._order_metrics, (tenant_id, ahora.date())),
+            (cls._client_metrics, (tenant_id, mes_actual)),
+            (cls._contract_metrics, (tenant_id,)),
+            (cls._appointment_metrics, (tenant_id, inicio_hoy)),
+        ]
+
+    @classmethod
+    def compute_metrics(cls, tenant_id: Optional[int] = None) -> Dict:
+        """Calcular métricas con una consulta de agregados condicionales por tabla."""
+        return cls._assemble(*[funcion(*args) for funcion, args in cls._queries(tenant_id)])
+
+    @staticmethod
+    def _run_in_thread(funcion, args):
+        """Ejecutar una consulta en un hilo del pool, con su propia conexión."""
+        try:
+            return funcion(*args)
+        finally:
+            close_old_connections()
+
+    @classmethod
+    async def acompute_metrics(cls, tenant_id: Optional[int] = None) -> Dict:
+        """Versión async: las consultas por tabla se ejecutan a la vez en hilos distintos.
+        
+        Cada hilo usa su propia conexión, así que la latencia total se acerca a la
+        de la consulta más lenta en lugar de a la suma.
+        """
+        resultados = await asyncio.gather(*[
+            sync_to_async(cls._run_in_thread, thread_sensitive=False)(funcion, args)
+            for funcion, args in cls._queries(tenant_id)
+        ])
+        return cls._assemble(*resultados)
+
+    @classmethod
+    async def aget_metrics(cls, tenant_id: Optional[int] = None) -> Dict:
+        """Versión async de get_metrics."""
+        key = cls.cache_key(tenant_id)
+        metrics = await cache.aget(key)
+        if metrics is None:
+            metrics = await cls.acompute_metrics(tenant_id)
+            await cache.aset(key, metrics, cls.get_cache_ttl())
+        return metrics
+
+    @staticmethod
+    def _assemble(pedidos: Dict, clientes: Dict, contratos: Dict, citas: Dict) -> Dict:
+        pedidos_por_estado = [
+            {'estado': estado, 'count': pedidos[f'estado_{estado}']}
+            for estado in sorted(ESTADOS_PEDIDO) if pedidos[f'estado_{estado}']
+        ]
+        clientes_por_tipo = [
+            {'client_type': tipo, 'count': clientes[f'tipo_{tipo}']}
+            for tipo in sorted(TIPOS_CLIENTE) if clientes[f'tipo_{tipo}']
+        ]
+
+        return {
+            'totales': {
+                'pedidos': pedidos['cantidad'],
+                'clientes': clientes['cantidad'],
+                'contratos': contratos['cantidad'],
+                'citas': citas['cantidad'],
+            },
+            'pedidos_por_estado': pedidos_por_estado,
+            'clientes_por_tipo': clientes_por_tipo,
+            'metricas_mes': {
+                'pedidos_mes_actual': pedidos['mes'],
+                'citas_hoy': citas['hoy'],
+            },
+            'pedidos': {
+                'pedidos_por_estado': pedidos_por_estado,
+                'pedidos_ultimos_30_dias': pedidos['ultimos_30_dias'],
+                'total_ingresos': float(pedidos['ingresos_total'] or 0),
+            },
+            'clientes': {
+                'clientes_por_tipo': clientes_por_tipo,
+                'clientes_activos': clientes['activos'],
+                'nuevos_clientes_mes': clientes['nuevos_mes'],
+            },
+            'ingresos': {
+                'total_ingresos': float(pedidos['ingresos_total'] or 0),
+                'ingresos_mes_actual': float(pedidos['ingresos_mes'] or 0),
+                'ingresos_ultima_semana': float(pedidos['ingresos_semana'] or 0),
+            },
+        }
+
+
+class RevenueRollupService:
+    """Servicio para mantener el resumen diario de pedidos por tenant."""
+
+    @staticmethod
+    def _day_bounds(fecha: date):
+        inicio = timezone.make_aware(datetime.combine(fecha, time.min))
+        return inicio, inicio + timedelta(days=1)
+
+    @staticmethod
+    def _aggregates() -> Dict:
+        agg = {
+            'total_pedidos': Count('id'),
+            'ingresos': Sum('total'),
+        }
+        for estado in ESTADOS_PEDIDO:
+            agg[f'pedidos_{estado}'] = Count('id', filter=Q(estado=estado))
+        return agg
+
+    @classmethod
+    def refresh_day(cls, tenant_id: int, fecha: date) -> Optional[ResumenDiarioPedidos]:
+        """Recalcular el resumen de un día de un tenant a partir de sus pedidos.
+        
+        La fila del día se crea si falta y se bloquea antes de agregar, así dos
+        recálculos concurrentes del mismo día se serializan y el último en
+        escribir ve todos los pedidos confirmados.
+        """
+        inicio, fin = cls._day_bounds(fecha)
+        with transaction.atomic():
+            # Lectura con bloqueo primero: con REPEATABLE READ la instantánea del
+            # agregado se toma después de obtener el bloqueo
+            resumen, _ = ResumenDiarioPedidos.objects.select_for_update().get_or_create(
+                tenant_id=tenant_id, fecha=fecha
+            )
+            
+            valores = Pedido.objects.filter(
+                tenant_id=tenant_id,
+                created_at__gte=inicio,
+                created_at__lt=fin
+            ).aggregate(**cls._aggregates())
+            
+            if not valores['total_pedidos']:
+                resumen.delete()
+                return None
+            
+            valores['ingresos'] = valores['ingresos'] or 0
+            for campo, valor in valores.items():
+                setattr(resumen, campo, valor)
+            resumen.save()
+        return resumen
+
+    @classmethod
+    def refresh_for_order(cls, pedido: Pedido):
+        """Recalcular el día al que pertenece un pedido."""
+        fecha = timezone.localdate(pedido.created_at) if pedido.created_at else timezone.localdate()
+        cls.refresh_day(pedido.tenant_id, fecha)
+
+    @classmethod
+    def rebuild(cls, tenant_id: Optional[int] = None, desde: Optional[date] = None,
+                hasta: Optional[date] = None, chunk_days: int = 30) -> int:
+        """Reconstruir el resumen desde el histórico en bloques de días."""
+        pedidos = Pedido.objects.all()
+        resumenes = ResumenDiarioPedidos.objects.all()
+        if tenant_id:
+            pedidos = pedidos.filter(tenant_id=tenant_id)
+            resumenes = resumenes.filter(tenant_id=tenant_id)
+
+        if desde is None:
+            primero = pedidos.order_by('created_at').values_list('created_at', flat=True).first()
+            if primero is None:
+                resumenes.delete()
+                return 0
+            desde = timezone.localdate(primero)
+        hasta = hasta or timezone.localdate()
+
+        filas = 0
+        inicio_bloque = desde
+        while inicio_bloque <= hasta:
+            fin_bloque = min(inicio_bloque + timedelta(days=chunk_days), hasta + timedelta(days=1))
+            inicio, _ = cls._day_bounds(inicio_bloque)
+            fin, _ = cls._day_bounds(fin_bloque)
+
+            agrupado = pedidos.filter(
+                created_at__gte=inicio,
+                created_at__lt=fin
+            ).annotate(
+                dia=TruncDate('created_at')
+            ).values('tenant_id', 'dia').annotate(**cls._aggregates()).order_by()
+
+            nuevos = [
+                ResumenDiarioPedidos(
+                    tenant_id=fila['tenant_id'],
+                    fecha=fila['dia'],
+                    total_pedidos=fila['total_pedidos'],
+                    ingresos=fila['ingresos'] or 0,
+                    **{f'pedidos_{estado}': fila[f'pedidos_{estado}'] for estado in ESTADOS_PEDIDO}
+                )
+                for fila in agrupado
+            ]
+
+            with transaction.atomic():
+                resumenes.filter(fecha__gte=inicio_bloque, fecha__lt=fin_bloque).delete()
+                ResumenDiarioPedidos.objects.bulk_create(nuevos, batch_size=1000)
+
+            filas += len(nuevos)
+            inicio_bloque = fin_bloque
+
+        return filas
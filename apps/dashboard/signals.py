@@ -0,0 +1,38 @@
+"""
+Señales para la app de dashboard.
+
+Mantienen el resumen diario de pedidos e invalidan las métricas
+cacheadas cuando cambian los datos de negocio.
+"""
+
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from apps.orders.models import Pedido
+from apps.clients.models import Cliente
+from apps.contracts.models import Contrato
+from apps.agenda.models import Agenda
+from .services import DashboardMetricsService, RevenueRollupService
+
+
+@receiver(post_save, sender=Pedido)
+@receiver(post_delete, sender=Pedido)
+def refresh_revenue_rollup(sender, instance, **kwargs):
+    """Recalcular el día del pedido y luego invalidar las métricas."""
+    def _refresh():
+        RevenueRollupService.refresh_for_order(instance)
+        DashboardMetricsService.invalidate(instance.tenant_id)
+
+    transaction.on_commit(_refresh)
+
+
+@receiver(post_save, sender=Cliente)
+@receiver(post_delete, sender=Cliente)
+@receiver(post_save, sender=Contrato)
+@receiver(post_delete, sender=Contrato)
+@receiver(post_save, sender=Agenda)
+@receiver(post_delete, sender=Agenda)
+def invalidate_dashboard_metrics(sender, instance, **kwargs):
+    """Invalidar métricas del tenant afectado."""
+    transaction.on_commit(lambda: DashboardMetricsService.invalidate(instance.tenant_id))
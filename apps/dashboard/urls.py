@@ -12,4 +12,10 @@ urlpatterns = [
     path('orders/', views.DashboardOrdersView.as_view(), name='dashboard-orders'),
     path('clients/', views.DashboardClientsView.as_view(), name='dashboard-clients'),
     path('revenue/', views.DashboardRevenueView.as_view(), name='dashboard-revenue'),
+    
+    # Versiones async (ASGI)
+    path('async/', views.dashboard_async, name='dashboard-async'),
+    path('async/orders/', views.dashboard_orders_async, name='dashboard-orders-async'),
+    path('async/clients/', views.dashboard_clients_async, name='dashboard-clients-async'),
+    path('async/revenue/', views.dashboard_revenue_async, name='dashboard-revenue-async'),
 ]
@@ -2,7 +2,8 @@ from django.contrib import admin
 from .models import (
     Inventario, Varilla, PinturaAcabado, MaterialImpresion, 
     MaterialRecordatorio, SoftwareEquipo, MaterialPintura, 
-    MaterialDiseno, ProductoTerminado, MovimientoInventario
+    MaterialDiseno, ProductoTerminado, MovimientoInventario, AlertaStock,
+    ActividadMaterial, LoteMaterial, CalendarioVencimiento, AsientoInventario, SnapshotStock
 )
 
 
@@ -94,3 +95,64 @@ class MovimientoInventarioAdmin(admin.ModelAdmin):
     search_fields = ('varilla_id', 'motivo', 'usuario')
     readonly_fields = ('id', 'fecha', 'created_at')
     ordering = ('-fecha',)
+
+
+@admin.register(AlertaStock)
+class AlertaStockAdmin(admin.ModelAdmin):
+    list_display = ('id', 'item_type', 'item_id', 'nombre', 'stock_actual', 'stock_minimo', 'diferencia', 'fecha_alerta')
+    list_filter = ('item_type', 'fecha_alerta')
+    search_fields = ('nombre', 'item_type', 'item_id')
+    readonly_fields = ('id', 'fecha_alerta', 'updated_at')
+    ordering = ('diferencia',)
+
+
+@admin.register(ActividadMaterial)
+class ActividadMaterialAdmin(admin.ModelAdmin):
+    list_display = ('id', 'tenant_id', 'item_type', 'item_id', 'ultimo_movimiento')
+    list_filter = ('item_type',)
+    search_fields = ('item_type', 'item_id')
+    readonly_fields = ('id', 'updated_at')
+    ordering = ('ultimo_movimiento',)
+
+
+@admin.register(LoteMaterial)
+class LoteMaterialAdmin(admin.ModelAdmin):
+    list_display = ('id', 'tenant_id', 'item_type', 'item_id', 'codigo', 'cantidad', 'fecha_vencimiento')
+    list_filter = ('item_type', 'fecha_vencimiento')
+    search_fields = ('codigo', 'item_type', 'item_id')
+    readonly_fields = ('id', 'created_at', 'updated_at')
+    ordering = ('fecha_vencimiento',)
+
+
+@admin.register(CalendarioVencimiento)
+class CalendarioVencimientoAdmin(admin.ModelAdmin):
+    list_display = ('id', 'tenant_id', 'fecha', 'item_type', 'item_id', 'nombre', 'cantidad', 'lotes')
+    list_filter = ('item_type', 'fecha')
+    search_fields = ('nombre', 'item_type', 'item_id')
+    readonly_fields = ('id', 'updated_at')
+    ordering = ('fecha',)
+
+
+@admin.register(AsientoInventario)
+class AsientoInventarioAdmin(admin.ModelAdmin):
+    list_display = ('id', 'tenant_id', 'item_type', 'item_id', 'tipo', 'cantidad', 'delta', 'fecha', 'usuario')
+    list_filter = ('item_type', 'tipo', 'fecha')
+    search_fields = ('item_type', 'item_id', 'motivo', 'usuario')
+    readonly_fields = ('id', 'created_at')
+    ordering = ('-fecha',)
+    
+    # El libro es de solo inserción
+    def has_change_permission(self, request, obj=None):
+        return False
+    
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(SnapshotStock)
+class SnapshotStockAdmin(admin.ModelAdmin):
+    list_display = ('id', 'tenant_id', 'fecha', 'item_type', 'item_id', 'stock')
+    list_filter = ('item_type', 'fecha')
+    search_fields = ('item_type', 'item_id')
+    readonly_fields = ('id', 'created_at')
+    ordering = ('-fecha',)
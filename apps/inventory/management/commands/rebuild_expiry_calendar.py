@@ -0,0 +1,22 @@
+"""
+Reconstruye el calendario de vencimientos desde los lotes de materiales.
+"""
+
+from django.core.management.base import BaseCommand
+
+from apps.inventory.services import StockAlertService
+
+
+class Command(BaseCommand):
+    help = 'Reconstruye la tabla calendario_vencimiento a partir de lote_material.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tenant', type=int, help='Reconstruir solo este tenant')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Filas por lote')
+
+    def handle(self, *args, **options):
+        total = StockAlertService.rebuild_expiry_calendar(
+            tenant_id=options['tenant'],
+            batch_size=options['batch_size']
+        )
+        self.stdout.write(self.style.SUCCESS(f'Calendario de vencimientos reconstruido: {total} entradas'))
@@ -0,0 +1,22 @@
+"""
+Reconstruye la fecha del último movimiento de cada material.
+"""
+
+from django.core.management.base import BaseCommand
+
+from apps.inventory.services import StockAlertService
+
+
+class Command(BaseCommand):
+    help = 'Reconstruye la tabla actividad_material a partir del histórico de movimientos.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tenant', type=int, help='Reconstruir solo este tenant')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Filas por lote')
+
+    def handle(self, *args, **options):
+        total = StockAlertService.rebuild_activity_index(
+            tenant_id=options['tenant'],
+            batch_size=options['batch_size']
+        )
+        self.stdout.write(self.style.SUCCESS(f'Actividad de materiales reconstruida: {total} materiales'))
@@ -0,0 +1,22 @@
+"""
+Reconstruye el índice de alertas de stock bajo desde las tablas de materiales.
+"""
+
+from django.core.management.base import BaseCommand
+
+from apps.inventory.services import StockAlertService
+
+
+class Command(BaseCommand):
+    help = 'Reconstruye la tabla alerta_stock a partir del stock actual.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tenant', type=int, help='Reconstruir solo este tenant')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Filas por lote')
+
+    def handle(self, *args, **options):
+        total = StockAlertService.rebuild_low_stock_index(
+            tenant_id=options['tenant'],
+            batch_size=options['batch_size']
+        )
+        self.stdout.write(self.style.SUCCESS(f'Índice de alertas reconstruido: {total} alertas'))
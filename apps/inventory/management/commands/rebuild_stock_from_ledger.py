@@ -0,0 +1,26 @@
+"""
+Deriva el stock de los materiales desde el libro de inventario.
+"""
+
+from django.core.management.base import BaseCommand
+
+from apps.inventory.services import InventoryLedgerService
+
+
+class Command(BaseCommand):
+    help = ('Crea el asiento inicial de los materiales que aún no están en el libro '
+            'y corrige el campo stock de los que no coinciden con el libro.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tenant', type=int, help='Solo este tenant')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Materiales por lote')
+
+    def handle(self, *args, **options):
+        iniciales = InventoryLedgerService.bootstrap(
+            tenant_id=options['tenant'],
+            batch_size=options['batch_size']
+        )
+        corregidos = InventoryLedgerService.derive_counters(tenant_id=options['tenant'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Libro de inventario: {iniciales} asientos iniciales, {corregidos} contadores corregidos'
+        ))
@@ -0,0 +1,36 @@
+"""
+Guarda un snapshot del stock de todos los materiales desde el libro de inventario.
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from apps.inventory.services import InventoryLedgerService
+
+
+class Command(BaseCommand):
+    help = ('Guarda en snapshot_stock el stock de cada material a la fecha de corte. '
+            'Programarlo periódicamente (p. ej. a diario) acota los asientos a sumar '
+            'en las consultas de stock a una fecha.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tenant', type=int, help='Solo este tenant')
+        parser.add_argument('--fecha', help='Fecha-hora de corte ISO; por defecto ahora menos INVENTORY_SNAPSHOT_DELAY')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Filas por INSERT')
+
+    def handle(self, *args, **options):
+        fecha = None
+        if options['fecha']:
+            fecha = parse_datetime(options['fecha'])
+            if fecha is None:
+                raise CommandError('Fecha inválida')
+            if timezone.is_naive(fecha):
+                fecha = timezone.make_aware(fecha)
+
+        total = InventoryLedgerService.take_snapshot(
+            tenant_id=options['tenant'],
+            fecha=fecha,
+            batch_size=options['batch_size']
+        )
+        self.stdout.write(self.style.SUCCESS(f'Snapshot de stock guardado: {total} materiales'))
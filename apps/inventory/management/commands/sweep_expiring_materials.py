@@ -0,0 +1,23 @@
+"""
+Resume por tenant los materiales vencidos o por vencer (pensado para cron).
+"""
+
+from django.core.management.base import BaseCommand
+
+from apps.inventory.services import StockAlertService
+
+
+class Command(BaseCommand):
+    help = 'Muestra por tenant cuántos materiales vencen en los próximos días.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dias', type=int, default=30, help='Días hacia adelante')
+
+    def handle(self, *args, **options):
+        resumen = StockAlertService.sweep_expiring(options['dias'])
+        for tenant_id, fila in resumen.items():
+            self.stdout.write(
+                f"Tenant {tenant_id}: {fila['vencidos']} vencidos, "
+                f"{fila['por_vencer']} por vencer ({fila['cantidad']} unidades)"
+            )
+        self.stdout.write(self.style.SUCCESS(f'{len(resumen)} tenants con vencimientos'))
@@ -1,4 +1,5 @@
-from django.db import models
+from django.db import models, router, transaction
+from django.utils import timezone
 from django.core.exceptions import ValidationError
 
 class Inventario(models.Model):
@@ -25,6 +26,9 @@ class Inventario(models.Model):
     class Meta:
         managed = True
         db_table = 'inventario'
+        indexes = [
+            models.Index(fields=['tenant_id', 'item_type', 'item_id'], name='inventario_tenant_item_idx'),
+        ]
 
     def __str__(self):
         return f"{self.item_type} - ID: {self.item_id}"
@@ -35,7 +39,21 @@ class Inventario(models.Model):
         return self.stock_actual <= self.stock_minimo
 
 
-class Varilla(models.Model):
+class StockEditMixin:
+    """Guarda cada edición directa del material en su propia transacción.
+
+    La señal pre_save lee con bloqueo el stock anterior dentro de esa
+    transacción, así el asiento de ajuste del libro recoge la diferencia
+    exacta aunque haya ajustes concurrentes del servicio de inventario.
+    """
+
+    def save(self, *args, **kwargs):
+        using = kwargs.get('using') or router.db_for_write(type(self), instance=self)
+        with transaction.atomic(using=using):
+            super().save(*args, **kwargs)
+
+
+class Varilla(StockEditMixin, models.Model):
     """Modelo para varillas y molduras de enmarcado."""
     id = models.AutoField(primary_key=True)
     tenant_id = models.IntegerField()
@@ -51,6 +69,9 @@ class Varilla(models.Model):
     class Meta:
         managed = True
         db_table = 'varilla'
+        indexes = [
+            models.Index(fields=['tenant_id', 'stock', 'minimo'], name='varilla_tenant_stock_idx'),
+        ]
 
     def __str__(self):
         return f"{self.nombre} - {self.longitud}"
@@ -72,7 +93,7 @@ class Varilla(models.Model):
         return self.precio
 
 
-class PinturaAcabado(models.Model):
+class PinturaAcabado(StockEditMixin, models.Model):
     """Modelo para pinturas y acabados de enmarcado."""
     id = models.AutoField(primary_key=True)
     tenant_id = models.IntegerField()
@@ -88,6 +109,9 @@ class PinturaAcabado(models.Model):
     class Meta:
         managed = True
         db_table = 'inventory_pintura_acabado'
+        indexes = [
+            models.Index(fields=['tenant_id', 'stock', 'minimo'], name='inv_pintura_acab_stock_idx'),
+        ]
 
     def __str__(self):
         return f"{self.nombre} - {self.tipo}"
@@ -109,7 +133,7 @@ class PinturaAcabado(models.Model):
         return self.precio
 
 
-class MaterialImpresion(models.Model):
+class MaterialImpresion(StockEditMixin, models.Model):
     """Modelo para materiales de impresión (minilab)."""
     id = models.AutoField(primary_key=True)
     tenant_id = models.IntegerField()
@@ -125,6 +149,9 @@ class MaterialImpresion(models.Model):
     class Meta:
         managed = True
         db_table = 'inventory_material_impresion'
+        indexes = [
+            models.Index(fields=['tenant_id', 'stock', 'minimo'], name='inv_mat_impresion_stock_idx'),
+        ]
 
     def __str__(self):
         return f"{self.nombre} - {self.tipo}"
@@ -146,7 +173,7 @@ class MaterialImpresion(models.Model):
         return self.precio
 
 
-class MaterialRecordatorio(models.Model):
+class MaterialRecordatorio(StockEditMixin, models.Model):
     """Modelo para materiales de recordatorio (escolares)."""
     id = models.AutoField(primary_key=True)
     tenant_id = models.IntegerField()
@@ -162,6 +189,9 @@ class MaterialRecordatorio(models.Model):
     class Meta:
         managed = True
         db_table = 'inventory_material_recordatorio'
+        indexes = [
+            models.Index(fields=['tenant_id', 'stock', 'minimo'], name='inv_mat_record_stock_idx'),
+        ]
 
     def __str__(self):
         return f"{self.nombre} - {self.tipo}"
@@ -183,7 +213,7 @@ class MaterialRecordatorio(models.Model):
         return self.precio
 
 
-class SoftwareEquipo(models.Model):
+class SoftwareEquipo(StockEditMixin, models.Model):
     """Modelo para software y equipos (restauración digital)."""
     id = models.AutoField(primary_key=True)
     tenant_id = models.IntegerField()
@@ -199,6 +229,9 @@ class SoftwareEquipo(models.Model):
     class Meta:
         managed = True
         db_table = 'inventory_software_equipo'
+        indexes = [
+            models.Index(fields=['tenant_id', 'stock', 'minimo'], name='inv_software_stock_idx'),
+        ]
 
     def __str__(self):
         return f"{self.nombre} - {self.tipo}"
@@ -220,7 +253,7 @@ class SoftwareEquipo(models.Model):
         return self.precio
 
 
-class MaterialPintura(models.Model):
+class MaterialPintura(StockEditMixin, models.Model):
     """Modelo para materiales de pintura al óleo."""
     id = models.AutoField(primary_key=True)
     tenant_id = models.IntegerField()
@@ -236,6 +269,9 @@ class MaterialPintura(models.Model):
     class Meta:
         managed = True
         db_table = 'inventory_material_pintura'
+        indexes = [
+            models.Index(fields=['tenant_id', 'stock', 'minimo'], name='inv_mat_pintura_stock_idx'),
+        ]
 
     def __str__(self):
         return f"{self.nombre} - {self.tipo}"
@@ -257,7 +293,7 @@ class MaterialPintura(models.Model):
         return self.precio
 
 
-class MaterialDiseno(models.Model):
+class MaterialDiseno(StockEditMixin, models.Model):
     """Modelo para materiales de diseño (edición gráfica)."""
     id = models.AutoField(primary_key=True)
     tenant_id = models.IntegerField()
@@ -273,6 +309,9 @@ class MaterialDiseno(models.Model):
     class Meta:
         managed = True
         db_table = 'inventory_material_diseno'
+        indexes = [
+            models.Index(fields=['tenant_id', 'stock', 'minimo'], name='inv_mat_diseno_stock_idx'),
+        ]
 
     def __str__(self):
         return f"{self.nombre} - {self.tipo}"
@@ -317,6 +356,9 @@ class ProductoTerminado(models.Model):
     class Meta:
         managed = True
         db_table = 'inventory_producto_terminado'
+        indexes = [
+            models.Index(fields=['tenant_id', 'estado'], name='inv_producto_estado_idx'),
+        ]
 
     def __str__(self):
         return f"{self.nombre} - {self.estado}"
@@ -344,6 +386,191 @@ class MovimientoInventario(models.Model):
     class Meta:
         managed = True
         db_table = 'movimiento_inventario'
+        indexes = [
+            models.Index(fields=['tenant_id', 'varilla_id', 'fecha'], name='mov_inv_varilla_fecha_idx'),
+            models.Index(fields=['tenant_id', 'fecha'], name='mov_inv_tenant_fecha_idx'),
+            models.Index(fields=['tenant_id', 'created_at'], name='mov_inv_tenant_created_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.tipo} - {self.cantidad} varilla_id:{self.varilla_id}"
+
+class AlertaStock(models.Model):
+    """Índice desnormalizado de materiales con stock bajo (stock <= mínimo)."""
+    id = models.AutoField(primary_key=True)
+    tenant_id = models.IntegerField()
+    item_type = models.CharField(max_length=25)
+    item_id = models.IntegerField()
+    nombre = models.CharField(max_length=100)
+    stock_actual = models.IntegerField()
+    stock_minimo = models.IntegerField()
+    diferencia = models.IntegerField()
+    fecha_alerta = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        managed = True
+        db_table = 'alerta_stock'
+        unique_together = ('item_type', 'item_id')
+        indexes = [
+            models.Index(fields=['tenant_id', 'diferencia', 'id'], name='alerta_stock_tenant_dif_idx'),
+            models.Index(fields=['diferencia', 'id'], name='alerta_stock_dif_idx'),
+        ]
+
+    def __str__(self):
+        return f"Alerta {self.item_type} - ID: {self.item_id}"
+
+
+class ActividadMaterial(models.Model):
+    """Fecha del último movimiento de cada material (o de su alta si nunca se movió)."""
+    id = models.AutoField(primary_key=True)
+    tenant_id = models.IntegerField()
+    item_type = models.CharField(max_length=25)
+    item_id = models.IntegerField()
+    ultimo_movimiento = models.DateTimeField()
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        managed = True
+        db_table = 'actividad_material'
+        unique_together = ('item_type', 'item_id')
+        indexes = [
+            models.Index(fields=['tenant_id', 'ultimo_movimiento', 'id'], name='actividad_tenant_ultimo_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.item_type} {self.item_id} - {self.ultimo_movimiento}"
+
+
+class LoteMaterial(models.Model):
+    """Lote de un material con fecha de vencimiento (insumos, licencias, etc.)."""
+    id = models.AutoField(primary_key=True)
+    tenant_id = models.IntegerField()
+    item_type = models.CharField(max_length=25)
+    item_id = models.IntegerField()
+    codigo = models.CharField(max_length=50, blank=True, null=True)
+    cantidad = models.IntegerField(default=0)
+    fecha_vencimiento = models.DateField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        managed = True
+        db_table = 'lote_material'
+        indexes = [
+            models.Index(fields=['tenant_id', 'fecha_vencimiento'], name='lote_tenant_vencimiento_idx'),
+            models.Index(fields=['item_type', 'item_id'], name='lote_item_idx'),
+        ]
+
+    def __str__(self):
+        return f"Lote {self.codigo or self.id} - {self.item_type} {self.item_id}"
+
+
+class CalendarioVencimiento(models.Model):
+    """Calendario precalculado de vencimientos: cantidad que vence por material y día."""
+    id = models.AutoField(primary_key=True)
+    tenant_id = models.IntegerField()
+    fecha = models.DateField()
+    item_type = models.CharField(max_length=25)
+    item_id = models.IntegerField()
+    nombre = models.CharField(max_length=100)
+    cantidad = models.IntegerField(default=0)
+    lotes = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        managed = True
+        db_table = 'calendario_vencimiento'
+        unique_together = ('tenant_id', 'fecha', 'item_type', 'item_id')
+        indexes = [
+            models.Index(fields=['item_type', 'item_id'], name='calendario_item_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.fecha} - {self.item_type} {self.item_id} ({self.cantidad})"
+
+
+class LibroInventarioError(Exception):
+    """Intento de modificar o borrar asientos del libro de inventario."""
+
+
+class AsientoInventarioQuerySet(models.QuerySet):
+    """QuerySet de solo inserción: los asientos no se actualizan ni se borran."""
+
+    def update(self, **kwargs):
+        raise LibroInventarioError("El libro de inventario es de solo inserción")
+
+    def delete(self):
+        raise LibroInventarioError("El libro de inventario es de solo inserción")
+
+
+class AsientoInventario(models.Model):
+    """Asiento del libro de inventario (solo inserción) para todos los tipos de material.
+    
+    ``delta`` es la variación de stock que produce el asiento; ``cantidad`` es
+    la cantidad informada (una merma registra cantidad pero no descuenta stock).
+    """
+    id = models.BigAutoField(primary_key=True)
+    tenant_id = models.IntegerField()
+    item_type = models.CharField(max_length=25)
+    item_id = models.IntegerField()
+    tipo = models.CharField(max_length=20, choices=[
+        ('inicial', 'Inicial'),
+        ('entrada', 'Entrada'),
+        ('salida', 'Salida'),
+        ('ajuste', 'Ajuste'),
+        ('transferencia', 'Transferencia'),
+        ('merma', 'Merma'),
+        ('uso_produccion', 'Uso en Producción')
+    ])
+    cantidad = models.IntegerField()
+    delta = models.IntegerField()
+    motivo = models.CharField(max_length=255, blank=True, null=True)
+    orden_produccion_id = models.IntegerField(blank=True, null=True)
+    usuario = models.CharField(max_length=100, blank=True, null=True)
+    fecha = models.DateTimeField(default=timezone.now)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    objects = AsientoInventarioQuerySet.as_manager()
+
+    class Meta:
+        managed = True
+        db_table = 'asiento_inventario'
+        indexes = [
+            models.Index(fields=['tenant_id', 'item_type', 'item_id', 'fecha'], name='asiento_item_fecha_idx'),
+            models.Index(fields=['tenant_id', 'fecha'], name='asiento_tenant_fecha_idx'),
+            models.Index(fields=['tenant_id', 'created_at'], name='asiento_tenant_created_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            raise LibroInventarioError("El libro de inventario es de solo inserción")
+        super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        raise LibroInventarioError("El libro de inventario es de solo inserción")
+
+    def __str__(self):
+        return f"{self.tipo} {self.delta:+d} - {self.item_type} {self.item_id}"
+
+
+class SnapshotStock(models.Model):
+    """Stock de cada material a una fecha de corte, calculado desde el libro de inventario."""
+    id = models.AutoField(primary_key=True)
+    tenant_id = models.IntegerField()
+    item_type = models.CharField(max_length=25)
+    item_id = models.IntegerField()
+    fecha = models.DateTimeField()
+    stock = models.IntegerField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        managed = True
+        db_table = 'snapshot_stock'
+        unique_together = ('tenant_id', 'item_type', 'item_id', 'fecha')
+        indexes = [
+            models.Index(fields=['tenant_id', 'fecha'], name='snapshot_tenant_fecha_idx'),
+        ]
 
     def __str__(self):
-        return f"{self.tipo} - {self.cantidad} varilla_id:{self.varilla_id}"
\ No newline at end of file
+        return f"{self.item_type} {self.item_id} @ {self.fecha}: {self.stock}"
@@ -6,7 +6,7 @@ from rest_framework import serializers
 from .models import (
     Inventario, Varilla, PinturaAcabado, MaterialImpresion, 
     MaterialRecordatorio, SoftwareEquipo, MaterialPintura, 
-    MaterialDiseno, ProductoTerminado, MovimientoInventario
+    MaterialDiseno, ProductoTerminado, MovimientoInventario, LoteMaterial, AsientoInventario
 )
 
 
@@ -299,6 +299,44 @@ class StockAlertSerializer(serializers.Serializer):
     fecha_alerta = serializers.DateTimeField()
 
 
+class LoteMaterialSerializer(serializers.ModelSerializer):
+    """Serializer para lotes de materiales con vencimiento."""
+    
+    class Meta:
+        model = LoteMaterial
+        fields = [
+            'id', 'tenant_id', 'item_type', 'item_id', 'codigo', 'cantidad',
+            'fecha_vencimiento', 'created_at', 'updated_at'
+        ]
+        read_only_fields = ('id', 'created_at', 'updated_at')
+        extra_kwargs = {
+            'tenant_id': {'required': False, 'default': 1},
+        }
+
+
+class ExpiringMaterialSerializer(serializers.Serializer):
+    """Serializer para materiales próximos a vencer."""
+    item_type = serializers.CharField()
+    item_id = serializers.IntegerField()
+    nombre = serializers.CharField()
+    fecha_vencimiento = serializers.DateField()
+    cantidad = serializers.IntegerField()
+    lotes = serializers.IntegerField()
+    dias_restantes = serializers.IntegerField()
+    tipo_alerta = serializers.CharField()
+
+
+class InactiveMaterialSerializer(serializers.Serializer):
+    """Serializer para materiales sin movimiento."""
+    item_type = serializers.CharField()
+    item_id = serializers.IntegerField()
+    nombre = serializers.CharField()
+    stock_actual = serializers.IntegerField()
+    ultimo_movimiento = serializers.DateTimeField()
+    dias_inactivo = serializers.IntegerField()
+    tipo_alerta = serializers.CharField()
+
+
 class StockReportSerializer(serializers.Serializer):
     """Serializer para reportes de stock."""
     categoria = serializers.CharField()
@@ -306,3 +344,20 @@ class StockReportSerializer(serializers.Serializer):
     items_stock_bajo = serializers.IntegerField()
     valor_total = serializers.DecimalField(max_digits=15, decimal_places=2)
     porcentaje_stock_bajo = serializers.DecimalField(max_digits=5, decimal_places=2)
+
+
+class AsientoInventarioSerializer(serializers.ModelSerializer):
+    """Serializer (solo lectura) para asientos del libro de inventario."""
+    
+    class Meta:
+        model = AsientoInventario
+        fields = '__all__'
+        read_only_fields = [field.name for field in AsientoInventario._meta.fields]
+
+
+class StockAtDateSerializer(serializers.Serializer):
+    """Serializer para el stock de un material a una fecha."""
+    item_type = serializers.CharField()
+    item_id = serializers.IntegerField()
+    nombre = serializers.CharField(allow_null=True)
+    stock = serializers.IntegerField()
@@ -2,16 +2,38 @@
 Servicios para la app de inventario.
 """
 
-from django.db.models import Q, Sum, Count, F
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections, router, transaction
+from django.db.models import Q, Sum, Count, F, Max, Value, CharField, DecimalField, Exists, OuterRef, Subquery
 from django.utils import timezone
+from collections import defaultdict
+from datetime import date, datetime, timedelta
 from decimal import Decimal
-from typing import Dict, List, Optional, Tuple
+from typing import Dict, Iterable, List, Optional, Tuple
 
 from .models import (
     Inventario, Varilla, PinturaAcabado, MaterialImpresion, 
     MaterialRecordatorio, SoftwareEquipo, MaterialPintura, 
-    MaterialDiseno, ProductoTerminado, MovimientoInventario
+    MaterialDiseno, ProductoTerminado, MovimientoInventario, AlertaStock,
+    ActividadMaterial, LoteMaterial, CalendarioVencimiento, AsientoInventario, SnapshotStock
 )
+from apps.production.models import MovimientoInventario as MovimientoMaterial
+
+
+class StockError(Exception):
+    """Error de validación de stock que aborta la transacción en curso."""
+
+
+def bulk_upsert(model, objs: List, unique_fields: List[str], update_fields: List[str]):
+    """Insertar o actualizar filas en una sola sentencia (ON DUPLICATE KEY / ON CONFLICT)."""
+    if not objs:
+        return []
+    kwargs = {'update_conflicts': True, 'update_fields': update_fields}
+    # MySQL resuelve el conflicto con cualquier índice único y no acepta unique_fields
+    if connections[router.db_for_write(model)].features.supports_update_conflicts_with_target:
+        kwargs['unique_fields'] = unique_fields
+    return model.objects.bulk_create(objs, **kwargs)
 
 
 class InventoryService:
@@ -29,145 +51,170 @@ class InventoryService:
         'producto_terminado': ProductoTerminado,
     }
     
+    # Nombres de categoría para reportes
+    CATEGORY_NAMES = {
+        'varilla': 'Varillas',
+        'pintura_acabado': 'Pinturas y Acabados',
+        'material_impresion': 'Materiales de Impresión',
+        'material_recordatorio': 'Materiales de Recordatorio',
+        'software_equipo': 'Software y Equipos',
+        'material_pintura': 'Materiales de Pintura',
+        'material_diseno': 'Materiales de Diseño',
+    }
+    
     @classmethod
     def get_model_by_type(cls, item_type: str):
         """Obtener modelo por tipo de item."""
         return cls.MODELS_MAP.get(item_type)
     
     @classmethod
-    def create_movement(cls, tenant_id: int, item_type: str, item_id: int, 
+    def build_movement(cls, tenant_id: int, item_type: str, item_id: int,
                        tipo_movimiento: str, cantidad: int, motivo: str = None,
-                       orden_produccion_id: int = None, usuario: str = None) -> MovimientoInventario:
-        """Crear movimiento de inventario."""
-        return MovimientoInventario.objects.create(
+                       orden_produccion_id: int = None, usuario: str = None) -> MovimientoMaterial:
+        """Construir (sin guardar) un movimiento de material."""
+        return MovimientoMaterial(
             tenant_id=tenant_id,
-            item_type=item_type,
-            item_id=item_id,
+            material_type=item_type,
+            material_id=item_id,
             tipo_movimiento=tipo_movimiento,
             cantidad=cantidad,
             motivo=motivo,
-            orden_produccion_id_id=orden_produccion_id,
+            orden_produccion_id=orden_produccion_id,
             usuario=usuario
         )
     
+    @classmethod
+    def create_movement(cls, tenant_id: int, item_type: str, item_id: int, 
+                       tipo_movimiento: str, cantidad: int, motivo: str = None,
+                       orden_produccion_id: int = None, usuario: str = None) -> MovimientoMaterial:
+        """Crear movimiento de inventario."""
+        movimiento = cls.build_movement(
+            tenant_id, item_type, item_id, tipo_movimiento, cantidad,
+            motivo=motivo, orden_produccion_id=orden_produccion_id, usuario=usuario
+        )
+        movimiento.save()
+        return movimiento
+    
+    @classmethod
+    def save_movements(cls, movimientos: List[MovimientoMaterial],
+                       deltas: Optional[List[int]] = None) -> List[MovimientoMaterial]:
+        """Insertar movimientos en un solo INSERT, asentarlos en el libro de inventario
+        y actualizar la actividad de los materiales.
+        
+        ``deltas`` (paralelo a ``movimientos``) indica la variación de stock de cada
+        uno; por defecto se deduce del tipo de movimiento.
+        """
+        if not movimientos:
+            return []
+        creados = MovimientoMaterial.objects.bulk_create(movimientos)
+        InventoryLedgerService.append([
+            InventoryLedgerService.from_movement(movimiento, deltas[i] if deltas else None)
+            for i, movimiento in enumerate(movimientos)
+        ])
+        
+        por_tenant = defaultdict(set)
+        for movimiento in movimientos:
+            por_tenant[movimiento.tenant_id].add((movimiento.material_type, movimiento.material_id))
+        for tenant_id, claves in por_tenant.items():
+            StockAlertService.touch_activity(tenant_id, claves)
+        return creados
+    
     @classmethod
     def adjust_stock(cls, tenant_id: int, item_type: str, item_id: int, 
                     cantidad: int, motivo: str = 'Ajuste manual', usuario: str = None) -> Tuple[bool, str]:
-        """Ajustar stock de un material."""
+        """Ajustar stock de un material (sin bajar de cero) y asentarlo en el libro."""
+        if item_type not in cls.get_stock_models():
+            return False, f"Tipo de material no válido: {item_type}"
+        
         try:
-            model = cls.get_model_by_type(item_type)
-            if not model:
-                return False, f"Tipo de material no válido: {item_type}"
-            
-            item = model.objects.get(id=item_id, tenant_id=tenant_id)
-            
-            # Crear movimiento
-            cls.create_movement(
-                tenant_id=tenant_id,
-                item_type=item_type,
-                item_id=item_id,
-                tipo_movimiento='ajuste',
-                cantidad=abs(cantidad),
-                motivo=motivo,
-                usuario=usuario
-            )
-            
-            # Actualizar stock
-            if item_type == 'varilla':
-                item.stock += cantidad
-                if item.stock < 0:
-                    item.stock = 0
-            else:
-                item.stock_actual += cantidad
-                if item.stock_actual < 0:
-                    item.stock_actual = 0
-            item.save()
+            with transaction.atomic():
+                items = cls.lock_items(tenant_id, item_type, [item_id])
+                item = items[item_id]
+                delta = max(item.stock + cantidad, 0) - item.stock
+                if delta:
+                    cls.apply_stock_deltas(item_type, items, {item_id: delta})
+                cls.save_movements([
+                    cls.build_movement(
+                        tenant_id=tenant_id,
+                        item_type=item_type,
+                        item_id=item_id,
+                        tipo_movimiento='ajuste',
+                        cantidad=abs(cantidad),
+                        motivo=motivo,
+                        usuario=usuario
+                    )
+                ], deltas=[delta])
             
             return True, "Stock ajustado correctamente"
             
-        except model.DoesNotExist:
-            return False, "Material no encontrado"
+        except StockError as e:
+            return False, str(e)
         except Exception as e:
             return False, f"Error al ajustar stock: {str(e)}"
     
     @classmethod
-    def get_low_stock_items(cls, tenant_id: int) -> List[Dict]:
-        """Obtener items con stock bajo."""
-        alerts = []
-        
-        for item_type, model in cls.MODELS_MAP.items():
-            if item_type == 'producto_terminado':
-                continue  # Los productos terminados no tienen stock mínimo
-                
-            if item_type == 'varilla':
-                queryset = model.objects.filter(
-                    tenant_id=tenant_id,
-                    stock__lte=F('minimo')
-                )
-            else:
-                queryset = model.objects.filter(
-                    tenant_id=tenant_id,
-                    stock_actual__lte=F('stock_minimo')
-                )
-            
-            for item in queryset:
-                if item_type == 'varilla':
-                    stock_actual = item.stock
-                    stock_minimo = item.minimo
-                else:
-                    stock_actual = item.stock_actual
-                    stock_minimo = item.stock_minimo
-                
-                alerts.append({
-                    'item_type': item_type,
-                    'item_id': item.id,
-                    'nombre': getattr(item, 'nombre', f'{item_type} {item.id}'),
-                    'stock_actual': stock_actual,
-                    'stock_minimo': stock_minimo,
-                    'diferencia': stock_actual - stock_minimo,
-                    'ubicacion': getattr(item, 'ubicacion', ''),
-                    'fecha_alerta': timezone.now()
-                })
-        
-        return alerts
+    def get_low_stock_items(cls, tenant_id: Optional[int] = None) -> List[Dict]:
+        """Obtener items con stock bajo desde el índice de alertas."""
+        return StockAlertService.get_low_stock_rows(StockAlertService.get_low_stock_alerts(tenant_id))
     
     @classmethod
-    def get_stock_report(cls, tenant_id: int) -> List[Dict]:
-        """Obtener reporte de stock por categoría."""
-        reports = []
-        
-        category_names = {
-            'varilla': 'Varillas',
-            'pintura_acabado': 'Pinturas y Acabados',
-            'material_impresion': 'Materiales de Impresión',
-            'material_recordatorio': 'Materiales de Recordatorio',
-            'software_equipo': 'Software y Equipos',
-            'material_pintura': 'Materiales de Pintura',
-            'material_diseno': 'Materiales de Diseño',
+    def get_stock_models(cls) -> Dict:
+        """Modelos con control de stock (excluye productos terminados)."""
+        return {
+            item_type: model for item_type, model in cls.MODELS_MAP.items()
+            if item_type != 'producto_terminado'
         }
+    
+    @classmethod
+    def get_stock_report(cls, tenant_id: Optional[int] = None, use_snapshot: bool = False) -> List[Dict]:
+        """Obtener reporte de stock por categoría.
         
-        for item_type, model in cls.MODELS_MAP.items():
-            if item_type == 'producto_terminado':
-                continue
-                
-            queryset = model.objects.filter(tenant_id=tenant_id)
-            
-            total_items = queryset.count()
-            
-            if item_type == 'varilla':
-                items_stock_bajo = queryset.filter(stock__lte=F('minimo')).count()
-                valor_total = sum(item.stock * item.precio for item in queryset)
-            else:
-                items_stock_bajo = queryset.filter(stock_actual__lte=F('stock_minimo')).count()
-                valor_total = sum(item.stock_actual * item.precio_unitario for item in queryset)
+        Calcula totales, items con stock bajo y valorización de todas las
+        categorías en una sola consulta UNION ALL. Con ``use_snapshot`` se
+        reutiliza el último reporte cacheado durante INVENTORY_STOCK_REPORT_TTL.
+        """
+        if use_snapshot:
+            key = f"inventory:stock_report:{tenant_id if tenant_id else 'all'}"
+            reports = cache.get(key)
+            if reports is None:
+                reports = cls.get_stock_report(tenant_id)
+                cache.set(key, reports, getattr(settings, 'INVENTORY_STOCK_REPORT_TTL', 300))
+            return reports
+        
+        subqueries = []
+        for item_type, model in cls.get_stock_models().items():
+            queryset = model.objects.all()
+            if tenant_id:
+                queryset = queryset.filter(tenant_id=tenant_id)
             
+            subqueries.append(
+                queryset.annotate(
+                    categoria=Value(item_type, output_field=CharField())
+                ).values('categoria').annotate(
+                    total_items=Count('id'),
+                    items_stock_bajo=Count('id', filter=Q(stock__lte=F('minimo'))),
+                    valor_total=Sum(
+                        F('stock') * F('precio'),
+                        output_field=DecimalField(max_digits=15, decimal_places=2)
+                    )
+                ).order_by()
+            )
+        
+        first, *others = subqueries
+        rows = {row['categoria']: row for row in first.union(*others, all=True)}
+        
+        reports = []
+        for item_type, categoria in cls.CATEGORY_NAMES.items():
+            row = rows.get(item_type, {})
+            total_items = row.get('total_items', 0)
+            items_stock_bajo = row.get('items_stock_bajo', 0)
             porcentaje_stock_bajo = (items_stock_bajo / total_items * 100) if total_items > 0 else 0
             
             reports.append({
-                'categoria': category_names[item_type],
+                'categoria': categoria,
                 'total_items': total_items,
                 'items_stock_bajo': items_stock_bajo,
-                'valor_total': valor_total,
+                'valor_total': row.get('valor_total') or Decimal('0.00'),
                 'porcentaje_stock_bajo': round(porcentaje_stock_bajo, 2)
             })
         
@@ -217,79 +264,156 @@ class InventoryService:
         except Exception as e:
             return False, f"Error al validar stock: {str(e)}"
     
+    @classmethod
+    def lock_items(cls, tenant_id: int, item_type: str, item_ids: Iterable[int],
+                   strict: bool = True) -> Dict[int, object]:
+        """Bloquear (SELECT ... FOR UPDATE) los items de un tipo en orden de id.
+        
+        Debe llamarse dentro de una transacción. Con ``strict`` lanza
+        StockError si falta alguno de los items; sin él solo devuelve los
+        encontrados.
+        """
+        model = cls.get_model_by_type(item_type)
+        if not model or item_type == 'producto_terminado':
+            raise StockError(f"Tipo de material no válido: {item_type}")
+        
+        item_ids = sorted(set(item_ids))
+        items = {
+            item.id: item
+            for item in model.objects.select_for_update().filter(
+                tenant_id=tenant_id, id__in=item_ids
+            ).only('id', 'tenant_id', 'nombre', 'stock', 'minimo').order_by('id')
+        }
+        faltantes = [item_id for item_id in item_ids if item_id not in items]
+        if faltantes and strict:
+            raise StockError(f"Material no encontrado: {item_type} {faltantes[0]}")
+        return items
+    
+    @classmethod
+    def apply_stock_deltas(cls, item_type: str, items: Dict[int, object], deltas: Dict[int, int]) -> None:
+        """Aplicar variaciones de stock con un único UPDATE por tipo.
+        
+        ``items`` son los objetos bloqueados por lock_items; tras el UPDATE
+        quedan con el stock resultante y se sincroniza el índice de alertas.
+        """
+        model = cls.get_model_by_type(item_type)
+        ahora = timezone.now()
+        nuevos = {}
+        for item_id, delta in deltas.items():
+            item = items[item_id]
+            nuevos[item_id] = item.stock + delta
+            item.stock = F('stock') + delta
+            item.updated_at = ahora
+        
+        model.objects.bulk_update([items[item_id] for item_id in deltas], ['stock', 'updated_at'])
+        
+        for item_id, stock in nuevos.items():
+            items[item_id].stock = stock
+        StockAlertService.sync_low_stock(item_type, [items[item_id] for item_id in deltas])
+        cls.refresh_production_queue(item_type, [items[item_id] for item_id in deltas])
+    
+    @staticmethod
+    def refresh_production_queue(item_type: str, items: Iterable) -> None:
+        """Recalcular tras el commit la cola de producción de los materiales cambiados.
+        
+        bulk_update no envía post_save, así que la señal de Varilla no se entera
+        de estos cambios de stock.
+        """
+        from apps.production.services import ProductionSchedulerService
+        
+        por_tenant = defaultdict(list)
+        for item in items:
+            por_tenant[item.tenant_id].append(item.id)
+        for tenant_id, item_ids in por_tenant.items():
+            transaction.on_commit(
+                lambda tenant_id=tenant_id, item_ids=item_ids:
+                    ProductionSchedulerService.refresh_for_materials(tenant_id, item_ids, item_type)
+            )
+    
     @classmethod
     def consume_materials(cls, tenant_id: int, materiales: List[Dict], 
                          orden_produccion_id: int = None, usuario: str = None) -> Tuple[bool, str]:
-        """Consumir materiales para producción."""
+        """Consumir materiales para producción.
+        
+        Todo el consumo ocurre en una transacción: los items se bloquean con
+        SELECT ... FOR UPDATE (una consulta por tipo), se valida el stock, se
+        descuenta con un UPDATE por tipo y los movimientos se insertan con
+        bulk_create. Si algún material no alcanza no se consume ninguno.
+        """
+        requeridos = defaultdict(lambda: defaultdict(int))
         try:
             for material in materiales:
-                item_type = material['item_type']
-                item_id = material['item_id']
-                cantidad = material['cantidad']
-                
-                # Validar disponibilidad
-                disponible, mensaje = cls.validate_stock_availability(
-                    tenant_id, item_type, item_id, cantidad
-                )
-                if not disponible:
-                    return False, mensaje
-            
-            # Si todos los materiales están disponibles, consumirlos
-            for material in materiales:
-                item_type = material['item_type']
-                item_id = material['item_id']
-                cantidad = material['cantidad']
-                
-                model = cls.get_model_by_type(item_type)
-                item = model.objects.get(id=item_id, tenant_id=tenant_id)
-                
-                # Crear movimiento de salida
-                cls.create_movement(
-                    tenant_id=tenant_id,
-                    item_type=item_type,
-                    item_id=item_id,
-                    tipo_movimiento='salida',
-                    cantidad=cantidad,
-                    motivo=f'Uso en producción - Orden {orden_produccion_id}',
-                    orden_produccion_id=orden_produccion_id,
-                    usuario=usuario
-                )
+                cantidad = int(material['cantidad'])
+                if cantidad <= 0:
+                    return False, "La cantidad debe ser positiva"
+                requeridos[material['item_type']][int(material['item_id'])] += cantidad
+        except (KeyError, TypeError, ValueError) as e:
+            return False, f"Material inválido: {str(e)}"
+        
+        try:
+            with transaction.atomic():
+                movimientos = []
+                # Orden fijo de tipos para que transacciones concurrentes bloqueen en el mismo orden
+                for item_type in sorted(requeridos):
+                    cantidades = requeridos[item_type]
+                    items = cls.lock_items(tenant_id, item_type, cantidades.keys())
+                    
+                    for item_id, cantidad in cantidades.items():
+                        if items[item_id].stock < cantidad:
+                            raise StockError(
+                                f"Stock insuficiente para {item_type} {item_id}. "
+                                f"Disponible: {items[item_id].stock}, Requerido: {cantidad}"
+                            )
+                    
+                    cls.apply_stock_deltas(
+                        item_type, items,
+                        {item_id: -cantidad for item_id, cantidad in cantidades.items()}
+                    )
+                    
+                    movimientos.extend(
+                        cls.build_movement(
+                            tenant_id=tenant_id,
+                            item_type=item_type,
+                            item_id=item_id,
+                            tipo_movimiento='salida',
+                            cantidad=cantidad,
+                            motivo=f'Uso en producción - Orden {orden_produccion_id}',
+                            orden_produccion_id=orden_produccion_id,
+                            usuario=usuario
+                        )
+                        for item_id, cantidad in cantidades.items()
+                    )
                 
-                # Actualizar stock
-                if item_type == 'varilla':
-                    item.stock -= cantidad
-                else:
-                    item.stock_actual -= cantidad
-                item.save()
+                cls.save_movements(movimientos)
             
             return True, "Materiales consumidos correctamente"
             
+        except StockError as e:
+            return False, str(e)
         except Exception as e:
             return False, f"Error al consumir materiales: {str(e)}"
     
     @classmethod
     def add_materials(cls, tenant_id: int, materiales: List[Dict], 
                      usuario: str = None, motivo: str = 'Entrada de materiales') -> Tuple[bool, str]:
-        """Agregar materiales al inventario."""
+        """Agregar materiales al inventario (un UPDATE por tipo y movimientos de entrada)."""
+        entradas = defaultdict(lambda: defaultdict(int))
         try:
             for material in materiales:
-                item_type = material['item_type']
-                item_id = material.get('item_id')
-                cantidad = material['cantidad']
-                
-                if item_id:
-                    # Actualizar material existente
-                    model = cls.get_model_by_type(item_type)
-                    if model:
-                        item = model.objects.get(id=item_id, tenant_id=tenant_id)
-                        if item_type == 'varilla':
-                            item.stock += cantidad
-                        else:
-                            item.stock_actual += cantidad
-                        item.save()
-                        
-                        # Crear movimiento de entrada
-                        cls.create_movement(
+                if material.get('item_id'):
+                    entradas[material['item_type']][int(material['item_id'])] += int(material['cantidad'])
+        except (KeyError, TypeError, ValueError) as e:
+            return False, f"Material inválido: {str(e)}"
+        
+        try:
+            with transaction.atomic():
+                movimientos = []
+                for item_type in sorted(entradas):
+                    cantidades = entradas[item_type]
+                    items = cls.lock_items(tenant_id, item_type, cantidades.keys())
+                    cls.apply_stock_deltas(item_type, items, dict(cantidades))
+                    movimientos.extend(
+                        cls.build_movement(
                             tenant_id=tenant_id,
                             item_type=item_type,
                             item_id=item_id,
@@ -298,89 +422,607 @@ class InventoryService:
                             motivo=motivo,
                             usuario=usuario
                         )
+                        for item_id, cantidad in cantidades.items()
+                    )
+                cls.save_movements(movimientos)
             
             return True, "Materiales agregados correctamente"
             
+        except StockError as e:
+            return False, str(e)
         except Exception as e:
             return False, f"Error al agregar materiales: {str(e)}"
 
 
+class InventoryLedgerService:
+    """Libro de inventario de solo inserción y snapshots periódicos de stock.
+    
+    Cada cambio de stock de cualquier tipo de material se asienta en
+    AsientoInventario; el campo ``stock`` de los materiales es un contador
+    derivado del libro. El stock a una fecha se obtiene del snapshot más
+    cercano anterior más los asientos posteriores a él (un delta acotado al
+    periodo entre snapshots).
+    """
+    
+    # Signo con que cada tipo de asiento afecta al stock (la merma es informativa)
+    SIGNOS = {
+        'inicial': 1,
+        'entrada': 1,
+        'salida': -1,
+        'ajuste': 1,
+        'transferencia': 0,
+        'merma': 0,
+        'uso_produccion': -1,
+    }
+    
+    @classmethod
+    def build_entry(cls, tenant_id: int, item_type: str, item_id: int, tipo: str, cantidad: int,
+                    delta: Optional[int] = None, motivo: str = None, orden_produccion_id: int = None,
+                    usuario: str = None, fecha: Optional[datetime] = None) -> AsientoInventario:
+        """Construir (sin guardar) un asiento; sin ``delta`` se deduce del tipo."""
+        return AsientoInventario(
+            tenant_id=tenant_id,
+            item_type=item_type,
+            item_id=item_id,
+            tipo=tipo,
+            cantidad=cantidad,
+            delta=cls.SIGNOS[tipo] * cantidad if delta is None else delta,
+            motivo=motivo,
+            orden_produccion_id=orden_produccion_id,
+            usuario=usuario,
+            fecha=fecha or timezone.now()
+        )
+    
+    @classmethod
+    def from_movement(cls, movimiento: MovimientoMaterial, delta: Optional[int] = None) -> AsientoInventario:
+        return cls.build_entry(
+            tenant_id=movimiento.tenant_id,
+            item_type=movimiento.material_type,
+            item_id=movimiento.material_id,
+            tipo=movimiento.tipo_movimiento,
+            cantidad=movimiento.cantidad,
+            delta=delta,
+            motivo=movimiento.motivo,
+            orden_produccion_id=movimiento.orden_produccion_id,
+            usuario=movimiento.usuario,
+            fecha=movimiento.fecha
+        )
+    
+    @staticmethod
+    def append(asientos: List[AsientoInventario]) -> List[AsientoInventario]:
+        """Insertar asientos en un solo INSERT."""
+        if not asientos:
+            return []
+        return AsientoInventario.objects.bulk_create(asientos)
+    
+    @staticmethod
+    def snapshot_delay() -> timedelta:
+        """Margen para que las transacciones en curso confirmen sus asientos antes del corte."""
+        return timedelta(seconds=getattr(settings, 'INVENTORY_SNAPSHOT_DELAY', 300))
+    
+    @staticmethod
+    def stock_at(tenant_id: int, item_type: str, item_id: int, fecha: datetime) -> int:
+        """Stock de un material a una fecha: snapshot anterior + asientos posteriores."""
+        snapshot = SnapshotStock.objects.filter(
+            tenant_id=tenant_id, item_type=item_type, item_id=item_id, fecha__lte=fecha
+        ).order_by('-fecha').values('fecha', 'stock').first()
+        
+        asientos = AsientoInventario.objects.filter(
+            tenant_id=tenant_id, item_type=item_type, item_id=item_id, fecha__lte=fecha
+        )
+        if snapshot:
+            asientos = asientos.filter(fecha__gt=snapshot['fecha'])
+        base = snapshot['stock'] if snapshot else 0
+        return base + (asientos.aggregate(total=Sum('delta'))['total'] or 0)
+    
+    @staticmethod
+    def stock_report_at(tenant_id: int, fecha: datetime, item_type: Optional[str] = None) -> Dict[Tuple[str, int], int]:
+        """Stock de todos los materiales de un tenant a una fecha, en tres consultas.
+        
+        Los snapshots incluyen todos los materiales con asientos, así que basta
+        el último corte anterior a la fecha más los asientos entre ambos.
+        """
+        corte = SnapshotStock.objects.filter(
+            tenant_id=tenant_id, fecha__lte=fecha
+        ).aggregate(corte=Max('fecha'))['corte']
+        
+        stocks = {}
+        asientos = AsientoInventario.objects.filter(tenant_id=tenant_id, fecha__lte=fecha)
+        if item_type:
+            asientos = asientos.filter(item_type=item_type)
+        if corte:
+            snapshots = SnapshotStock.objects.filter(tenant_id=tenant_id, fecha=corte)
+            if item_type:
+                snapshots = snapshots.filter(item_type=item_type)
+            stocks = {
+                (tipo, item_id): stock
+                for tipo, item_id, stock in snapshots.values_list('item_type', 'item_id', 'stock')
+            }
+            asientos = asientos.filter(fecha__gt=corte)
+        
+        for fila in asientos.values('item_type', 'item_id').annotate(total=Sum('delta')).order_by():
+            clave = (fila['item_type'], fila['item_id'])
+            stocks[clave] = stocks.get(clave, 0) + fila['total']
+        return stocks
+    
+    @classmethod
+    def _tenant_ids(cls, tenant_id: Optional[int]) -> List[int]:
+        if tenant_id:
+            return [tenant_id]
+        return list(AsientoInventario.objects.values_list('tenant_id', flat=True).distinct().order_by('tenant_id'))
+    
+    @classmethod
+    def take_snapshot(cls, tenant_id: Optional[int] = None, fecha: Optional[datetime] = None,
+                      batch_size: int = 1000) -> int:
+        """Guardar el stock de todos los materiales a la fecha de corte.
+        
+        Por defecto el corte es ahora menos INVENTORY_SNAPSHOT_DELAY, para no dejar
+        fuera asientos de transacciones aún abiertas.
+        """
+        corte = fecha or timezone.now() - cls.snapshot_delay()
+        total = 0
+        for tenant in cls._tenant_ids(tenant_id):
+            if SnapshotStock.objects.filter(tenant_id=tenant, fecha__gte=corte).exists():
+                # Ya hay un corte igual o posterior: el libro no admite cambios retroactivos
+                continue
+            filas = [
+                SnapshotStock(tenant_id=tenant, item_type=item_type, item_id=item_id, fecha=corte, stock=stock)
+                for (item_type, item_id), stock in sorted(cls.stock_report_at(tenant, corte).items())
+            ]
+            SnapshotStock.objects.bulk_create(filas, batch_size=batch_size)
+            total += len(filas)
+        return total
+    
+    @classmethod
+    def bootstrap(cls, tenant_id: Optional[int] = None, batch_size: int = 1000) -> int:
+        """Asiento inicial con el stock actual de los materiales que aún no tienen asientos."""
+        total = 0
+        for item_type, model in InventoryService.get_stock_models().items():
+            items = model.objects.exclude(stock=0).filter(
+                ~Exists(AsientoInventario.objects.filter(
+                    tenant_id=OuterRef('tenant_id'), item_type=item_type, item_id=OuterRef('id')
+                ))
+            )
+            if tenant_id:
+                items = items.filter(tenant_id=tenant_id)
+            
+            ultimo_id = 0
+            while True:
+                lote = list(items.filter(id__gt=ultimo_id).order_by('id').values('id', 'tenant_id', 'stock')[:batch_size])
+                if not lote:
+                    break
+                cls.append([
+                    cls.build_entry(
+                        item['tenant_id'], item_type, item['id'], 'inicial', item['stock'],
+                        motivo='Saldo inicial del libro de inventario'
+                    )
+                    for item in lote
+                ])
+                total += len(lote)
+                ultimo_id = lote[-1]['id']
+        return total
+    
+    @classmethod
+    def derive_counters(cls, tenant_id: Optional[int] = None) -> int:
+        """Recalcular el campo stock de los materiales desde el libro; devuelve los corregidos."""
+        corregidos = 0
+        for tenant in cls._tenant_ids(tenant_id):
+            for item_type, model in InventoryService.get_stock_models().items():
+                with transaction.atomic():
+                    # Con los items bloqueados nadie puede asentar cambios de este tipo
+                    items = list(model.objects.select_for_update().filter(tenant_id=tenant).only(
+                        'id', 'tenant_id', 'nombre', 'stock', 'minimo'
+                    ).order_by('id'))
+                    ahora = timezone.now()
+                    libro = cls.stock_report_at(tenant, ahora, item_type)
+                    distintos = []
+                    for item in items:
+                        stock = libro.get((item_type, item.id), 0)
+                        if item.stock != stock:
+                            item.stock = stock
+                            item.updated_at = ahora
+                            distintos.append(item)
+                    if distintos:
+                        model.objects.bulk_update(distintos, ['stock', 'updated_at'])
+                        StockAlertService.sync_low_stock(item_type, distintos)
+                        InventoryService.refresh_production_queue(item_type, distintos)
+                    corregidos += len(distintos)
+        return corregidos
+
+
 class StockAlertService:
     """Servicio para alertas de stock."""
     
+    @staticmethod
+    def get_low_stock_alerts(tenant_id: Optional[int] = None):
+        """QuerySet de alertas de stock bajo, ordenado por criticidad."""
+        queryset = AlertaStock.objects.all()
+        if tenant_id:
+            queryset = queryset.filter(tenant_id=tenant_id)
+        return queryset.order_by('diferencia', 'id')
+    
+    @staticmethod
+    def get_low_stock_rows(alertas: Iterable[AlertaStock]) -> List[Dict]:
+        """Convertir entradas del índice de stock bajo en alertas."""
+        return [
+            {
+                'item_type': alerta.item_type,
+                'item_id': alerta.item_id,
+                'nombre': alerta.nombre,
+                'stock_actual': alerta.stock_actual,
+                'stock_minimo': alerta.stock_minimo,
+                'diferencia': alerta.diferencia,
+                'ubicacion': '',
+                'fecha_alerta': alerta.fecha_alerta
+            }
+            for alerta in alertas
+        ]
+    
+    @staticmethod
+    def sync_low_stock(item_type: str, items: Iterable) -> None:
+        """Actualizar el índice de alertas para los items indicados.
+        
+        Los items con stock <= mínimo se insertan o actualizan en
+        AlertaStock y el resto se elimina del índice.
+        """
+        items = list(items)
+        if not items:
+            return
+        
+        bajos = [item for item in items if item.stock <= item.minimo]
+        normales = [item.id for item in items if item.stock > item.minimo]
+        
+        bulk_upsert(
+            AlertaStock,
+            [
+                AlertaStock(
+                    tenant_id=item.tenant_id,
+                    item_type=item_type,
+                    item_id=item.id,
+                    nombre=item.nombre,
+                    stock_actual=item.stock,
+                    stock_minimo=item.minimo,
+                    diferencia=item.stock - item.minimo
+                )
+                for item in bajos
+            ],
+            unique_fields=['item_type', 'item_id'],
+            update_fields=['tenant_id', 'nombre', 'stock_actual', 'stock_minimo', 'diferencia', 'updated_at']
+        )
+        if normales:
+            AlertaStock.objects.filter(item_type=item_type, item_id__in=normales).delete()
+    
+    @staticmethod
+    def sync_low_stock_ids(item_type: str, item_ids: Iterable[int]) -> None:
+        """Releer los items desde la base de datos y actualizar el índice."""
+        model = InventoryService.get_model_by_type(item_type)
+        item_ids = list(item_ids)
+        if model and item_ids:
+            StockAlertService.sync_low_stock(
+                item_type,
+                model.objects.filter(id__in=item_ids).only('id', 'tenant_id', 'nombre', 'stock', 'minimo')
+            )
+    
+    @staticmethod
+    def rebuild_low_stock_index(tenant_id: Optional[int] = None, batch_size: int = 1000) -> int:
+        """Reconstruir el índice de alertas desde las tablas de materiales."""
+        total = 0
+        for item_type, model in InventoryService.get_stock_models().items():
+            alertas = AlertaStock.objects.filter(item_type=item_type)
+            queryset = model.objects.filter(stock__lte=F('minimo'))
+            if tenant_id:
+                alertas = alertas.filter(tenant_id=tenant_id)
+                queryset = queryset.filter(tenant_id=tenant_id)
+            
+            # En una transacción: los lectores ven el índice anterior hasta el commit
+            with transaction.atomic():
+                alertas.delete()
+                AlertaStock.objects.bulk_create(
+                    (
+                        AlertaStock(
+                            tenant_id=item.tenant_id,
+                            item_type=item_type,
+                            item_id=item.id,
+                            nombre=item.nombre,
+                            stock_actual=item.stock,
+                            stock_minimo=item.minimo,
+                            diferencia=item.stock - item.minimo
+                        )
+                        for item in queryset.only('id', 'tenant_id', 'nombre', 'stock', 'minimo').iterator(chunk_size=batch_size)
+                    ),
+                    batch_size=batch_size
+                )
+            total += alertas.count()
+        return total
+    
+    # Tipo de alerta por tipo de material (el resto usa 'vencimiento')
+    EXPIRY_ALERT_TYPES = {'software_equipo': 'licencia'}
+    
+    @staticmethod
+    def refresh_expiry_calendar(tenant_id: int, item_type: str, item_id: int, fechas: Iterable[date]) -> None:
+        """Recalcular las celdas del calendario de un material para las fechas indicadas."""
+        fechas = set(fecha for fecha in fechas if fecha)
+        if not fechas:
+            return
+        
+        totales = {
+            fila['fecha_vencimiento']: fila
+            for fila in LoteMaterial.objects.filter(
+                tenant_id=tenant_id,
+                item_type=item_type,
+                item_id=item_id,
+                fecha_vencimiento__in=fechas,
+                cantidad__gt=0
+            ).values('fecha_vencimiento').annotate(
+                total=Sum('cantidad'),
+                num_lotes=Count('id')
+            ).order_by()
+        }
+        
+        model = InventoryService.get_model_by_type(item_type)
+        nombre = model.objects.filter(id=item_id).values_list('nombre', flat=True).first() if model else None
+        
+        with transaction.atomic():
+            CalendarioVencimiento.objects.filter(
+                tenant_id=tenant_id, item_type=item_type, item_id=item_id,
+                fecha__in=fechas - set(totales)
+            ).delete()
+            bulk_upsert(
+                CalendarioVencimiento,
+                [
+                    CalendarioVencimiento(
+                        tenant_id=tenant_id,
+                        fecha=fecha,
+                        item_type=item_type,
+                        item_id=item_id,
+                        nombre=nombre or f'{item_type} {item_id}',
+                        cantidad=fila['total'],
+                        lotes=fila['num_lotes']
+                    )
+                    for fecha, fila in totales.items()
+                ],
+                unique_fields=['tenant_id', 'fecha', 'item_type', 'item_id'],
+                update_fields=['nombre', 'cantidad', 'lotes', 'updated_at']
+            )
+    
+    @staticmethod
+    def rebuild_expiry_calendar(tenant_id: Optional[int] = None, batch_size: int = 1000) -> int:
+        """Reconstruir el calendario de vencimientos desde los lotes."""
+        lotes = LoteMaterial.objects.filter(cantidad__gt=0)
+        calendario = CalendarioVencimiento.objects.all()
+        if tenant_id:
+            lotes = lotes.filter(tenant_id=tenant_id)
+            calendario = calendario.filter(tenant_id=tenant_id)
+        
+        filas = list(
+            lotes.values('tenant_id', 'fecha_vencimiento', 'item_type', 'item_id').annotate(
+                total=Sum('cantidad'),
+                num_lotes=Count('id')
+            ).order_by()
+        )
+        
+        # Nombres: una consulta por tipo de material
+        ids_por_tipo = defaultdict(set)
+        for fila in filas:
+            ids_por_tipo[fila['item_type']].add(fila['item_id'])
+        nombres = {}
+        for item_type, item_ids in ids_por_tipo.items():
+            model = InventoryService.get_model_by_type(item_type)
+            if model:
+                for item_id, nombre in model.objects.filter(id__in=item_ids).values_list('id', 'nombre'):
+                    nombres[(item_type, item_id)] = nombre
+        
+        with transaction.atomic():
+            calendario.delete()
+            CalendarioVencimiento.objects.bulk_create(
+                (
+                    CalendarioVencimiento(
+                        tenant_id=fila['tenant_id'],
+                        fecha=fila['fecha_vencimiento'],
+                        item_type=fila['item_type'],
+                        item_id=fila['item_id'],
+                        nombre=nombres.get(
+                            (fila['item_type'], fila['item_id']), f"{fila['item_type']} {fila['item_id']}"
+                        ),
+                        cantidad=fila['total'],
+                        lotes=fila['num_lotes']
+                    )
+                    for fila in filas
+                ),
+                batch_size=batch_size
+            )
+        return len(filas)
+    
+    @staticmethod
+    def expired_since() -> date:
+        """Fecha desde la que se informan lotes vencidos (INVENTORY_EXPIRED_LOOKBACK_DAYS)."""
+        dias = getattr(settings, 'INVENTORY_EXPIRED_LOOKBACK_DAYS', 30)
+        return timezone.localdate() - timezone.timedelta(days=dias)
+    
+    @staticmethod
+    def get_expiring_queryset(tenant_id: Optional[int] = None, days_ahead: int = 30):
+        """QuerySet del calendario hasta dentro de N días, con lo vencido recientemente."""
+        limite = timezone.localdate() + timezone.timedelta(days=days_ahead)
+        queryset = CalendarioVencimiento.objects.filter(
+            fecha__gte=StockAlertService.expired_since(), fecha__lte=limite
+        )
+        if tenant_id:
+            queryset = queryset.filter(tenant_id=tenant_id)
+        return queryset.order_by('fecha', 'id')
+    
+    @staticmethod
+    def get_expiring_rows(entradas: Iterable[CalendarioVencimiento]) -> List[Dict]:
+        """Convertir entradas del calendario en alertas."""
+        hoy = timezone.localdate()
+        return [
+            {
+                'item_type': entrada.item_type,
+                'item_id': entrada.item_id,
+                'nombre': entrada.nombre,
+                'fecha_vencimiento': entrada.fecha,
+                'cantidad': entrada.cantidad,
+                'lotes': entrada.lotes,
+                'dias_restantes': (entrada.fecha - hoy).days,
+                'tipo_alerta': StockAlertService.EXPIRY_ALERT_TYPES.get(entrada.item_type, 'vencimiento')
+            }
+            for entrada in entradas
+        ]
+    
     @staticmethod
     def check_expiring_materials(tenant_id: int, days_ahead: int = 30) -> List[Dict]:
         """Verificar materiales próximos a vencer."""
-        fecha_vencimiento = timezone.now().date() + timezone.timedelta(days=days_ahead)
+        return StockAlertService.get_expiring_rows(
+            StockAlertService.get_expiring_queryset(tenant_id, days_ahead)
+        )
+    
+    @staticmethod
+    def sweep_expiring(days_ahead: int = 30) -> Dict[int, Dict]:
+        """Resumen por tenant de lo que vence en los próximos N días y lo vencido recientemente (una consulta)."""
+        hoy = timezone.localdate()
+        filas = CalendarioVencimiento.objects.filter(
+            fecha__gte=StockAlertService.expired_since(),
+            fecha__lte=hoy + timezone.timedelta(days=days_ahead)
+        ).values('tenant_id').annotate(
+            vencidos=Count('id', filter=Q(fecha__lt=hoy)),
+            por_vencer=Count('id', filter=Q(fecha__gte=hoy)),
+            cantidad=Sum('cantidad')
+        ).order_by('tenant_id')
+        return {fila.pop('tenant_id'): fila for fila in filas}
+    
+    @staticmethod
+    def touch_activity(tenant_id: int, claves: Iterable[Tuple[str, int]], fecha=None) -> None:
+        """Registrar un movimiento de los materiales indicados.
         
-        alerts = []
+        Inserta las filas que falten y adelanta ultimo_movimiento en las
+        existentes; nunca lo retrocede si llega un movimiento con fecha anterior.
+        Los tipos sin stock (productos terminados) no se registran.
+        """
+        tipos = InventoryService.get_stock_models()
+        claves = {clave for clave in claves if clave[0] in tipos}
+        if not claves:
+            return
+        fecha = fecha or timezone.now()
         
-        # Verificar MaterialImpresion
-        materiales_vencimiento = MaterialImpresion.objects.filter(
-            tenant_id=tenant_id,
-            fecha_vencimiento__lte=fecha_vencimiento,
-            fecha_vencimiento__isnull=False
+        ActividadMaterial.objects.bulk_create(
+            [
+                ActividadMaterial(tenant_id=tenant_id, item_type=item_type, item_id=item_id, ultimo_movimiento=fecha)
+                for item_type, item_id in claves
+            ],
+            ignore_conflicts=True
         )
         
-        for material in materiales_vencimiento:
-            alerts.append({
-                'item_type': 'material_impresion',
-                'item_id': material.id,
-                'nombre': material.nombre,
-                'fecha_vencimiento': material.fecha_vencimiento,
-                'dias_restantes': (material.fecha_vencimiento - timezone.now().date()).days,
-                'tipo_alerta': 'vencimiento'
-            })
-        
-        # Verificar SoftwareEquipo con licencias
-        licencias_vencimiento = SoftwareEquipo.objects.filter(
-            tenant_id=tenant_id,
-            fecha_vencimiento_licencia__lte=fecha_vencimiento,
-            fecha_vencimiento_licencia__isnull=False
+        por_tipo = defaultdict(list)
+        for item_type, item_id in claves:
+            por_tipo[item_type].append(item_id)
+        condicion = Q()
+        for item_type, item_ids in por_tipo.items():
+            condicion |= Q(item_type=item_type, item_id__in=item_ids)
+        ActividadMaterial.objects.filter(condicion, ultimo_movimiento__lt=fecha).update(
+            ultimo_movimiento=fecha, updated_at=timezone.now()
         )
+    
+    @staticmethod
+    def get_inactive_queryset(tenant_id: int, days_inactive: int = 90):
+        """QuerySet de materiales sin movimientos, del más antiguo al más reciente."""
+        fecha_limite = timezone.now() - timezone.timedelta(days=days_inactive)
+        return ActividadMaterial.objects.filter(
+            tenant_id=tenant_id,
+            item_type__in=list(InventoryService.get_stock_models()),
+            ultimo_movimiento__lt=fecha_limite
+        ).order_by('ultimo_movimiento', 'id')
+    
+    @staticmethod
+    def get_inactive_rows(actividades: Iterable[ActividadMaterial]) -> List[Dict]:
+        """Completar con nombre y stock (una consulta por tipo) una página de inactivos."""
+        actividades = list(actividades)
+        por_tipo = defaultdict(list)
+        for actividad in actividades:
+            por_tipo[actividad.item_type].append(actividad.item_id)
+        
+        materiales = {}
+        modelos = InventoryService.get_stock_models()
+        for item_type, item_ids in por_tipo.items():
+            model = modelos.get(item_type)
+            if model is None:
+                continue
+            for material in model.objects.filter(id__in=item_ids).only('id', 'nombre', 'stock'):
+                materiales[(item_type, material.id)] = material
         
-        for equipo in licencias_vencimiento:
+        ahora = timezone.now()
+        alerts = []
+        for actividad in actividades:
+            material = materiales.get((actividad.item_type, actividad.item_id))
+            if material is None:
+                continue
             alerts.append({
-                'item_type': 'software_equipo',
-                'item_id': equipo.id,
-                'nombre': equipo.nombre,
-                'fecha_vencimiento': equipo.fecha_vencimiento_licencia,
-                'dias_restantes': (equipo.fecha_vencimiento_licencia - timezone.now().date()).days,
-                'tipo_alerta': 'licencia'
+                'item_type': actividad.item_type,
+                'item_id': actividad.item_id,
+                'nombre': material.nombre,
+                'stock_actual': material.stock,
+                'ultimo_movimiento': actividad.ultimo_movimiento,
+                'dias_inactivo': (ahora - actividad.ultimo_movimiento).days,
+                'tipo_alerta': 'inactivo'
             })
-        
         return alerts
     
     @staticmethod
     def check_inactive_materials(tenant_id: int, days_inactive: int = 90) -> List[Dict]:
         """Verificar materiales sin movimiento."""
-        fecha_limite = timezone.now() - timezone.timedelta(days=days_inactive)
-        
-        alerts = []
-        
-        for item_type, model in InventoryService.MODELS_MAP.items():
-            if item_type == 'producto_terminado':
-                continue
-                
-            # Obtener materiales sin movimientos recientes
-            materiales_activos = MovimientoInventario.objects.filter(
-                tenant_id=tenant_id,
-                item_type=item_type,
-                fecha__gte=fecha_limite
-            ).values_list('item_id', flat=True).distinct()
+        return StockAlertService.get_inactive_rows(
+            StockAlertService.get_inactive_queryset(tenant_id, days_inactive)
+        )
+    
+    @staticmethod
+    def rebuild_activity_index(tenant_id: Optional[int] = None, batch_size: int = 1000) -> int:
+        """Reconstruir la actividad de materiales desde el histórico de movimientos."""
+        total = 0
+        # Filas de tipos sin stock registradas antes de excluirlos
+        sin_stock = ActividadMaterial.objects.exclude(item_type__in=list(InventoryService.get_stock_models()))
+        if tenant_id:
+            sin_stock = sin_stock.filter(tenant_id=tenant_id)
+        sin_stock.delete()
+        for item_type, model in InventoryService.get_stock_models().items():
+            actividades = ActividadMaterial.objects.filter(item_type=item_type)
+            queryset = model.objects.all()
+            if tenant_id:
+                actividades = actividades.filter(tenant_id=tenant_id)
+                queryset = queryset.filter(tenant_id=tenant_id)
             
-            materiales_inactivos = model.objects.filter(
-                tenant_id=tenant_id
-            ).exclude(id__in=materiales_activos)
+            queryset = queryset.annotate(
+                ultimo_material=Subquery(
+                    MovimientoMaterial.objects.filter(
+                        material_type=item_type, material_id=OuterRef('id')
+                    ).order_by('-fecha').values('fecha')[:1]
+                )
+            )
+            if item_type == 'varilla':
+                queryset = queryset.annotate(
+                    ultimo_varilla=Subquery(
+                        MovimientoInventario.objects.filter(
+                            varilla_id=OuterRef('id')
+                        ).order_by('-fecha').values('fecha')[:1]
+                    )
+                )
             
-            for material in materiales_inactivos:
-                alerts.append({
-                    'item_type': item_type,
-                    'item_id': material.id,
-                    'nombre': getattr(material, 'nombre', f'{item_type} {material.id}'),
-                    'stock_actual': material.stock_actual,
-                    'dias_inactivo': days_inactive,
-                    'tipo_alerta': 'inactivo'
-                })
-        
-        return alerts
+            with transaction.atomic():
+                actividades.delete()
+                ActividadMaterial.objects.bulk_create(
+                    (
+                        ActividadMaterial(
+                            tenant_id=item.tenant_id,
+                            item_type=item_type,
+                            item_id=item.id,
+                            ultimo_movimiento=max(
+                                fecha for fecha in (
+                                    item.created_at,
+                                    item.ultimo_material,
+                                    getattr(item, 'ultimo_varilla', None)
+                                ) if fecha
+                            )
+                        )
+                        for item in queryset.only('id', 'tenant_id', 'created_at').iterator(chunk_size=batch_size)
+                    ),
+                    batch_size=batch_size
+                )
+            total += actividades.count()
+        return total
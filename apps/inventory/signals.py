@@ -0,0 +1,110 @@
+"""
+Señales para la app de inventario.
+
+Mantienen el índice de alertas de stock bajo (AlertaStock) cada vez
+que cambia el stock de un material, la fecha del último movimiento
+(ActividadMaterial) cada vez que se registra un movimiento, el
+calendario de vencimientos cuando cambian los lotes y el libro de
+inventario cuando el stock se edita directamente (alta o edición).
+"""
+
+from django.db.models.signals import post_init, pre_save, post_save, post_delete
+
+from apps.production.models import MovimientoInventario as MovimientoMaterial
+from .models import (
+    AlertaStock, ActividadMaterial, MovimientoInventario, LoteMaterial, CalendarioVencimiento
+)
+from .services import InventoryLedgerService, InventoryService, StockAlertService
+
+
+def _sync_low_stock(sender, instance, created=False, **kwargs):
+    StockAlertService.sync_low_stock(STOCK_TYPES[sender], [instance])
+    if created:
+        # El alta cuenta como primera actividad del material
+        StockAlertService.touch_activity(
+            instance.tenant_id, [(STOCK_TYPES[sender], instance.id)], instance.created_at
+        )
+    else:
+        CalendarioVencimiento.objects.filter(
+            item_type=STOCK_TYPES[sender], item_id=instance.id
+        ).exclude(nombre=instance.nombre).update(nombre=instance.nombre)
+
+
+def _delete_low_stock(sender, instance, **kwargs):
+    AlertaStock.objects.filter(item_type=STOCK_TYPES[sender], item_id=instance.id).delete()
+    ActividadMaterial.objects.filter(item_type=STOCK_TYPES[sender], item_id=instance.id).delete()
+    CalendarioVencimiento.objects.filter(item_type=STOCK_TYPES[sender], item_id=instance.id).delete()
+
+
+def _touch_material_movement(sender, instance, created, **kwargs):
+    if created:
+        StockAlertService.touch_activity(
+            instance.tenant_id, [(instance.material_type, instance.material_id)], instance.fecha
+        )
+
+
+def _touch_varilla_movement(sender, instance, created, **kwargs):
+    if created:
+        StockAlertService.touch_activity(instance.tenant_id, [('varilla', instance.varilla_id)], instance.fecha)
+
+
+def _remember_stock(sender, instance, raw=False, update_fields=None, using=None, **kwargs):
+    """Leer y bloquear el stock guardado antes de una edición directa del material.
+    
+    StockEditMixin abre la transacción del save, así que el bloqueo se mantiene
+    hasta asentar el ajuste y ningún apply_stock_deltas se cuela en medio.
+    """
+    instance._stock_anterior = None
+    if raw or instance._state.adding or (update_fields is not None and 'stock' not in update_fields):
+        return
+    instance._stock_anterior = sender.objects.using(using).select_for_update().filter(
+        pk=instance.pk
+    ).values_list('stock', flat=True).first()
+
+
+def _ledger_direct_edit(sender, instance, created, raw=False, **kwargs):
+    """Asentar en el libro el stock de un alta o de una edición directa del material."""
+    anterior = 0 if created else getattr(instance, '_stock_anterior', None)
+    actual = instance.stock
+    if raw or anterior is None or actual == anterior:
+        return
+    InventoryLedgerService.append([
+        InventoryLedgerService.build_entry(
+            instance.tenant_id, STOCK_TYPES[sender], instance.id,
+            'inicial' if created else 'ajuste', abs(actual - anterior),
+            delta=actual - anterior,
+            motivo='Alta del material' if created else 'Edición directa del stock'
+        )
+    ])
+
+
+def _remember_lot(sender, instance, **kwargs):
+    instance._clave_original = (
+        instance.tenant_id, instance.item_type, instance.item_id, instance.fecha_vencimiento
+    )
+
+
+def _refresh_lot_calendar(sender, instance, **kwargs):
+    """Recalcular el día actual del lote y, si cambió, el día/material anterior."""
+    actual = (instance.tenant_id, instance.item_type, instance.item_id, instance.fecha_vencimiento)
+    anterior = getattr(instance, '_clave_original', None)
+    StockAlertService.refresh_expiry_calendar(*actual[:3], [actual[3]])
+    if anterior and anterior[0] is not None and anterior != actual:
+        StockAlertService.refresh_expiry_calendar(*anterior[:3], [anterior[3]])
+    instance._clave_original = actual
+
+
+STOCK_TYPES = {model: item_type for item_type, model in InventoryService.get_stock_models().items()}
+
+for model in STOCK_TYPES:
+    post_save.connect(_sync_low_stock, sender=model, dispatch_uid=f'low_stock_sync_{model.__name__}')
+    post_delete.connect(_delete_low_stock, sender=model, dispatch_uid=f'low_stock_delete_{model.__name__}')
+    pre_save.connect(_remember_stock, sender=model, dispatch_uid=f'ledger_pre_save_{model.__name__}')
+    post_save.connect(_ledger_direct_edit, sender=model, dispatch_uid=f'ledger_save_{model.__name__}')
+
+post_save.connect(_touch_material_movement, sender=MovimientoMaterial, dispatch_uid='activity_material_movement')
+post_save.connect(_touch_varilla_movement, sender=MovimientoInventario, dispatch_uid='activity_varilla_movement')
+
+post_init.connect(_remember_lot, sender=LoteMaterial, dispatch_uid='expiry_lot_init')
+post_save.connect(_refresh_lot_calendar, sender=LoteMaterial, dispatch_uid='expiry_lot_save')
+post_delete.connect(_refresh_lot_calendar, sender=LoteMaterial, dispatch_uid='expiry_lot_delete')
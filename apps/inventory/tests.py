@@ -1,3 +1,96 @@
+from datetime import timedelta
+from types import SimpleNamespace
+
+from django.db.models import Sum
 from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from apps.inventory import views
+from apps.inventory.models import AsientoInventario, LibroInventarioError, SnapshotStock, Varilla
+from apps.inventory.services import InventoryLedgerService, InventoryService
+
+
+def crear_varilla(tenant_id=1, stock=10, nombre='V1'):
+    return Varilla.objects.create(
+        tenant_id=tenant_id, nombre=nombre, longitud=1, tipo='madera', stock=stock, minimo=2, precio=1
+    )
+
+
+def saldo_libro(varilla):
+    return AsientoInventario.objects.filter(
+        tenant_id=varilla.tenant_id, item_type='varilla', item_id=varilla.id
+    ).aggregate(total=Sum('delta'))['total']
+
+
+class InventoryLedgerTests(TestCase):
+    """Libro de inventario: solo inserción, stock a una fecha y contadores derivados."""
+
+    def test_libro_es_de_solo_insercion(self):
+        crear_varilla()
+        asiento = AsientoInventario.objects.get()
+        with self.assertRaises(LibroInventarioError):
+            asiento.delete()
+        with self.assertRaises(LibroInventarioError):
+            asiento.save()
+        with self.assertRaises(LibroInventarioError):
+            AsientoInventario.objects.all().update(delta=0)
+        with self.assertRaises(LibroInventarioError):
+            AsientoInventario.objects.all().delete()
+
+    def test_ediciones_directas_y_ajustes_cuadran_con_el_contador(self):
+        varilla = crear_varilla(stock=10)
+        InventoryService.adjust_stock(1, 'varilla', varilla.id, -3)
+        varilla.refresh_from_db()
+        varilla.stock = 20
+        varilla.save()
+        InventoryService.add_materials(1, [{'item_type': 'varilla', 'item_id': varilla.id, 'cantidad': 4}])
+        varilla.refresh_from_db()
+        self.assertEqual(varilla.stock, 24)
+        self.assertEqual(saldo_libro(varilla), 24)
+        self.assertEqual(
+            list(AsientoInventario.objects.order_by('id').values_list('tipo', 'delta')),
+            [('inicial', 10), ('ajuste', -3), ('ajuste', 13), ('entrada', 4)]
+        )
+
+    def test_stock_a_una_fecha_usa_el_snapshot_anterior(self):
+        ahora = timezone.now()
+        varilla = crear_varilla(stock=0)
+        InventoryLedgerService.append([
+            InventoryLedgerService.build_entry(1, 'varilla', varilla.id, 'entrada', 10, fecha=ahora - timedelta(days=3)),
+            InventoryLedgerService.build_entry(1, 'varilla', varilla.id, 'salida', 3, fecha=ahora - timedelta(days=2)),
+            InventoryLedgerService.build_entry(1, 'varilla', varilla.id, 'entrada', 5, fecha=ahora - timedelta(hours=1)),
+        ])
+        InventoryLedgerService.take_snapshot(1, fecha=ahora - timedelta(days=1))
+        self.assertEqual(SnapshotStock.objects.get(item_id=varilla.id).stock, 7)
+
+        self.assertEqual(InventoryLedgerService.stock_at(1, 'varilla', varilla.id, ahora - timedelta(days=2, hours=12)), 10)
+        self.assertEqual(InventoryLedgerService.stock_at(1, 'varilla', varilla.id, ahora), 12)
+
+        # Después del corte la base es el snapshot, no la suma de todo el libro
+        SnapshotStock.objects.filter(item_id=varilla.id).update(stock=100)
+        self.assertEqual(InventoryLedgerService.stock_at(1, 'varilla', varilla.id, ahora), 105)
+        self.assertEqual(InventoryLedgerService.stock_report_at(1, ahora)[('varilla', varilla.id)], 105)
+
+    def test_derive_counters_corrige_desvios(self):
+        varilla = crear_varilla(stock=10)
+        otra = crear_varilla(stock=4, nombre='V2')
+        Varilla.objects.filter(id=varilla.id).update(stock=99)
+
+        self.assertEqual(InventoryLedgerService.derive_counters(1), 1)
+        varilla.refresh_from_db()
+        otra.refresh_from_db()
+        self.assertEqual((varilla.stock, otra.stock), (10, 4))
+        self.assertEqual(InventoryLedgerService.derive_counters(1), 0)
 
-# Create your tests here.
+    def test_stock_a_una_fecha_no_expone_nombres_de_otro_tenant(self):
+        ajena = crear_varilla(tenant_id=2, nombre='Ajena')
+        request = APIRequestFactory().get('/', {
+            'tenant_id': 1, 'fecha': timezone.localdate().isoformat(),
+            'item_type': 'varilla', 'item_id': ajena.id,
+        })
+        force_authenticate(request, user=SimpleNamespace(pk=1, is_authenticated=True, is_active=True))
+        response = views.stock_at_date(request)
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNone(response.data['nombre'])
+        self.assertEqual(response.data['stock'], 0)
@@ -48,8 +48,16 @@ urlpatterns = [
     path('movements/', views.MovimientoInventarioListView.as_view(), name='movimiento-inventario-list'),
     path('movements/<int:pk>/', views.MovimientoInventarioDetailView.as_view(), name='movimiento-inventario-detail'),
     
+    # URLs para Lotes de Materiales
+    path('lotes/', views.LoteMaterialListView.as_view(), name='lote-material-list'),
+    path('lotes/<int:pk>/', views.LoteMaterialDetailView.as_view(), name='lote-material-detail'),
+    
     # URLs especiales para alertas y reportes
     path('alerts/', views.stock_alerts, name='stock-alerts'),
+    path('alerts/inactive/', views.inactive_materials, name='inactive-materials'),
+    path('alerts/expiring/', views.expiring_materials, name='expiring-materials'),
     path('report/', views.stock_report, name='stock-report'),
     path('adjust-stock/', views.adjust_stock, name='adjust-stock'),
+    path('ledger/', views.AsientoInventarioListView.as_view(), name='asiento-inventario-list'),
+    path('stock-at/', views.stock_at_date, name='stock-at-date'),
 ]
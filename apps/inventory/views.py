@@ -5,21 +5,28 @@ Vistas para la app de inventario.
 from rest_framework import generics, status
 from rest_framework.decorators import api_view
 from rest_framework.response import Response
-from django.db.models import F
 from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from collections import defaultdict
+from datetime import datetime, time
 
 from .models import (
     Inventario, Varilla, PinturaAcabado, MaterialImpresion, 
     MaterialRecordatorio, SoftwareEquipo, MaterialPintura, 
-    MaterialDiseno, ProductoTerminado, MovimientoInventario
+    MaterialDiseno, ProductoTerminado, MovimientoInventario, LoteMaterial, AsientoInventario
 )
 from .serializers import (
     InventarioSerializer, VarillaSerializer, PinturaAcabadoSerializer,
     MaterialImpresionSerializer, MaterialRecordatorioSerializer,
     SoftwareEquipoSerializer, MaterialPinturaSerializer, MaterialDisenoSerializer,
     ProductoTerminadoSerializer, MovimientoInventarioSerializer,
-    StockAlertSerializer, StockReportSerializer
+    StockAlertSerializer, StockReportSerializer, InactiveMaterialSerializer,
+    LoteMaterialSerializer, ExpiringMaterialSerializer, AsientoInventarioSerializer, StockAtDateSerializer
 )
+from .services import InventoryService, InventoryLedgerService, StockAlertService
+from apps.tenants.services import get_request_tenant_id
+from fotostudio.pagination import StandardPagination
+from fotostudio.replica import use_replica
 
 
 # Views para Varillas
@@ -216,95 +223,110 @@ class MovimientoInventarioDetailView(generics.RetrieveUpdateDestroyAPIView):
     serializer_class = MovimientoInventarioSerializer
 
 
-# Views especiales para alertas y reportes
-@api_view(['GET'])
-def stock_alerts(request):
-    """Obtener alertas de stock bajo."""
-    tenant_id = request.query_params.get('tenant_id')
-    alerts = []
-    
-    # Verificar stock bajo en todas las categorías
-    models_map = {
-        'varilla': Varilla,
-        'pintura_acabado': PinturaAcabado,
-        'material_impresion': MaterialImpresion,
-        'material_recordatorio': MaterialRecordatorio,
-        'software_equipo': SoftwareEquipo,
-        'material_pintura': MaterialPintura,
-        'material_diseno': MaterialDiseno,
-    }
+# Views para Lotes de Materiales
+class LoteMaterialListView(generics.ListCreateAPIView):
+    """Lista y creación de lotes de materiales."""
+    queryset = LoteMaterial.objects.all()
+    serializer_class = LoteMaterialSerializer
     
-    for item_type, model in models_map.items():
-        if item_type == 'varilla':
-            queryset = model.objects.filter(stock__lte=F('minimo'))
-        else:
-            queryset = model.objects.filter(stock_actual__lte=F('stock_minimo'))
+    def get_queryset(self):
+        queryset = LoteMaterial.objects.all()
+        tenant_id = self.request.query_params.get('tenant_id')
+        item_type = self.request.query_params.get('item_type')
+        item_id = self.request.query_params.get('item_id')
         
         if tenant_id:
             queryset = queryset.filter(tenant_id=tenant_id)
-        
-        for item in queryset:
-            if item_type == 'varilla':
-                stock_actual = item.stock
-                stock_minimo = item.minimo
-            else:
-                stock_actual = item.stock_actual
-                stock_minimo = item.stock_minimo
-            
-            alerts.append({
-                'item_type': item_type,
-                'item_id': item.id,
-                'nombre': getattr(item, 'nombre', f'{item_type} {item.id}'),
-                'stock_actual': stock_actual,
-                'stock_minimo': stock_minimo,
-                'diferencia': stock_actual - stock_minimo,
-                'ubicacion': getattr(item, 'ubicacion', ''),
-                'fecha_alerta': timezone.now()
-            })
-    
-    serializer = StockAlertSerializer(alerts, many=True)
-    return Response(serializer.data)
+        if item_type:
+            queryset = queryset.filter(item_type=item_type)
+        if item_id:
+            queryset = queryset.filter(item_id=item_id)
+        return queryset
+
+
+class LoteMaterialDetailView(generics.RetrieveUpdateDestroyAPIView):
+    """Detalle, actualización y eliminación de lotes de materiales."""
+    queryset = LoteMaterial.objects.all()
+    serializer_class = LoteMaterialSerializer
+
+
+# Views especiales para alertas y reportes
+@api_view(['GET'])
+@use_replica
+def stock_alerts(request):
+    """Obtener alertas de stock bajo (paginadas)."""
+    tenant_id = get_request_tenant_id(request)
+    queryset = StockAlertService.get_low_stock_alerts(tenant_id)
+    
+    paginator = StandardPagination()
+    page = paginator.paginate_queryset(queryset, request)
+    
+    serializer = StockAlertSerializer(StockAlertService.get_low_stock_rows(page), many=True)
+    return paginator.get_paginated_response(serializer.data)
+
+
+@api_view(['GET'])
+def expiring_materials(request):
+    """Obtener materiales vencidos o por vencer en los próximos días (paginados)."""
+    tenant_id = get_request_tenant_id(request)
+    dias = request.query_params.get('dias', '30')
+    
+    if not tenant_id:
+        return Response(
+            {'error': 'tenant_id es requerido'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    try:
+        queryset = StockAlertService.get_expiring_queryset(tenant_id, int(dias))
+    except ValueError:
+        return Response(
+            {'error': 'dias debe ser un número entero'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    paginator = StandardPagination()
+    page = paginator.paginate_queryset(queryset, request)
+    
+    serializer = ExpiringMaterialSerializer(StockAlertService.get_expiring_rows(page), many=True)
+    return paginator.get_paginated_response(serializer.data)
+
+
+@api_view(['GET'])
+def inactive_materials(request):
+    """Obtener materiales sin movimientos en el periodo (paginados)."""
+    tenant_id = get_request_tenant_id(request)
+    dias = request.query_params.get('dias', '90')
+    
+    if not tenant_id:
+        return Response(
+            {'error': 'tenant_id es requerido'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    try:
+        queryset = StockAlertService.get_inactive_queryset(tenant_id, int(dias))
+    except ValueError:
+        return Response(
+            {'error': 'dias debe ser un número entero'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    paginator = StandardPagination()
+    page = paginator.paginate_queryset(queryset, request)
+    
+    serializer = InactiveMaterialSerializer(StockAlertService.get_inactive_rows(page), many=True)
+    return paginator.get_paginated_response(serializer.data)
 
 
 @api_view(['GET'])
+@use_replica
 def stock_report(request):
     """Obtener reporte de stock por categoría."""
-    tenant_id = request.query_params.get('tenant_id')
-    reports = []
-    
-    models_map = {
-        'Varillas': Varilla,
-        'Pinturas y Acabados': PinturaAcabado,
-        'Materiales de Impresión': MaterialImpresion,
-        'Materiales de Recordatorio': MaterialRecordatorio,
-        'Software y Equipos': SoftwareEquipo,
-        'Materiales de Pintura': MaterialPintura,
-        'Materiales de Diseño': MaterialDiseno,
-    }
+    tenant_id = get_request_tenant_id(request)
+    use_snapshot = request.query_params.get('snapshot', '').lower() in ('1', 'true', 'yes')
     
-    for categoria, model in models_map.items():
-        queryset = model.objects.all()
-        if tenant_id:
-            queryset = queryset.filter(tenant_id=tenant_id)
-        
-        total_items = queryset.count()
-        
-        if categoria == 'Varillas':
-            items_stock_bajo = queryset.filter(stock__lte=F('minimo')).count()
-            valor_total = sum(item.stock * item.precio for item in queryset)
-        else:
-            items_stock_bajo = queryset.filter(stock_actual__lte=F('stock_minimo')).count()
-            valor_total = sum(item.stock_actual * item.precio_unitario for item in queryset)
-        
-        porcentaje_stock_bajo = (items_stock_bajo / total_items * 100) if total_items > 0 else 0
-        
-        reports.append({
-            'categoria': categoria,
-            'total_items': total_items,
-            'items_stock_bajo': items_stock_bajo,
-            'valor_total': valor_total,
-            'porcentaje_stock_bajo': round(porcentaje_stock_bajo, 2)
-        })
+    reports = InventoryService.get_stock_report(tenant_id, use_snapshot=use_snapshot)
     
     serializer = StockReportSerializer(reports, many=True)
     return Response(serializer.data)
@@ -312,13 +334,13 @@ def stock_report(request):
 
 @api_view(['POST'])
 def adjust_stock(request):
-    """Ajustar stock de un material."""
+    """Ajustar stock de un material (se asienta en el libro de inventario)."""
     item_type = request.data.get('item_type')
     item_id = request.data.get('item_id')
     cantidad = request.data.get('cantidad')
     motivo = request.data.get('motivo', 'Ajuste manual')
     usuario = request.data.get('usuario')
-    tenant_id = request.data.get('tenant_id')
+    tenant_id = get_request_tenant_id(request, request.data)
     
     if not all([item_type, item_id, cantidad, tenant_id]):
         return Response(
@@ -326,62 +348,126 @@ def adjust_stock(request):
             status=status.HTTP_400_BAD_REQUEST
         )
     
-    # Obtener el modelo correspondiente
-    models_map = {
-        'varilla': Varilla,
-        'pintura_acabado': PinturaAcabado,
-        'material_impresion': MaterialImpresion,
-        'material_recordatorio': MaterialRecordatorio,
-        'software_equipo': SoftwareEquipo,
-        'material_pintura': MaterialPintura,
-        'material_diseno': MaterialDiseno,
-    }
-    
-    if item_type not in models_map:
+    try:
+        item_id = int(item_id)
+        cantidad = int(cantidad)
+    except (TypeError, ValueError):
         return Response(
-            {'error': 'Tipo de material no válido'},
+            {'error': 'item_id y cantidad deben ser números enteros'},
             status=status.HTTP_400_BAD_REQUEST
         )
     
-    try:
-        model = models_map[item_type]
-        item = model.objects.get(id=item_id, tenant_id=tenant_id)
+    ok, mensaje = InventoryService.adjust_stock(
+        int(tenant_id), item_type, item_id, cantidad, motivo=motivo, usuario=usuario
+    )
+    if ok:
+        return Response({'mensaje': mensaje}, status=status.HTTP_201_CREATED)
+    if mensaje.startswith('Material no encontrado'):
+        return Response({'error': mensaje}, status=status.HTTP_404_NOT_FOUND)
+    return Response({'error': mensaje}, status=status.HTTP_400_BAD_REQUEST)
+
+
+# Libro de inventario
+class AsientoInventarioListView(generics.ListAPIView):
+    """Asientos del libro de inventario (solo lectura)."""
+    queryset = AsientoInventario.objects.all()
+    serializer_class = AsientoInventarioSerializer
+    
+    def get_queryset(self):
+        queryset = AsientoInventario.objects.all()
+        tenant_id = self.request.query_params.get('tenant_id')
+        item_type = self.request.query_params.get('item_type')
+        item_id = self.request.query_params.get('item_id')
+        tipo = self.request.query_params.get('tipo')
         
-        # Crear movimiento
-        movimiento = MovimientoInventario.objects.create(
-            tenant_id=tenant_id,
-            item_type=item_type,
-            item_id=item_id,
-            tipo_movimiento='ajuste',
-            cantidad=abs(cantidad),
-            motivo=motivo,
-            usuario=usuario
+        if tenant_id:
+            queryset = queryset.filter(tenant_id=tenant_id)
+        if item_type:
+            queryset = queryset.filter(item_type=item_type)
+        if item_id:
+            queryset = queryset.filter(item_id=item_id)
+        if tipo:
+            queryset = queryset.filter(tipo=tipo)
+        return queryset
+
+
+@api_view(['GET'])
+@use_replica
+def stock_at_date(request):
+    """Stock a una fecha (auditoría), desde el snapshot más cercano y el libro.
+    
+    ``fecha`` acepta fecha-hora ISO o AAAA-MM-DD (fin de ese día). Con
+    item_type e item_id devuelve un solo material; si no, todos (paginados).
+    """
+    tenant_id = get_request_tenant_id(request)
+    fecha = request.query_params.get('fecha')
+    item_type = request.query_params.get('item_type')
+    item_id = request.query_params.get('item_id')
+    
+    if not tenant_id or not fecha:
+        return Response(
+            {'error': 'tenant_id y fecha son requeridos'},
+            status=status.HTTP_400_BAD_REQUEST
         )
-        
-        # Actualizar stock
-        if item_type == 'varilla':
-            item.stock += cantidad
-            if item.stock < 0:
-                item.stock = 0
-        else:
-            item.stock_actual += cantidad
-            if item.stock_actual < 0:
-                item.stock_actual = 0
-        item.save()
-        
-        serializer = MovimientoInventarioSerializer(movimiento)
-        return Response(serializer.data, status=status.HTTP_201_CREATED)
-        
-    except model.DoesNotExist:
+    
+    # Una fecha sola se toma como el final de ese día
+    dia = parse_date(fecha)
+    momento = datetime.combine(dia, time.max) if dia else parse_datetime(fecha)
+    if momento is None:
         return Response(
-            {'error': 'Material no encontrado'},
-            status=status.HTTP_404_NOT_FOUND
+            {'error': 'fecha debe ser AAAA-MM-DD o fecha-hora ISO'},
+            status=status.HTTP_400_BAD_REQUEST
         )
-    except Exception as e:
+    if timezone.is_naive(momento):
+        momento = timezone.make_aware(momento)
+    
+    if item_type and item_type not in InventoryService.get_stock_models():
         return Response(
-            {'error': str(e)},
-            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            {'error': 'Tipo de material no válido'},
+            status=status.HTTP_400_BAD_REQUEST
         )
+    
+    if item_type and item_id:
+        try:
+            item_id = int(item_id)
+        except ValueError:
+            return Response(
+                {'error': 'item_id debe ser un número entero'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        model = InventoryService.get_model_by_type(item_type)
+        nombre = model.objects.filter(
+            tenant_id=tenant_id, id=item_id
+        ).values_list('nombre', flat=True).first()
+        serializer = StockAtDateSerializer({
+            'item_type': item_type,
+            'item_id': item_id,
+            'nombre': nombre,
+            'stock': InventoryLedgerService.stock_at(tenant_id, item_type, item_id, momento),
+        })
+        return Response({'fecha': momento, **serializer.data})
+    
+    stocks = sorted(InventoryLedgerService.stock_report_at(tenant_id, momento, item_type).items())
+    
+    paginator = StandardPagination()
+    page = paginator.paginate_queryset(stocks, request)
+    
+    ids_por_tipo = defaultdict(list)
+    for (tipo, material_id), _ in page:
+        ids_por_tipo[tipo].append(material_id)
+    nombres = {
+        (tipo, material_id): nombre
+        for tipo, ids in ids_por_tipo.items()
+        for material_id, nombre in InventoryService.get_model_by_type(tipo).objects.filter(
+            tenant_id=tenant_id, id__in=ids
+        ).values_list('id', 'nombre')
+    }
+    
+    serializer = StockAtDateSerializer([
+        {'item_type': tipo, 'item_id': material_id, 'nombre': nombres.get((tipo, material_id)), 'stock': stock}
+        for (tipo, material_id), stock in page
+    ], many=True)
+    return paginator.get_paginated_response(serializer.data)
 
 
 # Views legacy para compatibilidad
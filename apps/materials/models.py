@@ -17,6 +17,9 @@ class PinturaAcabado(models.Model):
     class Meta:
         managed = True
         db_table = 'pintura_acabado'
+        indexes = [
+            models.Index(fields=['tenant_id', 'stock', 'minimo'], name='pintura_acabado_stock_idx'),
+        ]
 
     def __str__(self):
         return self.nombre
@@ -36,6 +39,9 @@ class MaterialImpresion(models.Model):
     class Meta:
         managed = True
         db_table = 'material_impresion'
+        indexes = [
+            models.Index(fields=['tenant_id', 'stock', 'minimo'], name='mat_impresion_stock_idx'),
+        ]
 
     def __str__(self):
         return self.nombre
@@ -55,6 +61,9 @@ class MaterialRecordatorio(models.Model):
     class Meta:
         managed = True
         db_table = 'material_recordatorio'
+        indexes = [
+            models.Index(fields=['tenant_id', 'stock', 'minimo'], name='mat_record_stock_idx'),
+        ]
 
     def __str__(self):
         return self.nombre
@@ -74,6 +83,9 @@ class SoftwareEquipo(models.Model):
     class Meta:
         managed = True
         db_table = 'software_equipo'
+        indexes = [
+            models.Index(fields=['tenant_id', 'stock', 'minimo'], name='software_equipo_stock_idx'),
+        ]
 
     def __str__(self):
         return self.nombre
@@ -93,6 +105,9 @@ class MaterialPintura(models.Model):
     class Meta:
         managed = True
         db_table = 'material_pintura'
+        indexes = [
+            models.Index(fields=['tenant_id', 'stock', 'minimo'], name='mat_pintura_stock_idx'),
+        ]
 
     def __str__(self):
         return self.nombre
@@ -112,6 +127,9 @@ class MaterialDiseno(models.Model):
     class Meta:
         managed = True
         db_table = 'material_diseno'
+        indexes = [
+            models.Index(fields=['tenant_id', 'stock', 'minimo'], name='mat_diseno_stock_idx'),
+        ]
 
     def __str__(self):
         return self.nombre
@@ -130,6 +148,9 @@ class ProductoTerminado(models.Model):
     class Meta:
         managed = True
         db_table = 'producto_terminado'
+        indexes = [
+            models.Index(fields=['tenant_id', 'estado'], name='producto_tenant_estado_idx'),
+        ]
 
     def __str__(self):
         return self.nombre
@@ -151,4 +172,7 @@ class MaterialVarilla(models.Model):
 
     class Meta:
         managed = True
-        db_table = 'material_varilla'
\ No newline at end of file
+        db_table = 'material_varilla'
+        indexes = [
+            models.Index(fields=['varilla_id'], name='material_varilla_varilla_idx'),
+        ]
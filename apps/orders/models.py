@@ -20,6 +20,12 @@ class Pedido(models.Model):
     class Meta:
         managed = True
         db_table = 'pedido'
+        indexes = [
+            models.Index(fields=['tenant_id', 'estado'], name='pedido_tenant_estado_idx'),
+            models.Index(fields=['tenant_id', 'created_at'], name='pedido_tenant_created_idx'),
+            models.Index(fields=['tenant_id', 'fecha_pedido'], name='pedido_tenant_fecha_idx'),
+            models.Index(fields=['cliente_id'], name='pedido_cliente_idx'),
+        ]
 
     def __str__(self):
         return f"Pedido {self.id} - {self.fecha_pedido}"
@@ -45,6 +51,10 @@ class DetallePedido(models.Model):
     class Meta:
         managed = True
         db_table = 'detalle_pedido'
+        indexes = [
+            models.Index(fields=['pedido_id'], name='detalle_pedido_pedido_idx'),
+            models.Index(fields=['item_type', 'item_id'], name='detalle_pedido_item_idx'),
+        ]
 
     def __str__(self):
         return f"Detalle {self.id} - {self.item_type}"
\ No newline at end of file
@@ -0,0 +1,129 @@
+"""
+Servicios para la app de pedidos.
+"""
+
+import re
+from calendar import monthrange
+from datetime import date
+from typing import Dict, Optional
+
+from django.db.models import Case, IntegerField, Value, When
+
+from apps.clients.services import ClientSearchService
+from .models import Pedido
+
+
+class OrderSearchService:
+    """Búsqueda de pedidos por predicados tipados.
+    
+    La consulta se descompone en predicados que usan cada uno un índice:
+    
+    - ``123`` o ``#123``: ID exacto del pedido (clave primaria).
+    - ``cliente:45``: ID de cliente (pedido_cliente_idx).
+    - ``pendiente``, ``en proceso``, ``entregados``...: estado (pedido_tenant_estado_idx).
+    - ``2025-03-01``, ``2025-03``, ``2025-03-01..2025-03-15``: fecha del pedido
+      (pedido_tenant_fecha_idx).
+    - El resto de palabras: nombre del cliente, resuelto con el índice de
+      búsqueda de clientes.
+    """
+    
+    ESTADOS = {
+        'pendiente': 'pendiente',
+        'pendientes': 'pendiente',
+        'proceso': 'en_proceso',
+        'en_proceso': 'en_proceso',
+        'entregado': 'entregado',
+        'entregados': 'entregado',
+        'cancelado': 'cancelado',
+        'cancelados': 'cancelado',
+    }
+    # Palabras que acompañan a los estados y no forman parte del nombre
+    VACIAS = {'en', 'de', 'del', 'el', 'la', 'los', 'las'}
+    MAX_CLIENTES = 500
+    # Resultados que se paginan como máximo: afinar la consulta antes que pasar páginas
+    MAX_RESULTADOS = 500
+    
+    FECHA_RE = re.compile(r'^(\d{4})-(\d{2})(?:-(\d{2}))?$')
+    
+    @classmethod
+    def _date_range(cls, texto: str) -> Optional[tuple]:
+        """Rango [desde, hasta] de un día, un mes o un intervalo 'desde..hasta'."""
+        if '..' in texto:
+            desde, _, hasta = texto.partition('..')
+            inicio, fin = cls._date_range(desde), cls._date_range(hasta)
+            if not inicio or not fin:
+                return None
+            return inicio[0], fin[1]
+        
+        coincidencia = cls.FECHA_RE.match(texto)
+        if not coincidencia:
+            return None
+        anio, mes, dia = coincidencia.groups()
+        try:
+            if dia:
+                fecha = date(int(anio), int(mes), int(dia))
+                return fecha, fecha
+            inicio = date(int(anio), int(mes), 1)
+        except ValueError:
+            return None
+        return inicio, inicio.replace(day=monthrange(inicio.year, inicio.month)[1])
+    
+    @classmethod
+    def parse(cls, query: str) -> Dict:
+        """Descomponer la consulta en predicados; ValueError si un predicado es inválido."""
+        predicados = {'palabras': []}
+        for palabra in ClientSearchService.normalize(query).split():
+            if palabra.lstrip('#').isdigit():
+                predicados['id'] = int(palabra.lstrip('#'))
+            elif palabra.startswith('cliente:'):
+                predicados['cliente_id'] = int(palabra.split(':', 1)[1])
+            elif palabra in cls.ESTADOS:
+                predicados['estado'] = cls.ESTADOS[palabra]
+            elif re.match(r'^\d{4}-\d{2}', palabra):
+                rango = cls._date_range(palabra)
+                if rango is None:
+                    raise ValueError(palabra)
+                predicados['fechas'] = rango
+            elif palabra not in cls.VACIAS:
+                predicados['palabras'].append(palabra)
+        return predicados
+    
+    @classmethod
+    def search(cls, query: str, tenant_id: Optional[int] = None):
+        """Queryset de pedidos que cumplen todos los predicados, ordenado por relevancia."""
+        predicados = cls.parse(query)
+        pedidos = Pedido.objects.all()
+        if tenant_id:
+            pedidos = pedidos.filter(tenant_id=tenant_id)
+        
+        if 'id' in predicados:
+            # Un ID exacto identifica el pedido: el resto de predicados no aporta
+            return pedidos.filter(id=predicados['id']).order_by('id')
+        
+        orden = ['-fecha_pedido', '-id']
+        if 'cliente_id' in predicados:
+            pedidos = pedidos.filter(cliente_id=predicados['cliente_id'])
+        if 'estado' in predicados:
+            pedidos = pedidos.filter(estado=predicados['estado'])
+        if 'fechas' in predicados:
+            pedidos = pedidos.filter(fecha_pedido__range=predicados['fechas'])
+        
+        if predicados['palabras']:
+            ranking = ClientSearchService.rank(
+                ' '.join(predicados['palabras']), tenant_id, limite=cls.MAX_CLIENTES
+            )
+            if not ranking:
+                return pedidos.none().order_by(*orden)
+            pedidos = pedidos.filter(cliente_id__in=[cliente_id for cliente_id, _ in ranking]).annotate(
+                relevancia=Case(
+                    *[When(cliente_id=cliente_id, then=Value(puntuacion)) for cliente_id, puntuacion in ranking],
+                    default=Value(0),
+                    output_field=IntegerField()
+                )
+            )
+            orden.insert(0, '-relevancia')
+        elif len(predicados) == 1:
+            # Sin ningún predicado reconocido no se devuelve la tabla completa
+            return pedidos.none().order_by(*orden)
+        
+        return pedidos.order_by(*orden)
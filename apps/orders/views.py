@@ -6,9 +6,11 @@ from rest_framework import generics, status
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework.permissions import IsAuthenticated
-from django.db.models import Q
+from apps.tenants.services import get_request_tenant_id
+from fotostudio.pagination import StandardPagination
 from .models import Pedido
 from .serializers import PedidoSerializer
+from .services import OrderSearchService
 
 
 class OrderListView(generics.ListCreateAPIView):
@@ -24,25 +26,40 @@ class OrderDetailView(generics.RetrieveUpdateDestroyAPIView):
 
 
 class OrderSearchView(APIView):
-    """Búsqueda de pedidos."""
+    """Búsqueda de pedidos.
+    
+    La consulta ``q`` se interpreta como ID, cliente, estado, fecha o nombre
+    del cliente (ver OrderSearchService) y los resultados se paginan.
+    
+    Se pagina por número de página y no con KeysetPagination porque el orden
+    por relevancia no es un cursor sobre (created_at, id). Para no pagar OFFSET
+    y COUNT sobre la consulta anotada, se leen como mucho MAX_RESULTADOS
+    filas en una sola consulta y se paginan en memoria.
+    """
     
     def get(self, request):
         query = request.query_params.get('q', '')
-        if query:
-            orders = Pedido.objects.filter(
-                Q(id__icontains=query) | 
-                Q(cliente_id__icontains=query) |
-                Q(estado__icontains=query)
-            )[:20]
-            serializer = PedidoSerializer(orders, many=True)
-            return Response(serializer.data)
-        return Response([])
-
-
-class OrderStatusView(APIView):
+        if not query:
+            return Response([])
+        
+        try:
+            orders = OrderSearchService.search(query, tenant_id=get_request_tenant_id(request))
+        except ValueError:
+            return Response(
+                {'error': 'Consulta inválida: use ID, cliente:<id>, estado, fecha (AAAA-MM-DD, AAAA-MM o desde..hasta) o nombre'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        paginator = StandardPagination(page_size=20, max_page_size=100)
+        resultados = list(orders[:OrderSearchService.MAX_RESULTADOS])
+        page = paginator.paginate_queryset(resultados, request)
+        serializer = PedidoSerializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
+
+
+class OrderStatusView(generics.ListAPIView):
     """Pedidos por estado."""
+    serializer_class = PedidoSerializer
     
-    def get(self, request, status):
-        orders = Pedido.objects.filter(estado=status)
-        serializer = PedidoSerializer(orders, many=True)
-        return Response(serializer.data)
+    def get_queryset(self):
+        return Pedido.objects.filter(estado=self.kwargs['status'])
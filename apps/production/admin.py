@@ -1,5 +1,8 @@
 from django.contrib import admin
-from .models import Cuadro, DetalleOrden, OrdenProduccion, MovimientoInventario
+from .models import (
+    Cuadro, DetalleOrden, OrdenProduccion, MovimientoInventario,
+    UsoMaterial, CoocurrenciaMaterial, AporteIndiceMaterial, ColaProduccion
+)
 
 
 @admin.register(Cuadro)
@@ -55,4 +58,39 @@ class MovimientoInventarioAdmin(admin.ModelAdmin):
     readonly_fields = ('id', 'fecha', 'created_at')
     ordering = ('-fecha',)
 
+
+@admin.register(UsoMaterial)
+class UsoMaterialAdmin(admin.ModelAdmin):
+    list_display = ('id', 'tenant_id', 'material_type', 'material_id', 'ordenes', 'cantidad_usada', 'cantidad_merma')
+    list_filter = ('material_type',)
+    search_fields = ('tenant_id', 'material_id')
+    readonly_fields = ('id', 'updated_at')
+    ordering = ('-ordenes',)
+
+
+@admin.register(CoocurrenciaMaterial)
+class CoocurrenciaMaterialAdmin(admin.ModelAdmin):
+    list_display = ('id', 'tenant_id', 'material_type', 'material_id', 'relacionado_type', 'relacionado_id', 'ordenes')
+    list_filter = ('material_type',)
+    search_fields = ('tenant_id', 'material_id', 'relacionado_id')
+    readonly_fields = ('id', 'updated_at')
+    ordering = ('-ordenes',)
+
+
+@admin.register(AporteIndiceMaterial)
+class AporteIndiceMaterialAdmin(admin.ModelAdmin):
+    list_display = ('id', 'tenant_id', 'orden_id', 'material_type', 'material_id', 'cantidad_usada', 'cantidad_merma')
+    list_filter = ('material_type',)
+    search_fields = ('tenant_id', 'orden_id', 'material_id')
+    readonly_fields = ('id', 'created_at')
+    ordering = ('-created_at',)
+
+
+@admin.register(ColaProduccion)
+class ColaProduccionAdmin(admin.ModelAdmin):
+    list_display = ('id', 'tenant_id', 'orden_id', 'fecha_entrega', 'complejidad', 'disponibilidad', 'puntuacion')
+    search_fields = ('tenant_id', 'orden_id')
+    readonly_fields = ('id', 'updated_at')
+    ordering = ('tenant_id', '-puntuacion', 'orden_id')
+
 # Register your models here.
@@ -0,0 +1,27 @@
+"""
+Reconstruye el índice de uso y co-ocurrencia de materiales.
+"""
+
+from django.core.management.base import BaseCommand
+
+from apps.production.models import OrdenProduccion
+from apps.production.services import MaterialIndexService
+
+
+class Command(BaseCommand):
+    help = 'Reconstruye las tablas uso_material, coocurrencia_material y aporte_indice_material desde las órdenes completadas.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tenant', type=int, help='Reconstruir solo este tenant')
+
+    def handle(self, *args, **options):
+        if options['tenant']:
+            tenants = [options['tenant']]
+        else:
+            tenants = OrdenProduccion.objects.values_list('tenant_id', flat=True).distinct().order_by('tenant_id')
+
+        for tenant_id in tenants:
+            materiales, pares = MaterialIndexService.rebuild(tenant_id)
+            self.stdout.write(f'Tenant {tenant_id}: {materiales} materiales, {pares} pares')
+
+        self.stdout.write(self.style.SUCCESS('Índice de materiales reconstruido'))
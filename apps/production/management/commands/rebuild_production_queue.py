@@ -0,0 +1,19 @@
+"""
+Reconstruye la cola de prioridad de órdenes de producción pendientes.
+"""
+
+from django.core.management.base import BaseCommand
+
+from apps.production.services import ProductionSchedulerService
+
+
+class Command(BaseCommand):
+    help = 'Reconstruye la tabla cola_produccion desde las órdenes pendientes.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tenant', type=int, help='Reconstruir solo este tenant')
+        parser.add_argument('--batch-size', type=int, default=500, help='Órdenes por lote')
+
+    def handle(self, *args, **options):
+        total = ProductionSchedulerService.rebuild(options['tenant'], options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Cola de producción reconstruida: {total} órdenes'))
@@ -14,12 +14,18 @@ class OrdenProduccion(models.Model):
         ('completada', 'Completada'),
         ('cancelada', 'Cancelada')
     ], default='pendiente')
+    fecha_entrega_estimada = models.DateField(blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         managed = True
         db_table = 'orden_produccion'
+        indexes = [
+            models.Index(fields=['tenant_id', 'estado'], name='orden_tenant_estado_idx'),
+            models.Index(fields=['tenant_id', 'fecha_creacion'], name='orden_tenant_fecha_idx'),
+            models.Index(fields=['tenant_id', 'created_at'], name='orden_tenant_created_idx'),
+        ]
 
     def __str__(self):
         return f"Orden {self.id} - {self.fecha_creacion}"
@@ -45,6 +51,10 @@ class DetalleOrden(models.Model):
     class Meta:
         managed = True
         db_table = 'detalle_orden'
+        indexes = [
+            models.Index(fields=['orden_id', 'varilla_id'], name='detalle_orden_orden_idx'),
+            models.Index(fields=['varilla_id'], name='detalle_orden_varilla_idx'),
+        ]
 
     def __str__(self):
         return f"Detalle Orden {self.orden_id} - Varilla {self.varilla_id}"
@@ -84,6 +94,9 @@ class Cuadro(models.Model):
     class Meta:
         managed = True
         db_table = 'cuadro'
+        indexes = [
+            models.Index(fields=['orden_id'], name='cuadro_orden_idx'),
+        ]
 
     def __str__(self):
         return f"Cuadro {self.id} - {self.descripcion[:50] if self.descripcion else 'Sin descripción'}"
@@ -130,6 +143,117 @@ class MovimientoInventario(models.Model):
     class Meta:
         managed = True
         db_table = 'production_movimiento_inventario'
+        indexes = [
+            models.Index(fields=['tenant_id', 'material_type', 'material_id', 'fecha'], name='mov_material_item_idx'),
+            models.Index(fields=['tenant_id', 'fecha'], name='mov_material_fecha_idx'),
+            models.Index(fields=['tenant_id', 'created_at'], name='mov_material_created_idx'),
+            models.Index(fields=['orden_produccion_id'], name='mov_material_orden_idx'),
+        ]
 
     def __str__(self):
         return f"{self.tipo_movimiento} - {self.cantidad} {self.material_type}"
+
+
+class UsoMaterial(models.Model):
+    """Índice de uso histórico de materiales en órdenes completadas, por tenant."""
+    id = models.AutoField(primary_key=True)
+    tenant_id = models.IntegerField()
+    material_type = models.CharField(max_length=25)
+    material_id = models.IntegerField()
+    ordenes = models.IntegerField(default=0)
+    cantidad_usada = models.IntegerField(default=0)
+    cantidad_merma = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        managed = True
+        db_table = 'uso_material'
+        unique_together = ('tenant_id', 'material_type', 'material_id')
+        indexes = [
+            models.Index(fields=['tenant_id', '-ordenes'], name='uso_material_ranking_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.material_type} {self.material_id} - {self.ordenes} órdenes"
+
+    @property
+    def cantidad_promedio(self):
+        return self.cantidad_usada / self.ordenes if self.ordenes else 0
+
+    @property
+    def eficiencia_historica(self):
+        return 1 - (self.cantidad_merma / max(self.cantidad_usada, 1))
+
+
+class CoocurrenciaMaterial(models.Model):
+    """Número de órdenes completadas en las que dos materiales se usaron juntos."""
+    id = models.AutoField(primary_key=True)
+    tenant_id = models.IntegerField()
+    material_type = models.CharField(max_length=25)
+    material_id = models.IntegerField()
+    relacionado_type = models.CharField(max_length=25)
+    relacionado_id = models.IntegerField()
+    ordenes = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        managed = True
+        db_table = 'coocurrencia_material'
+        unique_together = ('tenant_id', 'material_type', 'material_id', 'relacionado_type', 'relacionado_id')
+
+    def __str__(self):
+        return f"{self.material_type} {self.material_id} + {self.relacionado_type} {self.relacionado_id}"
+
+
+class AporteIndiceMaterial(models.Model):
+    """Uso de un material que una orden completada sumó al índice.
+
+    Al salir la orden de completada se resta exactamente lo que se sumó,
+    aunque sus detalles hayan cambiado entretanto.
+    """
+    id = models.AutoField(primary_key=True)
+    tenant_id = models.IntegerField()
+    orden_id = models.IntegerField()
+    material_type = models.CharField(max_length=25)
+    material_id = models.IntegerField()
+    cantidad_usada = models.IntegerField(default=0)
+    cantidad_merma = models.IntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        managed = True
+        db_table = 'aporte_indice_material'
+        unique_together = ('orden_id', 'material_type', 'material_id')
+        indexes = [
+            models.Index(fields=['tenant_id', 'orden_id'], name='aporte_tenant_orden_idx'),
+        ]
+
+    def __str__(self):
+        return f"Orden {self.orden_id}: {self.material_type} {self.material_id}"
+
+
+class ColaProduccion(models.Model):
+    """Cola de prioridad de órdenes pendientes por tenant.
+
+    La puntuación no depende de la fecha actual, así que el orden de la cola
+    se mantiene estable y solo cambia cuando cambian la orden, sus detalles
+    o el stock de sus materiales.
+    """
+    id = models.AutoField(primary_key=True)
+    tenant_id = models.IntegerField()
+    orden_id = models.IntegerField(unique=True)
+    fecha_entrega = models.DateField()
+    complejidad = models.IntegerField(default=0)
+    disponibilidad = models.DecimalField(max_digits=5, decimal_places=4, default=1)
+    puntuacion = models.IntegerField()
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        managed = True
+        db_table = 'cola_produccion'
+        indexes = [
+            models.Index(fields=['tenant_id', '-puntuacion', 'orden_id'], name='cola_produccion_prioridad_idx'),
+        ]
+
+    def __str__(self):
+        return f"Orden {self.orden_id} - {self.puntuacion}"
@@ -61,7 +61,7 @@ class OrdenProduccionSerializer(serializers.ModelSerializer):
         model = OrdenProduccion
         fields = [
             'id', 'tenant_id', 'fecha_creacion', 'solicitado_por', 'responsable_produccion',
-            'estado', 'created_at', 'updated_at', 'numero_orden'
+            'estado', 'fecha_entrega_estimada', 'created_at', 'updated_at', 'numero_orden'
         ]
         read_only_fields = ('id', 'created_at', 'updated_at', 'numero_orden')
         extra_kwargs = {
@@ -95,6 +95,28 @@ class MovimientoInventarioSerializer(serializers.ModelSerializer):
         }
 
 
+class ProductionUsageSerializer(serializers.Serializer):
+    """Entrada del registro de uso y merma de un material de una orden."""
+    orden_id = serializers.IntegerField()
+    material_type = serializers.CharField()
+    material_id = serializers.IntegerField()
+    cantidad_usada = serializers.IntegerField(min_value=0)
+    cantidad_merma = serializers.IntegerField(min_value=0, required=False, default=0)
+    usuario = serializers.CharField(required=False, allow_null=True, allow_blank=True)
+
+
+class ProductionBatchSerializer(serializers.Serializer):
+    """Entrada del registro en lote de uso y merma de una orden.
+    
+    Cada línea debe ser un objeto; sus campos los valida el servicio línea a
+    línea para poder informar cuáles fallan.
+    """
+    orden_id = serializers.IntegerField()
+    lineas = serializers.ListField(child=serializers.DictField(), allow_empty=False)
+    usuario = serializers.CharField(required=False, allow_null=True, allow_blank=True)
+    atomico = serializers.BooleanField(required=False, default=False)
+
+
 class ProductionReportSerializer(serializers.Serializer):
     """Serializer para reportes de producción."""
     periodo = serializers.CharField()
@@ -104,6 +126,7 @@ class ProductionReportSerializer(serializers.Serializer):
     ordenes_canceladas = serializers.IntegerField()
     eficiencia = serializers.DecimalField(max_digits=5, decimal_places=2)
     total_merma = serializers.IntegerField()
+    tiempo_promedio_dias = serializers.DecimalField(max_digits=8, decimal_places=2, required=False)
 
 
 class WasteReportSerializer(serializers.Serializer):
@@ -112,6 +135,7 @@ class WasteReportSerializer(serializers.Serializer):
     material_id = serializers.IntegerField()
     material_nombre = serializers.CharField()
     cantidad_merma = serializers.IntegerField()
+    cantidad_usada = serializers.IntegerField(required=False)
     porcentaje_merma = serializers.DecimalField(max_digits=5, decimal_places=2)
     ordenes_afectadas = serializers.IntegerField()
 
@@ -126,3 +150,35 @@ class ProductionEfficiencySerializer(serializers.Serializer):
     materiales_usados = serializers.IntegerField()
     materiales_merma = serializers.IntegerField()
     eficiencia = serializers.DecimalField(max_digits=5, decimal_places=2)
+
+
+class MaterialConsumptionSerializer(serializers.Serializer):
+    """Serializer para consumo de materiales."""
+    material_type = serializers.CharField()
+    material_id = serializers.IntegerField()
+    material_nombre = serializers.CharField()
+    cantidad_usada = serializers.IntegerField()
+    cantidad_merma = serializers.IntegerField()
+    ordenes_afectadas = serializers.IntegerField()
+    total_consumido = serializers.IntegerField()
+    porcentaje_merma = serializers.DecimalField(max_digits=5, decimal_places=2)
+
+
+class MaterialSuggestionSerializer(serializers.Serializer):
+    """Serializer para sugerencias de materiales."""
+    material_type = serializers.CharField()
+    material_id = serializers.IntegerField()
+    cantidad_sugerida = serializers.DecimalField(max_digits=10, decimal_places=2)
+    eficiencia_historica = serializers.DecimalField(max_digits=6, decimal_places=4)
+    frecuencia = serializers.IntegerField()
+
+
+class ProductionSequenceSerializer(serializers.Serializer):
+    """Serializer para la secuencia de producción."""
+    orden_id = serializers.IntegerField()
+    numero_orden = serializers.CharField()
+    prioridad = serializers.IntegerField()
+    dias_restantes = serializers.IntegerField()
+    complejidad = serializers.IntegerField()
+    disponibilidad = serializers.DecimalField(max_digits=5, decimal_places=4)
+    fecha_entrega = serializers.DateField()
@@ -2,14 +2,23 @@
 Servicios para la app de producción.
 """
 
-from django.db.models import Sum, Count, Avg, Q
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Sum, Count, Avg, Q, F, ExpressionWrapper, DurationField, OuterRef, Subquery
+from django.db.models.functions import TruncDate
 from django.utils import timezone
-from datetime import timedelta
-from typing import Dict, List, Optional, Tuple
+from collections import defaultdict
+from datetime import date, timedelta
+from typing import Dict, Iterator, List, Optional, Tuple
 from decimal import Decimal
 
-from .models import OrdenProduccion, DetalleOrden, Cuadro, MovimientoInventario
-from apps.inventory.services import InventoryService
+from .models import (
+    OrdenProduccion, DetalleOrden, Cuadro, MovimientoInventario,
+    UsoMaterial, CoocurrenciaMaterial, AporteIndiceMaterial, ColaProduccion
+)
+from apps.inventory.models import Varilla
+from apps.inventory.services import InventoryService, bulk_upsert
 
 
 class ProductionService:
@@ -64,70 +73,197 @@ class ProductionService:
                                 usuario: str = None) -> Tuple[bool, str]:
         """Registrar uso de materiales en producción."""
         try:
-            orden = OrdenProduccion.objects.get(id=orden_id, tenant_id=tenant_id)
-            
-            # Validar disponibilidad de stock
-            disponible, mensaje = InventoryService.validate_stock_availability(
-                tenant_id, material_type, material_id, cantidad_usada
-            )
-            if not disponible:
-                return False, mensaje
-            
-            # Obtener o crear detalle de orden
-            detalle, created = DetalleOrden.objects.get_or_create(
-                orden_id=orden,
-                material_type=material_type,
-                material_id=material_id,
-                defaults={
-                    'cantidad_planificada': 0,
-                    'cantidad_usada': 0,
-                    'cantidad_merma': 0
-                }
+            resultado = ProductionService.register_production_batch(
+                tenant_id, orden_id,
+                [{
+                    'material_type': material_type,
+                    'material_id': material_id,
+                    'cantidad_usada': cantidad_usada,
+                    'cantidad_merma': cantidad_merma
+                }],
+                usuario=usuario
             )
-            
-            # Actualizar cantidades
-            detalle.cantidad_usada += cantidad_usada
-            detalle.cantidad_merma += cantidad_merma
-            detalle.save()
-            
-            # Crear movimientos de inventario
-            if cantidad_usada > 0:
-                InventoryService.create_movement(
-                    tenant_id=tenant_id,
-                    item_type=material_type,
-                    item_id=material_id,
-                    tipo_movimiento='uso_produccion',
-                    cantidad=cantidad_usada,
-                    motivo=f'Uso en producción - Orden {orden.numero_orden}',
-                    orden_produccion_id=orden_id,
-                    usuario=usuario
-                )
-            
-            if cantidad_merma > 0:
-                InventoryService.create_movement(
-                    tenant_id=tenant_id,
-                    item_type=material_type,
-                    item_id=material_id,
-                    tipo_movimiento='merma',
-                    cantidad=cantidad_merma,
-                    motivo=f'Merma en producción - Orden {orden.numero_orden}',
-                    orden_produccion_id=orden_id,
-                    usuario=usuario
-                )
-            
-            # Actualizar stock
-            model = InventoryService.get_model_by_type(material_type)
-            if model:
-                item = model.objects.get(id=material_id, tenant_id=tenant_id)
-                item.stock_actual -= cantidad_usada
-                item.save()
-            
-            return True, "Producción registrada correctamente"
-            
         except OrdenProduccion.DoesNotExist:
             return False, "Orden de producción no encontrada"
         except Exception as e:
             return False, f"Error al registrar producción: {str(e)}"
+        
+        linea = resultado['resultados'][0]
+        if not linea['ok']:
+            return False, linea['mensaje']
+        return True, "Producción registrada correctamente"
+    
+    @staticmethod
+    def register_production_batch(tenant_id: int, orden_id: int, lineas: List[Dict],
+                                  usuario: str = None, atomico: bool = False) -> Dict:
+        """Registrar en lote el uso y la merma de materiales de una orden.
+        
+        Cada línea trae material_type, material_id, cantidad_usada y
+        opcionalmente cantidad_merma. Todo se procesa en una transacción:
+        los materiales se bloquean con una consulta por tipo, el stock se
+        descuenta con un UPDATE por tipo y los detalles de orden y
+        movimientos se escriben con operaciones bulk. Las líneas inválidas
+        se reportan y se omiten; con ``atomico`` cualquier error cancela
+        el lote completo.
+        
+        Lanza OrdenProduccion.DoesNotExist si la orden no existe.
+        """
+        resultados = []
+        validas = []
+        for indice, linea in enumerate(lineas):
+            resultado = {
+                'linea': indice,
+                'material_type': linea.get('material_type'),
+                'material_id': linea.get('material_id'),
+                'ok': False,
+                'mensaje': ''
+            }
+            resultados.append(resultado)
+            try:
+                material_id = int(linea['material_id'])
+                cantidad_usada = int(linea.get('cantidad_usada') or 0)
+                cantidad_merma = int(linea.get('cantidad_merma') or 0)
+            except (KeyError, TypeError, ValueError):
+                resultado['mensaje'] = "Línea inválida: material_id y cantidades deben ser enteros"
+                continue
+            
+            material_type = linea.get('material_type')
+            if material_type not in InventoryService.get_stock_models():
+                resultado['mensaje'] = f"Tipo de material no válido: {material_type}"
+            elif cantidad_usada < 0 or cantidad_merma < 0:
+                resultado['mensaje'] = "Las cantidades no pueden ser negativas"
+            elif cantidad_usada == 0 and cantidad_merma == 0:
+                resultado['mensaje'] = "La línea no registra uso ni merma"
+            else:
+                validas.append((resultado, material_type, material_id, cantidad_usada, cantidad_merma))
+        
+        with transaction.atomic():
+            orden = OrdenProduccion.objects.get(id=orden_id, tenant_id=tenant_id)
+            
+            por_tipo = defaultdict(list)
+            for linea in validas:
+                por_tipo[linea[1]].append(linea)
+            
+            aplicadas = []
+            items_por_tipo = {}
+            deltas_por_tipo = defaultdict(lambda: defaultdict(int))
+            # Orden fijo de tipos para que transacciones concurrentes bloqueen en el mismo orden
+            for material_type in sorted(por_tipo):
+                items = InventoryService.lock_items(
+                    tenant_id, material_type, [linea[2] for linea in por_tipo[material_type]], strict=False
+                )
+                items_por_tipo[material_type] = items
+                deltas = deltas_por_tipo[material_type]
+                
+                for resultado, _, material_id, cantidad_usada, cantidad_merma in por_tipo[material_type]:
+                    item = items.get(material_id)
+                    if item is None:
+                        resultado['mensaje'] = "Material no encontrado"
+                        continue
+                    disponible = item.stock + deltas[material_id]
+                    if disponible < cantidad_usada:
+                        resultado['mensaje'] = (
+                            f"Stock insuficiente. Disponible: {disponible}, Requerido: {cantidad_usada}"
+                        )
+                        continue
+                    deltas[material_id] -= cantidad_usada
+                    aplicadas.append((resultado, material_type, material_id, cantidad_usada, cantidad_merma))
+            
+            hay_errores = len(aplicadas) < len(resultados)
+            if atomico and hay_errores:
+                transaction.set_rollback(True)
+                for resultado, *_ in aplicadas:
+                    resultado['mensaje'] = "No aplicada: el lote tiene líneas con error"
+                return {
+                    'orden_id': orden.id,
+                    'procesadas': 0,
+                    'fallidas': len(resultados),
+                    'resultados': resultados
+                }
+            
+            # Stock: un UPDATE por tipo
+            for material_type, deltas in deltas_por_tipo.items():
+                deltas = {material_id: delta for material_id, delta in deltas.items() if delta}
+                if deltas:
+                    InventoryService.apply_stock_deltas(material_type, items_por_tipo[material_type], deltas)
+            
+            # Detalles de orden (solo las varillas tienen detalle)
+            usos_varilla = defaultdict(lambda: [0, 0])
+            for _, material_type, material_id, cantidad_usada, cantidad_merma in aplicadas:
+                if material_type == 'varilla':
+                    usos_varilla[material_id][0] += cantidad_usada
+                    usos_varilla[material_id][1] += cantidad_merma
+            
+            if usos_varilla:
+                existentes = {
+                    detalle.varilla_id: detalle
+                    for detalle in DetalleOrden.objects.select_for_update().filter(
+                        orden_id=orden.id, varilla_id__in=usos_varilla.keys()
+                    )
+                }
+                ahora = timezone.now()
+                actualizar, crear = [], []
+                for varilla_id, (usada, merma) in usos_varilla.items():
+                    detalle = existentes.get(varilla_id)
+                    if detalle:
+                        detalle.cant_varilla_usada = F('cant_varilla_usada') + usada
+                        detalle.merma = F('merma') + merma
+                        detalle.updated_at = ahora
+                        actualizar.append(detalle)
+                    else:
+                        crear.append(DetalleOrden(
+                            orden_id=orden.id,
+                            varilla_id=varilla_id,
+                            cant_varilla_usada=usada,
+                            merma=merma
+                        ))
+                if actualizar:
+                    DetalleOrden.objects.bulk_update(actualizar, ['cant_varilla_usada', 'merma', 'updated_at'])
+                if crear:
+                    DetalleOrden.objects.bulk_create(crear)
+            
+            # Movimientos de inventario en un solo INSERT
+            movimientos = []
+            for resultado, material_type, material_id, cantidad_usada, cantidad_merma in aplicadas:
+                if cantidad_usada > 0:
+                    movimientos.append(InventoryService.build_movement(
+                        tenant_id=tenant_id,
+                        item_type=material_type,
+                        item_id=material_id,
+                        tipo_movimiento='uso_produccion',
+                        cantidad=cantidad_usada,
+                        motivo=f'Uso en producción - Orden {orden.numero_orden}',
+                        orden_produccion_id=orden.id,
+                        usuario=usuario
+                    ))
+                if cantidad_merma > 0:
+                    movimientos.append(InventoryService.build_movement(
+                        tenant_id=tenant_id,
+                        item_type=material_type,
+                        item_id=material_id,
+                        tipo_movimiento='merma',
+                        cantidad=cantidad_merma,
+                        motivo=f'Merma en producción - Orden {orden.numero_orden}',
+                        orden_produccion_id=orden.id,
+                        usuario=usuario
+                    ))
+                resultado['ok'] = True
+                resultado['mensaje'] = "Registrada"
+            InventoryService.save_movements(movimientos)
+            
+            # El stock consumido cambia la disponibilidad de las órdenes en cola
+            if usos_varilla:
+                varilla_ids = list(usos_varilla)
+                transaction.on_commit(
+                    lambda: ProductionSchedulerService.refresh_for_materials(tenant_id, varilla_ids)
+                )
+        
+        return {
+            'orden_id': orden.id,
+            'procesadas': len(aplicadas),
+            'fallidas': len(resultados) - len(aplicadas),
+            'resultados': resultados
+        }
     
     @staticmethod
     def create_product(tenant_id: int, orden_id: int, nombre: str, descripcion: str = None,
@@ -182,49 +318,110 @@ class ProductionService:
         except Exception as e:
             return False, f"Error al completar orden: {str(e)}"
     
+    @staticmethod
+    def _efficiency(total_planificado: int, total_usado: int, total_merma: int) -> float:
+        if total_planificado > 0:
+            return round(((total_usado - total_merma) / total_planificado) * 100, 2)
+        return 0
+    
+    @staticmethod
+    def get_order_totals(orden_ids) -> Dict[int, Dict]:
+        """Totales planificado/usado/merma por orden en una sola consulta GROUP BY."""
+        filas = DetalleOrden.objects.filter(orden_id__in=orden_ids).values('orden_id').annotate(
+            total_planificado=Sum('cant_varilla_plan'),
+            total_usado=Sum('cant_varilla_usada'),
+            total_merma=Sum('merma')
+        ).order_by()
+        return {fila['orden_id']: fila for fila in filas}
+    
     @staticmethod
     def calculate_efficiency(orden_id: int) -> Dict:
         """Calcular eficiencia de una orden de producción."""
         try:
             orden = OrdenProduccion.objects.get(id=orden_id)
-            detalles = orden.detalles.all()
-            
-            total_planificado = sum(d.cantidad_planificada for d in detalles)
-            total_usado = sum(d.cantidad_usada for d in detalles)
-            total_merma = sum(d.cantidad_merma for d in detalles)
-            
-            if total_planificado > 0:
-                eficiencia = ((total_usado - total_merma) / total_planificado) * 100
-            else:
-                eficiencia = 0
-            
-            return {
-                'orden_id': orden_id,
-                'numero_orden': orden.numero_orden,
-                'total_planificado': total_planificado,
-                'total_usado': total_usado,
-                'total_merma': total_merma,
-                'eficiencia': round(eficiencia, 2),
-                'dias_produccion': (orden.updated_at.date() - orden.fecha_creacion).days
-            }
-            
         except OrdenProduccion.DoesNotExist:
             return {'error': 'Orden no encontrada'}
+        
+        totales = ProductionService.get_order_totals([orden.id]).get(orden.id, {})
+        total_planificado = totales.get('total_planificado') or 0
+        total_usado = totales.get('total_usado') or 0
+        total_merma = totales.get('total_merma') or 0
+        
+        return {
+            'orden_id': orden_id,
+            'numero_orden': orden.numero_orden,
+            'total_planificado': total_planificado,
+            'total_usado': total_usado,
+            'total_merma': total_merma,
+            'eficiencia': ProductionService._efficiency(total_planificado, total_usado, total_merma),
+            'dias_produccion': (orden.updated_at.date() - orden.fecha_creacion).days
+        }
+    
+    @staticmethod
+    def get_completed_orders(tenant_id: int, periodo_dias: int = 30):
+        """Órdenes completadas del periodo, de la más reciente a la más antigua."""
+        return ProductionService.get_period_orders(tenant_id, periodo_dias).filter(
+            estado='completada'
+        ).order_by('-created_at', '-id')
     
     @staticmethod
-    def get_production_report(tenant_id: int, periodo_dias: int = 30) -> Dict:
-        """Obtener reporte de producción."""
-        fecha_inicio = timezone.now() - timedelta(days=periodo_dias)
+    def get_efficiency_rows(ordenes) -> List[Dict]:
+        """Filas de eficiencia para una página de órdenes (una consulta de totales)."""
+        ordenes = list(ordenes)
+        totales = ProductionService.get_order_totals([orden.id for orden in ordenes])
         
-        queryset = OrdenProduccion.objects.filter(
-            tenant_id=tenant_id,
-            fecha_creacion__gte=fecha_inicio
+        eficiencia_data = []
+        for orden in ordenes:
+            fila = totales.get(orden.id, {})
+            total_planificado = fila.get('total_planificado') or 0
+            total_usado = fila.get('total_usado') or 0
+            total_merma = fila.get('total_merma') or 0
+            
+            eficiencia_data.append({
+                'orden_id': orden.id,
+                'numero_orden': orden.numero_orden,
+                'fecha_creacion': orden.fecha_creacion,
+                'fecha_completada': orden.updated_at.date(),
+                'dias_produccion': (orden.updated_at.date() - orden.fecha_creacion).days,
+                'materiales_usados': total_usado,
+                'materiales_merma': total_merma,
+                'eficiencia': ProductionService._efficiency(total_planificado, total_usado, total_merma)
+            })
+        
+        return eficiencia_data
+    
+    @staticmethod
+    def get_production_report(tenant_id: int, periodo_dias: int = 30,
+                              fecha_desde: date = None, fecha_hasta: date = None) -> Dict:
+        """Obtener reporte de producción.
+        
+        Conteos por estado y tiempo promedio de producción se calculan en
+        una sola consulta de agregados condicionales; la merma total en
+        otra. Sin ``fecha_desde`` se usan los últimos ``periodo_dias`` días.
+        """
+        if fecha_desde:
+            queryset = OrdenProduccion.objects.filter(tenant_id=tenant_id, fecha_creacion__gte=fecha_desde)
+            periodo = f"{fecha_desde.isoformat()} - {(fecha_hasta or timezone.localdate()).isoformat()}"
+        else:
+            queryset = ProductionService.get_period_orders(tenant_id, periodo_dias)
+            periodo = f"{periodo_dias} días"
+        if fecha_hasta:
+            queryset = queryset.filter(fecha_creacion__lte=fecha_hasta)
+        
+        duracion = ExpressionWrapper(
+            TruncDate('updated_at') - F('fecha_creacion'),
+            output_field=DurationField()
+        )
+        resumen = queryset.aggregate(
+            total_ordenes=Count('id'),
+            ordenes_completadas=Count('id', filter=Q(estado='completada')),
+            ordenes_en_proceso=Count('id', filter=Q(estado='en_proceso')),
+            ordenes_canceladas=Count('id', filter=Q(estado='cancelada')),
+            tiempo_promedio=Avg(duracion, filter=Q(estado='completada'))
         )
         
-        total_ordenes = queryset.count()
-        ordenes_completadas = queryset.filter(estado='completada').count()
-        ordenes_en_proceso = queryset.filter(estado='en_proceso').count()
-        ordenes_canceladas = queryset.filter(estado='cancelada').count()
+        total_ordenes = resumen['total_ordenes']
+        ordenes_completadas = resumen['ordenes_completadas']
         
         # Calcular eficiencia general
         if total_ordenes > 0:
@@ -234,186 +431,549 @@ class ProductionService:
         
         # Calcular merma total
         total_merma = DetalleOrden.objects.filter(
-            orden_id__in=queryset
+            orden_id__in=queryset.values('id')
         ).aggregate(
-            total=Sum('cantidad_merma')
+            total=Sum('merma')
         )['total'] or 0
         
-        # Calcular tiempo promedio de producción
-        ordenes_completadas_objs = queryset.filter(estado='completada')
-        if ordenes_completadas_objs.exists():
-            tiempos = []
-            for orden in ordenes_completadas_objs:
-                tiempo = (orden.updated_at.date() - orden.fecha_creacion).days
-                tiempos.append(tiempo)
-            tiempo_promedio = sum(tiempos) / len(tiempos)
-        else:
-            tiempo_promedio = 0
+        tiempo_promedio = resumen['tiempo_promedio']
+        tiempo_promedio_dias = tiempo_promedio.total_seconds() / 86400 if tiempo_promedio else 0
         
         return {
-            'periodo': f"{periodo_dias} días",
+            'periodo': periodo,
             'total_ordenes': total_ordenes,
             'ordenes_completadas': ordenes_completadas,
-            'ordenes_en_proceso': ordenes_en_proceso,
-            'ordenes_canceladas': ordenes_canceladas,
+            'ordenes_en_proceso': resumen['ordenes_en_proceso'],
+            'ordenes_canceladas': resumen['ordenes_canceladas'],
             'eficiencia': round(eficiencia, 2),
             'total_merma': total_merma,
-            'tiempo_promedio_dias': round(tiempo_promedio, 2)
+            'tiempo_promedio_dias': round(tiempo_promedio_dias, 2)
         }
     
     @staticmethod
-    def get_waste_analysis(tenant_id: int, periodo_dias: int = 30) -> List[Dict]:
-        """Obtener análisis de mermas por material."""
-        fecha_inicio = timezone.now() - timedelta(days=periodo_dias)
-        
-        queryset = DetalleOrden.objects.filter(
-            orden_id__tenant_id=tenant_id,
-            orden_id__fecha_creacion__gte=fecha_inicio,
-            cantidad_merma__gt=0
+    def get_period_orders(tenant_id: int, periodo_dias: int = 30):
+        """Órdenes de producción del tenant creadas en los últimos ``periodo_dias``."""
+        fecha_inicio = timezone.localdate() - timedelta(days=int(periodo_dias))
+        return OrdenProduccion.objects.filter(
+            tenant_id=tenant_id,
+            fecha_creacion__gte=fecha_inicio
         )
+    
+    @staticmethod
+    def _cached_report(nombre: str, params: tuple, builder):
+        """Reutilizar un reporte ya calculado para el mismo periodo y filtros."""
+        key = f"production:{nombre}:" + ":".join(str(p) for p in params)
+        data = cache.get(key)
+        if data is None:
+            data = builder()
+            cache.set(key, data, getattr(settings, 'PRODUCTION_REPORT_CACHE_TTL', 300))
+        return data
+    
+    @staticmethod
+    def get_waste_analysis(tenant_id: int, periodo_dias: int = 30, material_type: str = None,
+                           use_snapshot: bool = False) -> List[Dict]:
+        """Obtener análisis de mermas por material.
         
-        # Agrupar por material
-        waste_data = {}
-        for detalle in queryset:
-            key = f"{detalle.material_type}_{detalle.material_id}"
-            if key not in waste_data:
-                waste_data[key] = {
-                    'material_type': detalle.material_type,
-                    'material_id': detalle.material_id,
-                    'material_nombre': f"{detalle.material_type} - ID: {detalle.material_id}",
-                    'cantidad_merma': 0,
-                    'cantidad_usada': 0,
-                    'ordenes_afectadas': 0
-                }
-            
-            waste_data[key]['cantidad_merma'] += detalle.cantidad_merma
-            waste_data[key]['cantidad_usada'] += detalle.cantidad_usada
-            waste_data[key]['ordenes_afectadas'] += 1
-        
-        # Calcular porcentajes y agregar al resultado
-        for key, data in waste_data.items():
-            if data['cantidad_usada'] > 0:
-                data['porcentaje_merma'] = round((data['cantidad_merma'] / data['cantidad_usada']) * 100, 2)
-            else:
-                data['porcentaje_merma'] = 0
+        Una sola consulta GROUP BY sobre los detalles de las órdenes del
+        periodo devuelve merma, uso y órdenes afectadas por material. Con
+        ``use_snapshot`` se reutiliza el resultado cacheado del periodo.
+        """
+        if use_snapshot:
+            return ProductionService._cached_report(
+                'waste', (tenant_id, periodo_dias, material_type or 'all'),
+                lambda: ProductionService.get_waste_analysis(tenant_id, periodo_dias, material_type)
+            )
         
-        return list(waste_data.values())
+        # Los detalles de orden solo registran varillas
+        if material_type and material_type != 'varilla':
+            return []
+        
+        filas = DetalleOrden.objects.filter(
+            orden_id__in=ProductionService.get_period_orders(tenant_id, periodo_dias).values('id')
+        ).values('varilla_id').annotate(
+            cantidad_merma=Sum('merma'),
+            cantidad_usada=Sum('cant_varilla_usada'),
+            ordenes_afectadas=Count('orden_id', distinct=True, filter=Q(merma__gt=0))
+        ).filter(cantidad_merma__gt=0).order_by('-cantidad_merma')
+        
+        waste_data = []
+        for fila in filas:
+            cantidad_usada = fila['cantidad_usada'] or 0
+            waste_data.append({
+                'material_type': 'varilla',
+                'material_id': fila['varilla_id'],
+                'material_nombre': f"varilla - ID: {fila['varilla_id']}",
+                'cantidad_merma': fila['cantidad_merma'],
+                'cantidad_usada': cantidad_usada,
+                'ordenes_afectadas': fila['ordenes_afectadas'],
+                'porcentaje_merma': round((fila['cantidad_merma'] / cantidad_usada) * 100, 2) if cantidad_usada > 0 else 0
+            })
+        
+        return waste_data
     
     @staticmethod
-    def get_material_consumption_report(tenant_id: int, periodo_dias: int = 30) -> List[Dict]:
-        """Obtener reporte de consumo de materiales."""
-        fecha_inicio = timezone.now() - timedelta(days=periodo_dias)
+    def iter_material_consumption(tenant_id: int, periodo_dias: int = 30,
+                                  chunk_size: int = 2000) -> Iterator[Dict]:
+        """Iterar el consumo de materiales del periodo sin cargarlo completo en memoria.
+        
+        Una consulta GROUP BY por material suma uso y merma y cuenta las
+        órdenes distintas; las filas se leen del cursor en bloques.
+        """
+        fecha_inicio = timezone.now() - timedelta(days=int(periodo_dias))
         
-        movimientos = MovimientoInventario.objects.filter(
+        filas = MovimientoInventario.objects.filter(
             tenant_id=tenant_id,
             fecha__gte=fecha_inicio,
             tipo_movimiento__in=['uso_produccion', 'merma']
-        )
+        ).values('material_type', 'material_id').annotate(
+            cantidad_usada=Sum('cantidad', filter=Q(tipo_movimiento='uso_produccion')),
+            cantidad_merma=Sum('cantidad', filter=Q(tipo_movimiento='merma')),
+            ordenes_afectadas=Count('orden_produccion_id', distinct=True)
+        ).order_by('material_type', 'material_id')
         
-        consumption_data = {}
-        for movimiento in movimientos:
-            key = f"{movimiento.material_type}_{movimiento.material_id}"
-            if key not in consumption_data:
-                consumption_data[key] = {
-                    'material_type': movimiento.material_type,
-                    'material_id': movimiento.material_id,
-                    'material_nombre': f"{movimiento.material_type} - ID: {movimiento.material_id}",
-                    'cantidad_usada': 0,
-                    'cantidad_merma': 0,
-                    'ordenes_afectadas': set()
+        for fila in filas.iterator(chunk_size=chunk_size):
+            cantidad_usada = fila['cantidad_usada'] or 0
+            cantidad_merma = fila['cantidad_merma'] or 0
+            total_consumido = cantidad_usada + cantidad_merma
+            yield {
+                'material_type': fila['material_type'],
+                'material_id': fila['material_id'],
+                'material_nombre': f"{fila['material_type']} - ID: {fila['material_id']}",
+                'cantidad_usada': cantidad_usada,
+                'cantidad_merma': cantidad_merma,
+                'ordenes_afectadas': fila['ordenes_afectadas'],
+                'total_consumido': total_consumido,
+                'porcentaje_merma': round((cantidad_merma / total_consumido) * 100, 2) if total_consumido > 0 else 0
+            }
+    
+    @staticmethod
+    def get_material_consumption_report(tenant_id: int, periodo_dias: int = 30) -> List[Dict]:
+        """Obtener reporte de consumo de materiales."""
+        return list(ProductionService.iter_material_consumption(tenant_id, periodo_dias))
+
+
+class MaterialIndexService:
+    """Mantiene el índice de uso y co-ocurrencia de materiales por tenant."""
+    
+    @staticmethod
+    def _order_usage(orden_id: int) -> Dict[Tuple[str, int], Tuple[int, int]]:
+        """Uso y merma por material de una orden (los detalles solo registran varillas)."""
+        filas = DetalleOrden.objects.filter(orden_id=orden_id).values('varilla_id').annotate(
+            usada=Sum('cant_varilla_usada'),
+            merma_total=Sum('merma')
+        ).order_by()
+        return {
+            ('varilla', fila['varilla_id']): (fila['usada'] or 0, fila['merma_total'] or 0)
+            for fila in filas
+        }
+    
+    @staticmethod
+    def register_order(tenant_id: int, orden_id: int, signo: int = 1) -> None:
+        """Sumar (signo=1) o restar (signo=-1) una orden completada del índice.
+        
+        Lo sumado se guarda en aporte_indice_material y al restar se usa ese
+        registro, no los detalles actuales de la orden.
+        """
+        with transaction.atomic():
+            # Serializa los registros de una misma orden
+            list(OrdenProduccion.objects.select_for_update().filter(id=orden_id).values_list('id'))
+            aportes = AporteIndiceMaterial.objects.select_for_update().filter(orden_id=orden_id)
+            
+            if signo > 0:
+                if aportes.exists():
+                    return
+                usos = MaterialIndexService._order_usage(orden_id)
+                AporteIndiceMaterial.objects.bulk_create([
+                    AporteIndiceMaterial(
+                        tenant_id=tenant_id, orden_id=orden_id, material_type=clave[0],
+                        material_id=clave[1], cantidad_usada=usada, cantidad_merma=merma
+                    )
+                    for clave, (usada, merma) in usos.items()
+                ])
+            else:
+                usos = {
+                    (aporte.material_type, aporte.material_id): (aporte.cantidad_usada, aporte.cantidad_merma)
+                    for aporte in aportes
                 }
+                aportes.delete()
             
-            if movimiento.tipo_movimiento == 'uso_produccion':
-                consumption_data[key]['cantidad_usada'] += movimiento.cantidad
-            elif movimiento.tipo_movimiento == 'merma':
-                consumption_data[key]['cantidad_merma'] += movimiento.cantidad
-            
-            if movimiento.orden_produccion_id:
-                consumption_data[key]['ordenes_afectadas'].add(movimiento.orden_produccion_id.id)
-        
-        # Convertir sets a listas y calcular totales
-        for key, data in consumption_data.items():
-            data['ordenes_afectadas'] = len(data['ordenes_afectadas'])
-            data['total_consumido'] = data['cantidad_usada'] + data['cantidad_merma']
-            if data['total_consumido'] > 0:
-                data['porcentaje_merma'] = round((data['cantidad_merma'] / data['total_consumido']) * 100, 2)
-            else:
-                data['porcentaje_merma'] = 0
+            if usos:
+                MaterialIndexService._apply(tenant_id, usos, signo)
+    
+    @staticmethod
+    def _apply(tenant_id: int, usos: Dict[Tuple[str, int], Tuple[int, int]], signo: int) -> None:
+        """Sumar o restar al índice el uso de una orden (dentro de una transacción)."""
+        ahora = timezone.now()
+        pares = [(a, b) for a in usos for b in usos if a != b]
+        
+        if signo > 0:
+            # Crear a cero las filas que falten; el upsert evita el choque con
+            # otra orden que estrene el mismo material a la vez
+            bulk_upsert(
+                UsoMaterial,
+                [
+                    UsoMaterial(tenant_id=tenant_id, material_type=clave[0], material_id=clave[1])
+                    for clave in usos
+                ],
+                unique_fields=['tenant_id', 'material_type', 'material_id'],
+                update_fields=['updated_at']
+            )
+            bulk_upsert(
+                CoocurrenciaMaterial,
+                [
+                    CoocurrenciaMaterial(
+                        tenant_id=tenant_id, material_type=a[0], material_id=a[1],
+                        relacionado_type=b[0], relacionado_id=b[1]
+                    )
+                    for a, b in pares
+                ],
+                unique_fields=['tenant_id', 'material_type', 'material_id', 'relacionado_type', 'relacionado_id'],
+                update_fields=['updated_at']
+            )
+        
+        # Uso por material
+        condicion = Q()
+        for material_type, material_id in usos:
+            condicion |= Q(material_type=material_type, material_id=material_id)
+        actualizar = []
+        for uso in UsoMaterial.objects.select_for_update().filter(condicion, tenant_id=tenant_id):
+            usada, merma = usos[(uso.material_type, uso.material_id)]
+            uso.ordenes = F('ordenes') + signo
+            uso.cantidad_usada = F('cantidad_usada') + signo * usada
+            uso.cantidad_merma = F('cantidad_merma') + signo * merma
+            uso.updated_at = ahora
+            actualizar.append(uso)
+        UsoMaterial.objects.bulk_update(
+            actualizar, ['ordenes', 'cantidad_usada', 'cantidad_merma', 'updated_at']
+        )
         
-        return list(consumption_data.values())
+        # Pares de materiales usados juntos (en ambos sentidos)
+        if pares:
+            claves = set(pares)
+            actualizar = []
+            for coocurrencia in CoocurrenciaMaterial.objects.select_for_update().filter(
+                condicion, tenant_id=tenant_id,
+                relacionado_type__in={b[0] for _, b in pares},
+                relacionado_id__in={b[1] for _, b in pares}
+            ):
+                clave = (
+                    (coocurrencia.material_type, coocurrencia.material_id),
+                    (coocurrencia.relacionado_type, coocurrencia.relacionado_id)
+                )
+                if clave in claves:
+                    coocurrencia.ordenes = F('ordenes') + signo
+                    coocurrencia.updated_at = ahora
+                    actualizar.append(coocurrencia)
+            CoocurrenciaMaterial.objects.bulk_update(actualizar, ['ordenes', 'updated_at'])
+        
+        if signo < 0:
+            UsoMaterial.objects.filter(tenant_id=tenant_id, ordenes__lte=0).delete()
+            CoocurrenciaMaterial.objects.filter(tenant_id=tenant_id, ordenes__lte=0).delete()
+    
+    @staticmethod
+    def rebuild(tenant_id: int, batch_size: int = 2000) -> Tuple[int, int]:
+        """Reconstruir el índice (y los aportes por orden) de un tenant desde sus órdenes completadas."""
+        completadas = OrdenProduccion.objects.filter(
+            tenant_id=tenant_id, estado='completada'
+        ).values('id')
+        
+        usos = {}
+        pares = defaultdict(int)
+        aportes = []
+        orden_actual, materiales = None, []
+        
+        def _cerrar_orden():
+            for a in materiales:
+                for b in materiales:
+                    if a != b:
+                        pares[(a, b)] += 1
+        
+        filas = DetalleOrden.objects.filter(orden_id__in=completadas).values(
+            'orden_id', 'varilla_id'
+        ).annotate(
+            usada=Sum('cant_varilla_usada'),
+            merma_total=Sum('merma')
+        ).order_by('orden_id', 'varilla_id')
+        
+        for fila in filas.iterator(chunk_size=batch_size):
+            if fila['orden_id'] != orden_actual:
+                _cerrar_orden()
+                orden_actual, materiales = fila['orden_id'], []
+            clave = ('varilla', fila['varilla_id'])
+            materiales.append(clave)
+            ordenes, usada, merma = usos.get(clave, (0, 0, 0))
+            usos[clave] = (ordenes + 1, usada + (fila['usada'] or 0), merma + (fila['merma_total'] or 0))
+            aportes.append(AporteIndiceMaterial(
+                tenant_id=tenant_id, orden_id=fila['orden_id'], material_type=clave[0], material_id=clave[1],
+                cantidad_usada=fila['usada'] or 0, cantidad_merma=fila['merma_total'] or 0
+            ))
+        _cerrar_orden()
+        
+        with transaction.atomic():
+            UsoMaterial.objects.filter(tenant_id=tenant_id).delete()
+            CoocurrenciaMaterial.objects.filter(tenant_id=tenant_id).delete()
+            AporteIndiceMaterial.objects.filter(tenant_id=tenant_id).delete()
+            AporteIndiceMaterial.objects.bulk_create(aportes, batch_size=batch_size)
+            UsoMaterial.objects.bulk_create(
+                [
+                    UsoMaterial(
+                        tenant_id=tenant_id, material_type=clave[0], material_id=clave[1],
+                        ordenes=ordenes, cantidad_usada=usada, cantidad_merma=merma
+                    )
+                    for clave, (ordenes, usada, merma) in usos.items()
+                ],
+                batch_size=batch_size
+            )
+            CoocurrenciaMaterial.objects.bulk_create(
+                [
+                    CoocurrenciaMaterial(
+                        tenant_id=tenant_id, material_type=a[0], material_id=a[1],
+                        relacionado_type=b[0], relacionado_id=b[1], ordenes=ordenes
+                    )
+                    for (a, b), ordenes in pares.items()
+                ],
+                batch_size=batch_size
+            )
+        
+        return len(usos), len(pares)
 
 
-class ProductionOptimizationService:
-    """Servicio para optimización de producción."""
+class ProductionSchedulerService:
+    """Cola de prioridad de órdenes pendientes, mantenida de forma incremental.
+    
+    La prioridad combina fecha de entrega, complejidad (líneas de la orden) y
+    disponibilidad de materiales. Se guarda como una puntuación independiente
+    de la fecha actual en cola_produccion, cuyo índice (tenant_id, -puntuacion)
+    permite consultar o tomar la siguiente orden en O(log n).
+    """
+    
+    # Órdenes sin fecha de entrega se programan a este plazo desde su creación
+    PLAZO_SIN_FECHA_DIAS = 999
+    # Puntos extra para una orden con todos sus materiales disponibles
+    PESO_DISPONIBILIDAD = 10
+    
+    @classmethod
+    def _score(cls, fecha_entrega: date, complejidad: int, disponibilidad: Decimal) -> int:
+        # prioridad = (100 - dias_restantes) + (10 - complejidad) + bonus; se omite
+        # el término de la fecha actual porque es igual para todas las órdenes
+        bonus = int(round(disponibilidad * cls.PESO_DISPONIBILIDAD))
+        return -fecha_entrega.toordinal() - complejidad + bonus
     
     @staticmethod
-    def suggest_material_requirements(orden_id: int) -> List[Dict]:
-        """Sugerir requerimientos de materiales basado en historial."""
-        try:
-            orden = OrdenProduccion.objects.get(id=orden_id)
-            
-            # Obtener órdenes similares completadas
-            ordenes_similares = OrdenProduccion.objects.filter(
+    def _prioridad(puntuacion: int, hoy: date) -> int:
+        return puntuacion + hoy.toordinal() + 110
+    
+    @classmethod
+    def refresh_orders(cls, orden_ids) -> int:
+        """Recalcular la entrada de cola de las órdenes indicadas."""
+        orden_ids = set(orden_ids)
+        if not orden_ids:
+            return 0
+        
+        # estado se carga porque la señal post_init de la orden lo lee
+        ordenes = list(OrdenProduccion.objects.filter(id__in=orden_ids, estado='pendiente').only(
+            'id', 'tenant_id', 'estado', 'fecha_creacion', 'fecha_entrega_estimada'
+        ))
+        
+        # Complejidad y líneas con stock suficiente para lo que falta por usar
+        stock = Varilla.objects.filter(id=OuterRef('varilla_id')).values('stock')[:1]
+        lineas = {
+            fila['orden_id']: fila
+            for fila in DetalleOrden.objects.filter(
+                orden_id__in=[orden.id for orden in ordenes]
+            ).annotate(
+                stock_disponible=Subquery(stock)
+            ).values('orden_id').annotate(
+                complejidad=Count('id'),
+                disponibles=Count('id', filter=Q(
+                    stock_disponible__gte=F('cant_varilla_plan') - F('cant_varilla_usada')
+                ))
+            ).order_by()
+        }
+        
+        entradas = []
+        for orden in ordenes:
+            fila = lineas.get(orden.id, {'complejidad': 0, 'disponibles': 0})
+            complejidad = fila['complejidad']
+            disponibilidad = (
+                Decimal(fila['disponibles']) / complejidad if complejidad else Decimal(1)
+            ).quantize(Decimal('0.0001'))
+            fecha_entrega = orden.fecha_entrega_estimada or (
+                orden.fecha_creacion + timedelta(days=cls.PLAZO_SIN_FECHA_DIAS)
+            )
+            entradas.append(ColaProduccion(
                 tenant_id=orden.tenant_id,
-                estado='completada'
-            ).exclude(id=orden_id)
-            
-            suggestions = []
-            
-            # Analizar patrones de uso de materiales
-            for orden_similar in ordenes_similares:
-                detalles = orden_similar.detalles.all()
-                for detalle in detalles:
-                    # Buscar si ya existe en la orden actual
-                    exists = DetalleOrden.objects.filter(
-                        orden_id=orden,
-                        material_type=detalle.material_type,
-                        material_id=detalle.material_id
-                    ).exists()
-                    
-                    if not exists:
-                        suggestions.append({
-                            'material_type': detalle.material_type,
-                            'material_id': detalle.material_id,
-                            'cantidad_sugerida': detalle.cantidad_usada,
-                            'eficiencia_historica': 1 - (detalle.cantidad_merma / max(detalle.cantidad_usada, 1))
-                        })
-            
-            return suggestions
-            
-        except OrdenProduccion.DoesNotExist:
-            return []
+                orden_id=orden.id,
+                fecha_entrega=fecha_entrega,
+                complejidad=complejidad,
+                disponibilidad=disponibilidad,
+                puntuacion=cls._score(fecha_entrega, complejidad, disponibilidad),
+                updated_at=timezone.now()
+            ))
+        
+        with transaction.atomic():
+            # Las órdenes que ya no están pendientes salen de la cola
+            ColaProduccion.objects.filter(orden_id__in=orden_ids).exclude(
+                orden_id__in=[entrada.orden_id for entrada in entradas]
+            ).delete()
+            bulk_upsert(
+                ColaProduccion, entradas, ['orden_id'],
+                ['tenant_id', 'fecha_entrega', 'complejidad', 'disponibilidad', 'puntuacion', 'updated_at']
+            )
+        return len(entradas)
+    
+    @classmethod
+    def remove_order(cls, orden_id: int) -> None:
+        """Quitar una orden de la cola."""
+        ColaProduccion.objects.filter(orden_id=orden_id).delete()
+    
+    @classmethod
+    def refresh_for_materials(cls, tenant_id: int, varilla_ids, item_type: str = 'varilla') -> int:
+        """Recalcular las órdenes en cola que usan alguno de los materiales indicados.
+        
+        Los detalles de orden solo registran varillas, así que el stock de otros
+        tipos no afecta a la disponibilidad de la cola.
+        """
+        varilla_ids = set(varilla_ids)
+        if not varilla_ids or item_type != 'varilla':
+            return 0
+        orden_ids = DetalleOrden.objects.filter(
+            varilla_id__in=varilla_ids,
+            orden_id__in=ColaProduccion.objects.filter(tenant_id=tenant_id).values('orden_id')
+        ).values_list('orden_id', flat=True).distinct()
+        return cls.refresh_orders(list(orden_ids))
+    
+    @classmethod
+    def rebuild(cls, tenant_id: Optional[int] = None, batch_size: int = 500) -> int:
+        """Reconstruir la cola desde las órdenes pendientes."""
+        pendientes = OrdenProduccion.objects.filter(estado='pendiente')
+        cola = ColaProduccion.objects.all()
+        if tenant_id:
+            pendientes = pendientes.filter(tenant_id=tenant_id)
+            cola = cola.filter(tenant_id=tenant_id)
+        
+        cola.exclude(orden_id__in=pendientes.values('id')).delete()
+        ids = list(pendientes.order_by('id').values_list('id', flat=True))
+        total = 0
+        for inicio in range(0, len(ids), batch_size):
+            total += cls.refresh_orders(ids[inicio:inicio + batch_size])
+        return total
+    
+    @classmethod
+    def _serialize(cls, entradas, hoy: date) -> List[Dict]:
+        return [
+            {
+                'orden_id': entrada.orden_id,
+                'numero_orden': f"ORD-{entrada.orden_id:04d}",
+                'prioridad': cls._prioridad(entrada.puntuacion, hoy),
+                'dias_restantes': (entrada.fecha_entrega - hoy).days,
+                'complejidad': entrada.complejidad,
+                'disponibilidad': entrada.disponibilidad,
+                'fecha_entrega': entrada.fecha_entrega,
+            }
+            for entrada in entradas
+        ]
     
     @staticmethod
-    def optimize_production_sequence(tenant_id: int) -> List[Dict]:
-        """Optimizar secuencia de producción basada en prioridades."""
-        ordenes_pendientes = OrdenProduccion.objects.filter(
-            tenant_id=tenant_id,
-            estado='pendiente'
-        ).order_by('fecha_entrega_estimada', 'fecha_creacion')
+    def queue(tenant_id: int):
+        """Queryset de la cola del tenant en orden de prioridad."""
+        return ColaProduccion.objects.filter(tenant_id=tenant_id).order_by('-puntuacion', 'orden_id')
+    
+    @classmethod
+    def peek(cls, tenant_id: int, limite: int = 1) -> List[Dict]:
+        """Consultar las siguientes órdenes de la cola sin retirarlas."""
+        return cls._serialize(cls.queue(tenant_id)[:limite], timezone.localdate())
+    
+    @classmethod
+    def pop(cls, tenant_id: int, responsable: Optional[str] = None) -> Optional[Dict]:
+        """Tomar la orden de mayor prioridad y pasarla a en proceso."""
+        with transaction.atomic():
+            entrada = cls.queue(tenant_id).select_for_update(skip_locked=True).first()
+            if entrada is None:
+                return None
+            
+            cambios = {'estado': 'en_proceso', 'updated_at': timezone.now()}
+            if responsable:
+                cambios['responsable_produccion'] = responsable
+            OrdenProduccion.objects.filter(id=entrada.orden_id).update(**cambios)
+            entrada.delete()
         
-        optimized_sequence = []
+        return cls._serialize([entrada], timezone.localdate())[0]
+
+
+class ProductionOptimizationService:
+    """Servicio para optimización de producción."""
+    
+    @staticmethod
+    def suggest_material_requirements(tenant_id: int, orden_id: int, limite: int = 10) -> List[Dict]:
+        """Sugerir requerimientos de materiales basado en historial.
         
-        for orden in ordenes_pendientes:
-            # Calcular prioridad basada en fecha de entrega y complejidad
-            dias_restantes = (orden.fecha_entrega_estimada - timezone.now().date()).days if orden.fecha_entrega_estimada else 999
-            
-            # Calcular complejidad basada en número de materiales
-            complejidad = orden.detalles.count()
-            
-            # Calcular puntuación de prioridad
-            prioridad = (100 - dias_restantes) + (10 - complejidad)
-            
-            optimized_sequence.append({
-                'orden_id': orden.id,
-                'numero_orden': orden.numero_orden,
-                'prioridad': prioridad,
-                'dias_restantes': dias_restantes,
-                'complejidad': complejidad,
-                'fecha_entrega': orden.fecha_entrega_estimada
-            })
+        Se consulta el índice de co-ocurrencias: materiales que se usaron
+        junto a los de la orden en órdenes completadas, sin duplicados y
+        ordenados por frecuencia. Si la orden aún no tiene materiales se
+        sugieren los más usados del tenant.
+        
+        Lanza OrdenProduccion.DoesNotExist si la orden no existe o es de otro tenant.
+        """
+        orden = OrdenProduccion.objects.get(id=orden_id, tenant_id=tenant_id)
         
-        # Ordenar por prioridad descendente
-        optimized_sequence.sort(key=lambda x: x['prioridad'], reverse=True)
+        actuales = set(
+            ('varilla', varilla_id)
+            for varilla_id in DetalleOrden.objects.filter(orden_id=orden.id).values_list('varilla_id', flat=True)
+        )
+        
+        if actuales:
+            condicion, excluir = Q(), Q()
+            for material_type, material_id in actuales:
+                condicion |= Q(material_type=material_type, material_id=material_id)
+                excluir |= Q(relacionado_type=material_type, relacionado_id=material_id)
+            candidatos = CoocurrenciaMaterial.objects.filter(
+                condicion, tenant_id=orden.tenant_id
+            ).exclude(excluir).values('relacionado_type', 'relacionado_id').annotate(
+                frecuencia=Sum('ordenes')
+            ).order_by('-frecuencia', 'relacionado_type', 'relacionado_id')[:limite]
+            ranking = [
+                ((fila['relacionado_type'], fila['relacionado_id']), fila['frecuencia'])
+                for fila in candidatos
+            ]
+        else:
+            ranking = [
+                ((uso.material_type, uso.material_id), uso.ordenes)
+                for uso in UsoMaterial.objects.filter(
+                    tenant_id=orden.tenant_id
+                ).order_by('-ordenes')[:limite]
+            ]
         
-        return optimized_sequence
+        if not ranking:
+            return []
+        
+        condicion = Q()
+        for (material_type, material_id), _ in ranking:
+            condicion |= Q(material_type=material_type, material_id=material_id)
+        usos = {
+            (uso.material_type, uso.material_id): uso
+            for uso in UsoMaterial.objects.filter(condicion, tenant_id=orden.tenant_id)
+        }
+        
+        suggestions = []
+        for clave, frecuencia in ranking:
+            uso = usos.get(clave)
+            if uso is None:
+                continue
+            suggestions.append({
+                'material_type': clave[0],
+                'material_id': clave[1],
+                'cantidad_sugerida': round(uso.cantidad_promedio, 2),
+                'eficiencia_historica': round(uso.eficiencia_historica, 4),
+                'frecuencia': frecuencia
+            })
+        
+        return suggestions
+    
+    @staticmethod
+    def optimize_production_sequence(tenant_id: int, limite: Optional[int] = None) -> List[Dict]:
+        """Secuencia de producción según la cola de prioridad del tenant."""
+        cola = ProductionSchedulerService.queue(tenant_id)
+        if limite:
+            cola = cola[:limite]
+        return ProductionSchedulerService._serialize(cola, timezone.localdate())
@@ -0,0 +1,82 @@
+"""
+Señales para la app de producción.
+
+Mantienen el índice de uso y co-ocurrencia de materiales cuando una
+orden de producción pasa a (o sale de) estado completada, y la cola de
+prioridad de órdenes pendientes cuando cambian las órdenes, sus detalles
+o el stock de las varillas.
+"""
+
+from django.db import transaction
+from django.db.models.signals import post_init, post_save, post_delete
+from django.dispatch import receiver
+
+from apps.inventory.models import Varilla
+from .models import OrdenProduccion, DetalleOrden
+from .services import MaterialIndexService, ProductionSchedulerService
+
+
+@receiver(post_init, sender=OrdenProduccion)
+def remember_order_state(sender, instance, **kwargs):
+    """Guardar el estado con el que se cargó la orden."""
+    instance._estado_original = instance.estado
+
+
+@receiver(post_save, sender=OrdenProduccion)
+def update_material_index(sender, instance, created, **kwargs):
+    """Sumar o restar la orden del índice al cambiar su estado a/desde completada."""
+    antes = None if created else instance._estado_original
+    ahora = instance.estado
+    instance._estado_original = ahora
+
+    if antes != 'completada' and ahora == 'completada':
+        signo = 1
+    elif antes == 'completada' and ahora != 'completada':
+        signo = -1
+    else:
+        return
+
+    transaction.on_commit(
+        lambda: MaterialIndexService.register_order(instance.tenant_id, instance.id, signo)
+    )
+
+
+@receiver(post_delete, sender=OrdenProduccion)
+def remove_from_material_index(sender, instance, **kwargs):
+    """Restar del índice una orden completada que se elimina."""
+    if instance.estado == 'completada':
+        tenant_id, orden_id = instance.tenant_id, instance.id
+        transaction.on_commit(lambda: MaterialIndexService.register_order(tenant_id, orden_id, -1))
+
+
+@receiver(post_save, sender=OrdenProduccion)
+def update_production_queue(sender, instance, **kwargs):
+    """Encolar, recalcular o retirar la orden según su estado."""
+    orden_id = instance.id
+    if instance.estado == 'pendiente':
+        transaction.on_commit(lambda: ProductionSchedulerService.refresh_orders([orden_id]))
+    else:
+        transaction.on_commit(lambda: ProductionSchedulerService.remove_order(orden_id))
+
+
+@receiver(post_delete, sender=OrdenProduccion)
+def remove_from_production_queue(sender, instance, **kwargs):
+    """Retirar de la cola una orden eliminada."""
+    ProductionSchedulerService.remove_order(instance.id)
+
+
+@receiver(post_save, sender=DetalleOrden)
+@receiver(post_delete, sender=DetalleOrden)
+def refresh_queue_for_detail(sender, instance, **kwargs):
+    """Recalcular complejidad y disponibilidad de la orden del detalle."""
+    orden_id = instance.orden_id
+    transaction.on_commit(lambda: ProductionSchedulerService.refresh_orders([orden_id]))
+
+
+@receiver(post_save, sender=Varilla)
+def refresh_queue_for_stock(sender, instance, **kwargs):
+    """Recalcular las órdenes en cola que usan la varilla modificada."""
+    tenant_id, varilla_id = instance.tenant_id, instance.id
+    transaction.on_commit(
+        lambda: ProductionSchedulerService.refresh_for_materials(tenant_id, [varilla_id])
+    )
@@ -1,3 +1,95 @@
+from datetime import date
+from types import SimpleNamespace
+
 from django.test import TestCase
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from apps.inventory.models import Varilla
+from apps.inventory.services import InventoryService
+from apps.production import views
+from apps.production.models import ColaProduccion, DetalleOrden, OrdenProduccion
+from apps.production.services import ProductionSchedulerService
+
+
+def crear_orden(varilla, plan=5, tenant_id=1):
+    orden = OrdenProduccion.objects.create(
+        tenant_id=tenant_id, fecha_creacion=date(2025, 1, 1), fecha_entrega_estimada=date(2025, 2, 1)
+    )
+    DetalleOrden.objects.create(orden_id=orden.id, varilla_id=varilla.id, cant_varilla_plan=plan)
+    return orden
+
+
+class ProductionQueueTests(TestCase):
+    """Cola de producción: recálculo en bloque y disponibilidad según el stock."""
+
+    def setUp(self):
+        self.varilla = Varilla.objects.create(
+            tenant_id=1, nombre='V1', longitud=1, tipo='madera', stock=0, minimo=2, precio=1
+        )
+
+    def test_refresh_orders_no_consulta_por_orden(self):
+        ids = [crear_orden(self.varilla).id for _ in range(5)]
+        # órdenes, líneas, savepoint, borrado, upsert y release: sin consultas por orden
+        with self.assertNumQueries(6):
+            ProductionSchedulerService.refresh_orders(ids)
+
+    def test_cambio_de_stock_recalcula_la_disponibilidad(self):
+        orden = crear_orden(self.varilla)
+        ProductionSchedulerService.refresh_orders([orden.id])
+        self.assertEqual(ColaProduccion.objects.get(orden_id=orden.id).disponibilidad, 0)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            InventoryService.adjust_stock(1, 'varilla', self.varilla.id, 10)
+        self.assertEqual(ColaProduccion.objects.get(orden_id=orden.id).disponibilidad, 1)
+
+
+class RegisterProductionViewTests(TestCase):
+    """El registro de una línea delega en el servicio del lote."""
+
+    def setUp(self):
+        self.varilla = Varilla.objects.create(
+            tenant_id=1, nombre='V1', longitud=1, tipo='madera', stock=10, minimo=2, precio=1
+        )
+        self.orden = crear_orden(self.varilla)
+
+    def post(self, datos):
+        request = APIRequestFactory().post('/', datos, format='json')
+        force_authenticate(request, user=SimpleNamespace(pk=1, is_authenticated=True, is_active=True))
+        return views.register_production(request)
+
+    def test_registra_uso_y_merma(self):
+        response = self.post({
+            'tenant_id': 1, 'orden_id': self.orden.id, 'material_type': 'varilla',
+            'material_id': self.varilla.id, 'cantidad_usada': 3, 'cantidad_merma': 1,
+        })
+        self.assertEqual(response.status_code, 200)
+        self.varilla.refresh_from_db()
+        self.assertEqual(self.varilla.stock, 7)
+        detalle = DetalleOrden.objects.get(orden_id=self.orden.id)
+        self.assertEqual((detalle.cant_varilla_usada, detalle.merma), (3, 1))
+
+    def test_entrada_invalida_y_orden_de_otro_tenant(self):
+        datos = {
+            'tenant_id': 1, 'orden_id': self.orden.id, 'material_type': 'varilla',
+            'material_id': self.varilla.id, 'cantidad_usada': 'abc',
+        }
+        self.assertEqual(self.post(datos).status_code, 400)
+        datos.update(tenant_id=2, cantidad_usada=1)
+        self.assertEqual(self.post(datos).status_code, 404)
+
+
+class MaterialSuggestionsViewTests(TestCase):
+    """Las sugerencias solo se dan para órdenes del tenant de la petición."""
+
+    def get(self, orden_id, tenant_id):
+        request = APIRequestFactory().get('/', {'tenant_id': tenant_id})
+        force_authenticate(request, user=SimpleNamespace(pk=1, is_authenticated=True, is_active=True))
+        return views.material_suggestions(request, orden_id=orden_id)
 
-# Create your tests here.
+    def test_orden_de_otro_tenant(self):
+        varilla = Varilla.objects.create(
+            tenant_id=2, nombre='V1', longitud=1, tipo='madera', stock=10, minimo=2, precio=1
+        )
+        orden = crear_orden(varilla, tenant_id=2)
+        self.assertEqual(self.get(orden.id, 2).status_code, 200)
+        self.assertEqual(self.get(orden.id, 1).status_code, 404)
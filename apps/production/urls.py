@@ -11,6 +11,7 @@ urlpatterns = [
     # URLs para Órdenes de Producción
     path('orders/', views.ProductionListView.as_view(), name='production-list'),
     path('orders/<int:pk>/', views.ProductionDetailView.as_view(), name='production-detail'),
+    path('orders/<int:orden_id>/suggestions/', views.material_suggestions, name='material-suggestions'),
     
     # URLs para Cuadros
     path('cuadros/', views.CuadroListView.as_view(), name='cuadro-list'),
@@ -26,9 +27,13 @@ urlpatterns = [
     
     # URLs especiales para funcionalidades de producción
     path('register/', views.register_production, name='register-production'),
+    path('register/batch/', views.register_production_batch, name='register-production-batch'),
+    path('sequence/', views.production_sequence, name='production-sequence'),
+    path('sequence/next/', views.production_sequence_next, name='production-sequence-next'),
     path('efficiency/', views.production_efficiency, name='production-efficiency'),
     path('waste/', views.waste_report, name='waste-report'),
     path('report/', views.production_report, name='production-report'),
+    path('consumption/', views.material_consumption_report, name='material-consumption-report'),
     
     # URLs legacy para compatibilidad
     path('', views.ProductionListView.as_view(), name='production-list-legacy'),
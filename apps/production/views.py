@@ -5,16 +5,25 @@ Vistas para la app de producción.
 from rest_framework import generics, status
 from rest_framework.decorators import api_view
 from rest_framework.response import Response
-from django.db.models import Count, Sum, Avg
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Count, Avg
+from django.http import StreamingHttpResponse
 from django.utils import timezone
-from datetime import timedelta
+from datetime import date
+import json
 
 from .models import Cuadro, OrdenProduccion, DetalleOrden, MovimientoInventario
 from .serializers import (
     CuadroSerializer, OrdenProduccionSerializer, DetalleOrdenSerializer,
     MovimientoInventarioSerializer, ProductionReportSerializer,
-    WasteReportSerializer, ProductionEfficiencySerializer
+    WasteReportSerializer, ProductionEfficiencySerializer,
+    MaterialConsumptionSerializer, MaterialSuggestionSerializer,
+    ProductionSequenceSerializer, ProductionUsageSerializer, ProductionBatchSerializer
 )
+from .services import ProductionService, ProductionOptimizationService, ProductionSchedulerService
+from apps.tenants.services import get_request_tenant_id
+from fotostudio.pagination import KeysetPagination, StandardPagination
+from fotostudio.replica import use_replica
 
 
 # Views para Órdenes de Producción
@@ -125,70 +134,54 @@ class MovimientoInventarioDetailView(generics.RetrieveUpdateDestroyAPIView):
 # Views especiales para reportes y funcionalidades
 @api_view(['POST'])
 def register_production(request):
-    """Registrar producción de una orden."""
-    orden_id = request.data.get('orden_id')
-    material_type = request.data.get('material_type')
-    material_id = request.data.get('material_id')
-    cantidad_usada = request.data.get('cantidad_usada')
-    cantidad_merma = request.data.get('cantidad_merma', 0)
-    usuario = request.data.get('usuario')
-    tenant_id = request.data.get('tenant_id')
+    """Registrar el uso y la merma de un material de una orden."""
+    tenant_id = get_request_tenant_id(request, request.data)
+    if not tenant_id:
+        return Response(
+            {'error': 'Faltan parámetros requeridos'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
     
-    if not all([orden_id, material_type, material_id, cantidad_usada, tenant_id]):
+    serializer = ProductionUsageSerializer(data=request.data)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    datos = serializer.validated_data
+    
+    if not OrdenProduccion.objects.filter(id=datos['orden_id'], tenant_id=tenant_id).exists():
+        return Response(
+            {'error': 'Orden de producción no encontrada'},
+            status=status.HTTP_404_NOT_FOUND
+        )
+    
+    ok, mensaje = ProductionService.register_production_usage(
+        tenant_id, datos['orden_id'], datos['material_type'], datos['material_id'],
+        datos['cantidad_usada'], datos['cantidad_merma'], usuario=datos.get('usuario')
+    )
+    if not ok:
+        return Response({'error': mensaje}, status=status.HTTP_400_BAD_REQUEST)
+    return Response({'mensaje': mensaje}, status=status.HTTP_200_OK)
+
+
+@api_view(['POST'])
+def register_production_batch(request):
+    """Registrar en lote el uso y la merma de materiales de una orden."""
+    tenant_id = get_request_tenant_id(request, request.data)
+    if not tenant_id:
         return Response(
             {'error': 'Faltan parámetros requeridos'},
             status=status.HTTP_400_BAD_REQUEST
         )
     
+    serializer = ProductionBatchSerializer(data=request.data)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    datos = serializer.validated_data
+    
     try:
-        # Obtener la orden
-        orden = OrdenProduccion.objects.get(id=orden_id, tenant_id=tenant_id)
-        
-        # Obtener o crear el detalle de orden
-        detalle, created = DetalleOrden.objects.get_or_create(
-            orden_id=orden,
-            material_type=material_type,
-            material_id=material_id,
-            defaults={
-                'cantidad_planificada': 0,
-                'cantidad_usada': 0,
-                'cantidad_merma': 0
-            }
+        resultado = ProductionService.register_production_batch(
+            tenant_id, datos['orden_id'], datos['lineas'],
+            usuario=datos.get('usuario'), atomico=datos['atomico']
         )
-        
-        # Actualizar cantidades
-        detalle.cantidad_usada += cantidad_usada
-        detalle.cantidad_merma += cantidad_merma
-        detalle.save()
-        
-        # Crear movimientos de inventario
-        if cantidad_usada > 0:
-            MovimientoInventario.objects.create(
-                tenant_id=tenant_id,
-                material_type=material_type,
-                material_id=material_id,
-                tipo_movimiento='uso_produccion',
-                cantidad=cantidad_usada,
-                motivo=f'Uso en producción - Orden {orden.numero_orden}',
-                orden_produccion_id=orden,
-                usuario=usuario
-            )
-        
-        if cantidad_merma > 0:
-            MovimientoInventario.objects.create(
-                tenant_id=tenant_id,
-                material_type=material_type,
-                material_id=material_id,
-                tipo_movimiento='merma',
-                cantidad=cantidad_merma,
-                motivo=f'Merma en producción - Orden {orden.numero_orden}',
-                orden_produccion_id=orden,
-                usuario=usuario
-            )
-        
-        serializer = DetalleOrdenSerializer(detalle)
-        return Response(serializer.data, status=status.HTTP_200_OK)
-        
     except OrdenProduccion.DoesNotExist:
         return Response(
             {'error': 'Orden de producción no encontrada'},
@@ -199,48 +192,105 @@ def register_production(request):
             {'error': str(e)},
             status=status.HTTP_500_INTERNAL_SERVER_ERROR
         )
+    
+    if resultado['fallidas'] and not resultado['procesadas']:
+        return Response(resultado, status=status.HTTP_400_BAD_REQUEST)
+    if resultado['fallidas']:
+        return Response(resultado, status=status.HTTP_207_MULTI_STATUS)
+    return Response(resultado, status=status.HTTP_200_OK)
+
+
+@api_view(['GET'])
+def material_suggestions(request, orden_id):
+    """Sugerir materiales para una orden según el historial del tenant."""
+    tenant_id = get_request_tenant_id(request)
+    if not tenant_id:
+        return Response(
+            {'error': 'tenant_id es requerido'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    try:
+        limite = int(request.query_params.get('limite', 10))
+    except ValueError:
+        limite = 10
+    
+    try:
+        suggestions = ProductionOptimizationService.suggest_material_requirements(
+            tenant_id, orden_id, limite=limite
+        )
+    except OrdenProduccion.DoesNotExist:
+        return Response(
+            {'error': 'Orden de producción no encontrada'},
+            status=status.HTTP_404_NOT_FOUND
+        )
+    serializer = MaterialSuggestionSerializer(suggestions, many=True)
+    return Response(serializer.data)
+
+
+@api_view(['GET'])
+def production_sequence(request):
+    """Obtener la secuencia de producción del tenant (paginada, por prioridad)."""
+    tenant_id = get_request_tenant_id(request)
+    
+    if not tenant_id:
+        return Response(
+            {'error': 'tenant_id es requerido'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    paginator = StandardPagination(page_size=100, max_page_size=1000)
+    page = paginator.paginate_queryset(ProductionSchedulerService.queue(tenant_id), request)
+    
+    secuencia = ProductionSchedulerService._serialize(page, timezone.localdate())
+    serializer = ProductionSequenceSerializer(secuencia, many=True)
+    return paginator.get_paginated_response(serializer.data)
+
+
+@api_view(['POST'])
+def production_sequence_next(request):
+    """Tomar la siguiente orden de la cola y pasarla a en proceso."""
+    tenant_id = get_request_tenant_id(request, request.data)
+    responsable = request.data.get('responsable_produccion')
+    
+    if not tenant_id:
+        return Response(
+            {'error': 'tenant_id es requerido'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    siguiente = ProductionSchedulerService.pop(tenant_id, responsable=responsable)
+    if siguiente is None:
+        return Response(status=status.HTTP_204_NO_CONTENT)
+    
+    serializer = ProductionSequenceSerializer(siguiente)
+    return Response(serializer.data)
 
 
 @api_view(['GET'])
+@use_replica
 def production_efficiency(request):
-    """Obtener reporte de eficiencia de producción."""
-    tenant_id = request.query_params.get('tenant_id')
+    """Obtener reporte de eficiencia de producción (paginado por created_at, id)."""
+    tenant_id = get_request_tenant_id(request)
     periodo = request.query_params.get('periodo', '30')  # días
     
     try:
-        fecha_inicio = timezone.now() - timedelta(days=int(periodo))
-        
-        queryset = OrdenProduccion.objects.filter(
-            tenant_id=tenant_id,
-            fecha_creacion__gte=fecha_inicio,
-            estado='completada'
+        queryset = ProductionService.get_completed_orders(tenant_id, int(periodo))
+    except ValueError:
+        return Response(
+            {'error': 'periodo debe ser un número entero'},
+            status=status.HTTP_400_BAD_REQUEST
         )
-        
-        eficiencia_data = []
-        for orden in queryset:
-            detalles = orden.detalles.all()
-            total_planificado = sum(d.cantidad_planificada for d in detalles)
-            total_usado = sum(d.cantidad_usada for d in detalles)
-            total_merma = sum(d.cantidad_merma for d in detalles)
-            
-            if total_planificado > 0:
-                eficiencia = ((total_usado - total_merma) / total_planificado) * 100
-            else:
-                eficiencia = 0
-            
-            eficiencia_data.append({
-                'orden_id': orden.id,
-                'numero_orden': orden.numero_orden,
-                'fecha_creacion': orden.fecha_creacion,
-                'fecha_completada': orden.updated_at.date(),
-                'dias_produccion': (orden.updated_at.date() - orden.fecha_creacion).days,
-                'materiales_usados': total_usado,
-                'materiales_merma': total_merma,
-                'eficiencia': round(eficiencia, 2)
-            })
+    
+    # Fuera del try: un cursor inválido debe llegar a DRF como 404
+    paginator = KeysetPagination()
+    page = paginator.paginate_queryset(queryset, request)
+    
+    try:
+        eficiencia_data = ProductionService.get_efficiency_rows(page)
         
         serializer = ProductionEfficiencySerializer(eficiencia_data, many=True)
-        return Response(serializer.data)
+        return paginator.get_paginated_response(serializer.data)
         
     except Exception as e:
         return Response(
@@ -250,54 +300,59 @@ def production_efficiency(request):
 
 
 @api_view(['GET'])
+@use_replica
 def waste_report(request):
     """Obtener reporte de mermas."""
-    tenant_id = request.query_params.get('tenant_id')
+    tenant_id = get_request_tenant_id(request)
     material_type = request.query_params.get('material_type')
     periodo = request.query_params.get('periodo', '30')  # días
+    use_snapshot = request.query_params.get('snapshot', '').lower() in ('1', 'true', 'yes')
     
     try:
-        fecha_inicio = timezone.now() - timedelta(days=int(periodo))
-        
-        queryset = DetalleOrden.objects.filter(
-            orden_id__tenant_id=tenant_id,
-            orden_id__fecha_creacion__gte=fecha_inicio,
-            cantidad_merma__gt=0
+        waste_data = ProductionService.get_waste_analysis(
+            tenant_id, int(periodo), material_type=material_type, use_snapshot=use_snapshot
         )
         
-        if material_type:
-            queryset = queryset.filter(material_type=material_type)
-        
-        # Agrupar por material
-        waste_data = {}
-        for detalle in queryset:
-            key = f"{detalle.material_type}_{detalle.material_id}"
-            if key not in waste_data:
-                waste_data[key] = {
-                    'material_type': detalle.material_type,
-                    'material_id': detalle.material_id,
-                    'material_nombre': f"{detalle.material_type} - ID: {detalle.material_id}",
-                    'cantidad_merma': 0,
-                    'ordenes_afectadas': 0
-                }
-            
-            waste_data[key]['cantidad_merma'] += detalle.cantidad_merma
-            waste_data[key]['ordenes_afectadas'] += 1
-        
-        # Calcular porcentajes
-        for key, data in waste_data.items():
-            total_usado = sum(
-                d.cantidad_usada for d in queryset.filter(
-                    material_type=data['material_type'],
-                    material_id=data['material_id']
-                )
-            )
-            if total_usado > 0:
-                data['porcentaje_merma'] = round((data['cantidad_merma'] / total_usado) * 100, 2)
-            else:
-                data['porcentaje_merma'] = 0
+        serializer = WasteReportSerializer(waste_data, many=True)
+        return Response(serializer.data)
         
-        serializer = WasteReportSerializer(waste_data.values(), many=True)
+    except Exception as e:
+        return Response(
+            {'error': str(e)},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+
+
+@api_view(['GET'])
+@use_replica
+def material_consumption_report(request):
+    """Obtener reporte de consumo de materiales.
+    
+    Con ``formato=ndjson`` la respuesta se transmite como un objeto JSON
+    por línea, sin armar el reporte completo en memoria.
+    """
+    tenant_id = get_request_tenant_id(request)
+    periodo = request.query_params.get('periodo', '30')  # días
+    formato = request.query_params.get('formato', 'json')
+    
+    try:
+        periodo_dias = int(periodo)
+    except ValueError:
+        return Response(
+            {'error': 'Parámetros de periodo inválidos'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    if formato == 'ndjson':
+        filas = ProductionService.iter_material_consumption(tenant_id, periodo_dias)
+        return StreamingHttpResponse(
+            (json.dumps(fila, cls=DjangoJSONEncoder) + '\n' for fila in filas),
+            content_type='application/x-ndjson'
+        )
+    
+    try:
+        consumption_data = ProductionService.get_material_consumption_report(tenant_id, periodo_dias)
+        serializer = MaterialConsumptionSerializer(consumption_data, many=True)
         return Response(serializer.data)
         
     except Exception as e:
@@ -308,46 +363,28 @@ def waste_report(request):
 
 
 @api_view(['GET'])
+@use_replica
 def production_report(request):
     """Obtener reporte general de producción."""
-    tenant_id = request.query_params.get('tenant_id')
+    tenant_id = get_request_tenant_id(request)
     periodo = request.query_params.get('periodo', '30')  # días
+    desde = request.query_params.get('desde')  # YYYY-MM-DD
+    hasta = request.query_params.get('hasta')  # YYYY-MM-DD
     
     try:
-        fecha_inicio = timezone.now() - timedelta(days=int(periodo))
-        
-        queryset = OrdenProduccion.objects.filter(
-            tenant_id=tenant_id,
-            fecha_creacion__gte=fecha_inicio
+        fecha_desde = date.fromisoformat(desde) if desde else None
+        fecha_hasta = date.fromisoformat(hasta) if hasta else None
+        periodo_dias = int(periodo)
+    except ValueError:
+        return Response(
+            {'error': 'Parámetros de periodo inválidos'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    try:
+        report_data = ProductionService.get_production_report(
+            tenant_id, periodo_dias, fecha_desde=fecha_desde, fecha_hasta=fecha_hasta
         )
-        
-        total_ordenes = queryset.count()
-        ordenes_completadas = queryset.filter(estado='completada').count()
-        ordenes_en_proceso = queryset.filter(estado='en_proceso').count()
-        ordenes_canceladas = queryset.filter(estado='cancelada').count()
-        
-        # Calcular eficiencia general
-        if total_ordenes > 0:
-            eficiencia = (ordenes_completadas / total_ordenes) * 100
-        else:
-            eficiencia = 0
-        
-        # Calcular merma total
-        total_merma = DetalleOrden.objects.filter(
-            orden_id__in=queryset
-        ).aggregate(
-            total=Sum('cantidad_merma')
-        )['total'] or 0
-        
-        report_data = {
-            'periodo': f"{periodo} días",
-            'total_ordenes': total_ordenes,
-            'ordenes_completadas': ordenes_completadas,
-            'ordenes_en_proceso': ordenes_en_proceso,
-            'ordenes_canceladas': ordenes_canceladas,
-            'eficiencia': round(eficiencia, 2),
-            'total_merma': total_merma
-        }
         
         serializer = ProductionReportSerializer(report_data)
         return Response(serializer.data)
@@ -6,3 +6,5 @@ class TenantsConfig(AppConfig):
     name = 'apps.tenants'
     verbose_name = 'Tenants'
 
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,20 @@
+"""
+Filtros de DRF para la app de tenants.
+"""
+
+from django.core.exceptions import FieldDoesNotExist
+from rest_framework.filters import BaseFilterBackend
+
+
+class TenantFilterBackend(BaseFilterBackend):
+    """Restringe los querysets al tenant de la petición si el modelo tiene tenant_id."""
+
+    def filter_queryset(self, request, queryset, view):
+        tenant = getattr(request, 'tenant', None)
+        if tenant is None:
+            return queryset
+        try:
+            queryset.model._meta.get_field('tenant_id')
+        except FieldDoesNotExist:
+            return queryset
+        return queryset.filter(tenant_id=tenant.id)
@@ -0,0 +1,54 @@
+"""
+Crea en línea los índices declarados en los modelos que aún no existen.
+
+Las migraciones se regeneran en cada instalación, así que en bases de datos
+ya desplegadas los índices nuevos se crean con este comando sin bloquear
+escrituras: ALGORITHM=INPLACE, LOCK=NONE en MySQL y CONCURRENTLY en PostgreSQL.
+"""
+
+from django.apps import apps
+from django.core.management.base import BaseCommand
+from django.db import connections, router
+
+
+class Command(BaseCommand):
+    help = 'Crea sin bloqueo los índices de los modelos que faltan en la base de datos.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--app', action='append', help='Limitar a estas apps (label), se puede repetir')
+        parser.add_argument('--dry-run', action='store_true', help='Mostrar el SQL sin ejecutarlo')
+
+    def online_sql(self, connection, sql: str) -> str:
+        if connection.vendor == 'mysql':
+            return f'{sql} ALGORITHM=INPLACE LOCK=NONE'
+        if connection.vendor == 'postgresql':
+            return sql.replace('CREATE INDEX', 'CREATE INDEX CONCURRENTLY', 1)
+        return sql
+
+    def handle(self, *args, **options):
+        creados = 0
+        for model in apps.get_models():
+            meta = model._meta
+            if not meta.managed or not meta.indexes or not meta.app_config.name.startswith('apps.'):
+                continue
+            if options['app'] and meta.app_label not in options['app']:
+                continue
+
+            connection = connections[router.db_for_write(model)]
+            with connection.cursor() as cursor:
+                existentes = connection.introspection.get_constraints(cursor, meta.db_table)
+
+            for index in meta.indexes:
+                if index.name in existentes:
+                    continue
+                with connection.schema_editor(atomic=False, collect_sql=options['dry_run']) as editor:
+                    sql = self.online_sql(connection, str(index.create_sql(model, editor)))
+                    if options['dry_run']:
+                        self.stdout.write(f'{sql};')
+                    else:
+                        editor.execute(sql)
+                        self.stdout.write(f'{meta.db_table}: {index.name}')
+                creados += 1
+
+        accion = 'por crear' if options['dry_run'] else 'creados'
+        self.stdout.write(self.style.SUCCESS(f'Índices {accion}: {creados}'))
@@ -0,0 +1,16 @@
+"""
+Middleware para la app de tenants.
+"""
+
+from .services import TenantResolver
+
+
+class TenantMiddleware:
+    """Adjunta request.tenant según el subdominio del host (None si no existe)."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request.tenant = TenantResolver.resolve_host(request.get_host())
+        return self.get_response(request)
@@ -0,0 +1,117 @@
+"""
+Servicios para la app de tenants.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+from django.conf import settings
+from django.core.cache import cache
+
+from fotostudio.cache import cache_is_shared
+
+from .models import Tenant
+
+
+def extract_subdomain(host: str) -> str:
+    """Obtener el subdominio del host ('default' en localhost o sin subdominio)."""
+    # host puede incluir puerto, ej: subdominio.dominio.tld:8000
+    host_without_port = host.split(":")[0]
+    parts = host_without_port.split(".")
+    # Si hay al menos 3 partes, asuma primer elemento como subdominio
+    # Para desarrollo con localhost, permita 'localhost' sin subdominio
+    if host_without_port.startswith("localhost") or host_without_port.startswith("127.0.0.1"):
+        return "default"
+    return parts[0] if len(parts) >= 3 else "default"
+
+
+class TenantResolver:
+    """Resuelve tenants por subdominio con una cache LRU en memoria con TTL.
+    
+    Cada proceso guarda sus propias entradas (también los subdominios que no
+    existen). Al guardar o borrar un Tenant se incrementa una versión en la
+    cache compartida; los demás procesos la consultan como mucho cada
+    TENANT_CACHE_SYNC_INTERVAL segundos y vacían su cache si cambió.
+    
+    Con una cache por proceso (LocMemCache) los demás workers no ven esa
+    versión, así que las entradas duran solo TENANT_CACHE_LOCAL_TTL segundos:
+    un tenant renombrado o desactivado puede seguir resolviéndose ese tiempo.
+    """
+    
+    VERSION_KEY = 'tenants:version'
+    
+    _entries = OrderedDict()
+    _lock = threading.Lock()
+    _version = None
+    _synced_at = 0.0
+    
+    @staticmethod
+    def _setting(name: str, default):
+        return getattr(settings, name, default)
+    
+    @classmethod
+    def _ttl(cls) -> float:
+        ttl = cls._setting('TENANT_CACHE_TTL', 300)
+        if cache_is_shared():
+            return ttl
+        return min(ttl, cls._setting('TENANT_CACHE_LOCAL_TTL', 5))
+    
+    @classmethod
+    def _sync(cls, ahora: float) -> None:
+        if ahora - cls._synced_at < cls._setting('TENANT_CACHE_SYNC_INTERVAL', 1):
+            return
+        version = cache.get(cls.VERSION_KEY, 0)
+        with cls._lock:
+            if version != cls._version:
+                cls._entries.clear()
+                cls._version = version
+            cls._synced_at = ahora
+    
+    @classmethod
+    def resolve(cls, subdomain: str) -> Optional[Tenant]:
+        """Tenant del subdominio, o None si no existe."""
+        ahora = time.monotonic()
+        cls._sync(ahora)
+        
+        with cls._lock:
+            entrada = cls._entries.get(subdomain)
+            if entrada and entrada[1] > ahora:
+                cls._entries.move_to_end(subdomain)
+                return entrada[0]
+        
+        tenant = Tenant.objects.filter(subdomain=subdomain).first()
+        
+        with cls._lock:
+            cls._entries[subdomain] = (tenant, ahora + cls._ttl())
+            cls._entries.move_to_end(subdomain)
+            while len(cls._entries) > cls._setting('TENANT_CACHE_SIZE', 1024):
+                cls._entries.popitem(last=False)
+        return tenant
+    
+    @classmethod
+    def resolve_host(cls, host: str) -> Optional[Tenant]:
+        """Tenant correspondiente al host de la petición."""
+        return cls.resolve(extract_subdomain(host))
+    
+    @classmethod
+    def invalidate(cls) -> None:
+        """Vaciar la cache local y avisar al resto de procesos."""
+        try:
+            cache.incr(cls.VERSION_KEY)
+        except ValueError:
+            if not cache.add(cls.VERSION_KEY, 1):
+                cache.incr(cls.VERSION_KEY)
+        with cls._lock:
+            cls._entries.clear()
+            cls._synced_at = 0.0
+
+
+def get_request_tenant_id(request, params=None):
+    """Tenant de la petición: el resuelto por el middleware o, si no hay, el parámetro tenant_id."""
+    tenant = getattr(request, 'tenant', None)
+    if tenant is not None:
+        return tenant.id
+    params = request.query_params if params is None else params
+    return params.get('tenant_id')
@@ -0,0 +1,20 @@
+"""
+Señales para la app de tenants.
+
+Invalidan la cache de resolución de tenants en todos los procesos
+cuando se modifica o elimina un Tenant.
+"""
+
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .models import Tenant
+from .services import TenantResolver
+
+
+@receiver(post_save, sender=Tenant)
+@receiver(post_delete, sender=Tenant)
+def invalidate_tenant_cache(sender, instance, **kwargs):
+    """Invalidar la cache de tenants tras el commit."""
+    transaction.on_commit(TenantResolver.invalidate)
@@ -0,0 +1,128 @@
+import os
+import tempfile
+from datetime import date, timedelta
+from unittest import mock
+
+from django.core.cache import cache
+from django.db.models import F
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from apps.agenda.models import Agenda
+from apps.inventory.models import Varilla
+from apps.orders.models import Pedido
+from apps.production.models import OrdenProduccion, MovimientoInventario
+from apps.tenants.models import Tenant
+from apps.tenants.services import TenantResolver
+
+
+class TenantIndexQueryPlanTests(TestCase):
+    """Las consultas más frecuentes por tenant deben usar los índices compuestos."""
+
+    TENANTS = 20
+
+    @classmethod
+    def setUpTestData(cls):
+        ahora = timezone.now()
+        hoy = date.today()
+        Pedido.objects.bulk_create(
+            Pedido(tenant_id=t, cliente_id=i, fecha_pedido=hoy, estado='pendiente', total=0)
+            for t in range(cls.TENANTS) for i in range(10)
+        )
+        Agenda.objects.bulk_create(
+            Agenda(tenant_id=t, user_id=1, titulo='cita', fecha_inicio=ahora + timedelta(hours=i))
+            for t in range(cls.TENANTS) for i in range(10)
+        )
+        Varilla.objects.bulk_create(
+            Varilla(tenant_id=t, nombre='v', longitud=1, precio=1, stock=i, minimo=5)
+            for t in range(cls.TENANTS) for i in range(10)
+        )
+        OrdenProduccion.objects.bulk_create(
+            OrdenProduccion(tenant_id=t, fecha_creacion=hoy - timedelta(days=i))
+            for t in range(cls.TENANTS) for i in range(10)
+        )
+        MovimientoInventario.objects.bulk_create(
+            MovimientoInventario(
+                tenant_id=t, material_type='varilla', material_id=i,
+                tipo_movimiento='salida', cantidad=1
+            )
+            for t in range(cls.TENANTS) for i in range(10)
+        )
+
+    def assertUsesIndex(self, queryset, index_name):
+        plan = queryset.explain()
+        self.assertIn(index_name, plan, msg=plan)
+
+    def test_pedidos_por_estado(self):
+        self.assertUsesIndex(
+            Pedido.objects.filter(tenant_id=3, estado='pendiente'),
+            'pedido_tenant_estado_idx'
+        )
+
+    def test_agenda_por_rango(self):
+        inicio = timezone.now()
+        self.assertUsesIndex(
+            Agenda.objects.filter(tenant_id=3, fecha_inicio__gte=inicio, fecha_inicio__lt=inicio + timedelta(days=1)),
+            'agenda_tenant_inicio_idx'
+        )
+
+    def test_varillas_stock_bajo(self):
+        self.assertUsesIndex(
+            Varilla.objects.filter(tenant_id=3, stock__lte=F('minimo')),
+            'varilla_tenant_stock_idx'
+        )
+
+    def test_ordenes_del_periodo(self):
+        self.assertUsesIndex(
+            OrdenProduccion.objects.filter(tenant_id=3, fecha_creacion__gte=date.today() - timedelta(days=30)),
+            'orden_tenant_fecha_idx'
+        )
+
+    def test_historial_de_material(self):
+        self.assertUsesIndex(
+            MovimientoInventario.objects.filter(
+                tenant_id=3, material_type='varilla', material_id=4,
+                fecha__gte=timezone.now() - timedelta(days=30)
+            ),
+            'mov_material_item_idx'
+        )
+
+
+class TenantResolverTests(TestCase):
+    """Cache de tenants: invalidación entre procesos solo con cache compartida."""
+
+    def setUp(self):
+        TenantResolver.invalidate()
+        self.tenant = Tenant.objects.create(name='Estudio', subdomain='estudio')
+
+    def rename(self, name):
+        # update() no dispara señales: simula un cambio hecho por otro proceso
+        Tenant.objects.filter(pk=self.tenant.pk).update(name=name)
+
+    def resolve_at(self, ahora):
+        with mock.patch('apps.tenants.services.time.monotonic', return_value=ahora):
+            return TenantResolver.resolve('estudio')
+
+    @override_settings(TENANT_CACHE_TTL=300, TENANT_CACHE_LOCAL_TTL=5)
+    def test_cache_local_usa_ttl_corto(self):
+        self.assertEqual(self.resolve_at(1000).name, 'Estudio')
+        self.rename('Renombrado')
+        self.assertEqual(self.resolve_at(1004).name, 'Estudio')
+        self.assertEqual(self.resolve_at(1006).name, 'Renombrado')
+
+    @override_settings(
+        TENANT_CACHE_TTL=300, TENANT_CACHE_LOCAL_TTL=5, TENANT_CACHE_SYNC_INTERVAL=1,
+        CACHES={'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': os.path.join(tempfile.gettempdir(), 'fotostudio-test-cache'),
+        }},
+    )
+    def test_cache_compartida_invalida_entre_procesos(self):
+        cache.clear()
+        self.assertEqual(self.resolve_at(1000).name, 'Estudio')
+        self.rename('Renombrado')
+        # Sigue en cache más allá del TTL local mientras nadie invalide
+        self.assertEqual(self.resolve_at(1010).name, 'Estudio')
+        # Otro proceso incrementa la versión compartida
+        cache.set(TenantResolver.VERSION_KEY, cache.get(TenantResolver.VERSION_KEY, 0) + 1)
+        self.assertEqual(self.resolve_at(1012).name, 'Renombrado')
@@ -2,7 +2,10 @@ from django.http import JsonResponse, Http404
 from django.views import View
 from django.utils.decorators import method_decorator
 from django.views.decorators.csrf import csrf_exempt
+from rest_framework.exceptions import NotFound
+from fotostudio.pagination import KeysetPagination
 from .models import Tenant
+from .services import TenantResolver, extract_subdomain
 from typing import Any, Dict
 
 
@@ -20,9 +23,18 @@ def serialize_tenant(tenant: Tenant) -> Dict[str, Any]:
 @method_decorator(csrf_exempt, name="dispatch")
 class TenantListView(View):
     def get(self, request):
-        tenants = Tenant.objects.all().order_by("id")
+        paginator = KeysetPagination()
+        try:
+            tenants = paginator.paginate_queryset(Tenant.objects.all(), request)
+        except NotFound as e:
+            raise Http404(str(e.detail))
         data = [serialize_tenant(t) for t in tenants]
-        return JsonResponse({"results": data, "count": len(data)}, safe=False)
+        return JsonResponse({
+            "results": data,
+            "count": len(data),
+            "next": paginator.get_next_link(),
+            "previous": paginator.get_previous_link(),
+        }, safe=False)
 
 
 @method_decorator(csrf_exempt, name="dispatch")
@@ -36,20 +48,12 @@ class TenantDetailView(View):
 
 
 def _extract_subdomain_from_host(host: str) -> str:
-    # host puede incluir puerto, ej: subdominio.dominio.tld:8000
-    host_without_port = host.split(":")[0]
-    parts = host_without_port.split(".")
-    # Si hay al menos 3 partes, asuma primer elemento como subdominio
-    # Para desarrollo con localhost, permita 'localhost' sin subdominio
-    if host_without_port.startswith("localhost") or host_without_port.startswith("127.0.0.1"):
-        return "default"
-    return parts[0] if len(parts) >= 3 else "default"
+    return extract_subdomain(host)
 
 
 def current_tenant(request):
-    subdomain = _extract_subdomain_from_host(request.get_host())
-    try:
-        tenant = Tenant.objects.get(subdomain=subdomain)
-    except Tenant.DoesNotExist:
+    # El middleware ya resolvió el tenant; sin middleware se usa la misma cache
+    tenant = getattr(request, "tenant", None) or TenantResolver.resolve_host(request.get_host())
+    if tenant is None:
         raise Http404("Tenant actual no encontrado")
     return JsonResponse(serialize_tenant(tenant), safe=False)
@@ -0,0 +1,18 @@
+"""
+Utilidades sobre el backend de cache configurado.
+"""
+
+from django.conf import settings
+from django.core.cache import DEFAULT_CACHE_ALIAS
+
+# Backends cuyo contenido solo ve el proceso que lo escribió
+LOCAL_CACHE_BACKENDS = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+def cache_is_shared(alias: str = DEFAULT_CACHE_ALIAS) -> bool:
+    """True si lo escrito en la cache lo ven todos los workers (Redis, Memcached, BD, archivos)."""
+    backend = settings.CACHES.get(alias, {}).get('BACKEND', '')
+    return backend not in LOCAL_CACHE_BACKENDS
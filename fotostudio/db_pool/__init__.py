@@ -0,0 +1,6 @@
+"""
+Backend MySQL (PyMySQL) con pool de conexiones por proceso.
+
+Se activa con ``'ENGINE': 'fotostudio.db_pool'`` y se configura con la clave
+``POOL`` de la base de datos (ver ``fotostudio/settings.py``).
+"""
@@ -0,0 +1,71 @@
+"""
+DatabaseWrapper de MySQL que toma y devuelve las conexiones de un ConnectionPool.
+
+Django abre y cierra la conexión en cada request (CONN_MAX_AGE = 0); con este
+backend "abrir" es sacar una conexión ya autenticada del pool y "cerrar" es
+devolverla, evitando el handshake TCP + autenticación por request.
+"""
+
+import threading
+
+from django.db.backends.mysql import base as mysql_base
+
+from .pool import ConnectionPool, PoolTimeout
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(alias: str):
+    """Pool de un alias ya inicializado (None si aún no se conectó)."""
+    return _pools.get(alias)
+
+
+class DatabaseWrapper(mysql_base.DatabaseWrapper):
+    
+    def _get_pool(self, conn_params) -> ConnectionPool:
+        pool = _pools.get(self.alias)
+        if pool is None:
+            with _pools_lock:
+                pool = _pools.get(self.alias)
+                if pool is None:
+                    opciones = self.settings_dict.get('POOL') or {}
+                    pool = ConnectionPool(
+                        connect=lambda: super(DatabaseWrapper, self).get_new_connection(conn_params),
+                        size=opciones.get('SIZE', 10),
+                        timeout=opciones.get('TIMEOUT', 10),
+                        max_age=opciones.get('MAX_AGE', 1800),
+                        health_check_interval=opciones.get('HEALTH_CHECK_INTERVAL', 30),
+                    )
+                    _pools[self.alias] = pool
+        return pool
+    
+    def get_new_connection(self, conn_params):
+        try:
+            conexion, self._pool_reused = self._get_pool(conn_params).acquire()
+        except PoolTimeout as exc:
+            raise mysql_base.Database.OperationalError(str(exc)) from exc
+        return conexion
+    
+    def init_connection_state(self):
+        # Una conexión reutilizada ya tiene configurada la sesión
+        if getattr(self, '_pool_reused', False):
+            return
+        super().init_connection_state()
+    
+    def _close(self):
+        if self.connection is None:
+            return
+        pool = _pools.get(self.alias)
+        if pool is None:
+            return super()._close()
+        
+        descartar = self.errors_occurred and not self.is_usable()
+        if not descartar and (self.in_atomic_block or not self.get_autocommit()):
+            # No devolver al pool una transacción abierta
+            try:
+                self.connection.rollback()
+                self.connection.autocommit(self.settings_dict['AUTOCOMMIT'])
+            except mysql_base.Database.Error:
+                descartar = True
+        pool.release(self.connection, discard=descartar)
@@ -0,0 +1,32 @@
+"""
+Middleware que mide la espera del pool de conexiones en cada request.
+"""
+
+import logging
+
+from .pool import end_request_metrics, start_request_metrics
+
+logger = logging.getLogger('fotostudio.db_pool')
+
+
+class PoolMetricsMiddleware:
+    """Añade X-DB-Pool-Wait-Ms y X-DB-Pool-Checkouts a la respuesta y lo registra en el log."""
+    
+    def __init__(self, get_response):
+        self.get_response = get_response
+    
+    def __call__(self, request):
+        metricas = start_request_metrics()
+        try:
+            response = self.get_response(request)
+        finally:
+            end_request_metrics()
+        
+        espera_ms = metricas['espera'] * 1000
+        response['X-DB-Pool-Wait-Ms'] = f'{espera_ms:.2f}'
+        response['X-DB-Pool-Checkouts'] = str(metricas['checkouts'])
+        logger.debug(
+            'pool %s %s: espera=%.2fms checkouts=%d nuevas=%d',
+            request.method, request.path, espera_ms, metricas['checkouts'], metricas['nuevas']
+        )
+        return response
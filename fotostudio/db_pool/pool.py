@@ -0,0 +1,168 @@
+"""
+Pool de conexiones thread-safe con chequeo de salud, reciclado por edad y
+métricas de espera por request.
+"""
+
+import logging
+import threading
+import time
+from collections import deque
+from contextvars import ContextVar
+from typing import Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# Métricas de la request en curso (las inicializa PoolMetricsMiddleware)
+_request_metrics: ContextVar[Optional[Dict]] = ContextVar('db_pool_request_metrics', default=None)
+
+
+def start_request_metrics() -> Dict:
+    metricas = {'checkouts': 0, 'espera': 0.0, 'nuevas': 0}
+    _request_metrics.set(metricas)
+    return metricas
+
+
+def end_request_metrics():
+    _request_metrics.set(None)
+
+
+class PoolTimeout(Exception):
+    """No se obtuvo una conexión libre dentro del tiempo de espera."""
+
+
+class ConnectionPool:
+    """Pool LIFO de conexiones DB-API.
+    
+    - ``size``: máximo de conexiones abiertas (en uso + libres).
+    - ``timeout``: segundos que se espera una conexión libre antes de fallar.
+    - ``max_age``: segundos tras los que una conexión se cierra y se reemplaza.
+    - ``health_check_interval``: una conexión libre durante más de estos
+      segundos se verifica con ping antes de entregarla.
+    """
+    
+    def __init__(self, connect: Callable, size: int = 10, timeout: float = 10,
+                 max_age: float = 1800, health_check_interval: float = 30):
+        self.connect = connect
+        self.size = size
+        self.timeout = timeout
+        self.max_age = max_age
+        self.health_check_interval = health_check_interval
+        
+        self._cond = threading.Condition()
+        # (conexión, creada, último uso); LIFO para que las menos usadas caduquen
+        self._idle = deque()
+        self._created = {}
+        self._total = 0
+        self._stats = {'checkouts': 0, 'creadas': 0, 'recicladas': 0, 'descartadas': 0,
+                       'timeouts': 0, 'espera_total': 0.0}
+    
+    def _expired(self, conexion, ahora: float) -> bool:
+        return ahora - self._created.get(id(conexion), ahora) >= self.max_age
+    
+    def _discard(self, conexion, motivo: str):
+        """Cerrar una conexión que sale del pool (fuera del lock)."""
+        with self._cond:
+            self._created.pop(id(conexion), None)
+            self._total -= 1
+            self._stats[motivo] += 1
+            self._cond.notify()
+        try:
+            conexion.close()
+        except Exception:
+            pass
+    
+    @staticmethod
+    def _ping(conexion) -> bool:
+        try:
+            conexion.ping(False)
+            return True
+        except Exception:
+            return False
+    
+    def acquire(self):
+        """Devolver (conexión, reutilizada); crea una nueva si hay cupo."""
+        inicio = time.monotonic()
+        limite = inicio + self.timeout
+        while True:
+            candidata = None
+            crear = False
+            with self._cond:
+                while not self._idle and self._total >= self.size:
+                    restante = limite - time.monotonic()
+                    if restante <= 0:
+                        self._stats['timeouts'] += 1
+                        raise PoolTimeout(
+                            f'Sin conexiones libres tras {self.timeout}s (pool de {self.size})'
+                        )
+                    self._cond.wait(restante)
+                if self._idle:
+                    candidata = self._idle.pop()
+                else:
+                    self._total += 1
+                    crear = True
+            
+            ahora = time.monotonic()
+            if crear:
+                try:
+                    conexion = self.connect()
+                except Exception:
+                    with self._cond:
+                        self._total -= 1
+                        self._cond.notify()
+                    raise
+                with self._cond:
+                    self._created[id(conexion)] = ahora
+                    self._stats['creadas'] += 1
+                reutilizada = False
+            else:
+                conexion, _, ultimo_uso = candidata
+                if self._expired(conexion, ahora):
+                    self._discard(conexion, 'recicladas')
+                    continue
+                if ahora - ultimo_uso >= self.health_check_interval and not self._ping(conexion):
+                    self._discard(conexion, 'descartadas')
+                    continue
+                reutilizada = True
+            
+            self._record_wait(ahora - inicio, not reutilizada)
+            return conexion, reutilizada
+    
+    def release(self, conexion, discard: bool = False):
+        """Devolver la conexión al pool, o cerrarla si está rota o caducada."""
+        ahora = time.monotonic()
+        if discard:
+            self._discard(conexion, 'descartadas')
+        elif self._expired(conexion, ahora):
+            self._discard(conexion, 'recicladas')
+        else:
+            with self._cond:
+                self._idle.append((conexion, self._created[id(conexion)], ahora))
+                self._cond.notify()
+    
+    def _record_wait(self, espera: float, nueva: bool):
+        with self._cond:
+            self._stats['checkouts'] += 1
+            self._stats['espera_total'] += espera
+        metricas = _request_metrics.get()
+        if metricas is not None:
+            metricas['checkouts'] += 1
+            metricas['espera'] += espera
+            metricas['nuevas'] += int(nueva)
+    
+    def stats(self) -> Dict:
+        with self._cond:
+            return {
+                **self._stats,
+                'tamano': self.size,
+                'abiertas': self._total,
+                'libres': len(self._idle),
+                'en_uso': self._total - len(self._idle),
+            }
+    
+    def close_all(self):
+        """Cerrar las conexiones libres (p. ej. al terminar el proceso)."""
+        with self._cond:
+            libres = list(self._idle)
+            self._idle.clear()
+        for conexion, _, _ in libres:
+            self._discard(conexion, 'descartadas')
@@ -0,0 +1,154 @@
+"""
+Paginación de las listas de la API: por keyset (cursor) por defecto y por
+número de página para las listas ordenadas por otra clave.
+"""
+
+import base64
+import json
+from collections import OrderedDict
+
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """Pagina por (created_at, id) descendente sin OFFSET ni COUNT.
+    
+    El cursor codifica la posición de la última (o primera) fila de la
+    página, así que el coste de cada página no depende de su profundidad.
+    Los demás parámetros de la URL (filtros) se conservan en los enlaces.
+    Los modelos sin created_at se paginan solo por id.
+    """
+    
+    page_size = api_settings.PAGE_SIZE or 50
+    page_size_query_param = 'page_size'
+    max_page_size = 1000
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Cursor inválido'
+    
+    def get_page_size(self, params) -> int:
+        try:
+            size = int(params.get(self.page_size_query_param, self.page_size))
+        except (TypeError, ValueError):
+            return self.page_size
+        return max(1, min(size, self.max_page_size))
+    
+    @staticmethod
+    def get_fields(model):
+        try:
+            model._meta.get_field('created_at')
+        except FieldDoesNotExist:
+            return ('id',)
+        return ('created_at', 'id')
+    
+    def encode_cursor(self, reverse: bool, row) -> str:
+        valores = [getattr(row, field) for field in self.fields]
+        valores = [valor.isoformat() if hasattr(valor, 'isoformat') else valor for valor in valores]
+        crudo = json.dumps([int(reverse), valores]).encode()
+        cursor = base64.urlsafe_b64encode(crudo).decode()
+        return replace_query_param(self.base_url, self.cursor_query_param, cursor)
+    
+    def decode_cursor(self, params):
+        cursor = params.get(self.cursor_query_param)
+        if not cursor:
+            return None
+        try:
+            reverse, valores = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+            if not isinstance(valores, list) or len(valores) != len(self.fields):
+                raise ValueError
+            if self.fields[0] == 'created_at':
+                valores[0] = parse_datetime(valores[0])
+                if valores[0] is None:
+                    raise ValueError
+            valores[-1] = int(valores[-1])
+        except (TypeError, ValueError, KeyError, IndexError):
+            raise NotFound(self.invalid_cursor_message)
+        return bool(reverse), valores
+    
+    def position_filter(self, valores, reverse: bool) -> Q:
+        """Filas posteriores (o anteriores si reverse) a la posición del cursor."""
+        lookup = 'gt' if reverse else 'lt'
+        if len(self.fields) == 1:
+            return Q(**{f'id__{lookup}': valores[0]})
+        return (
+            Q(**{f'created_at__{lookup}': valores[0]}) |
+            Q(created_at=valores[0], **{f'id__{lookup}': valores[1]})
+        )
+    
+    def paginate_queryset(self, queryset, request, view=None):
+        params = getattr(request, 'query_params', request.GET)
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(params)
+        self.fields = self.get_fields(queryset.model)
+        
+        cursor = self.decode_cursor(params)
+        reverse = bool(cursor and cursor[0])
+        if cursor:
+            queryset = queryset.filter(self.position_filter(cursor[1], reverse))
+        
+        ordering = self.fields if reverse else tuple(f'-{field}' for field in self.fields)
+        filas = list(queryset.order_by(*ordering)[:self.page_size + 1])
+        hay_mas = len(filas) > self.page_size
+        filas = filas[:self.page_size]
+        if reverse:
+            filas.reverse()
+        
+        if reverse:
+            self.has_next, self.has_previous = True, hay_mas
+        else:
+            self.has_next, self.has_previous = hay_mas, cursor is not None
+        self.page = filas
+        return filas
+    
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(False, self.page[-1])
+    
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+        return self.encode_cursor(True, self.page[0])
+    
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data),
+        ]))
+    
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+
+class StandardPagination(PageNumberPagination):
+    """Paginación por número de página para listas que no se ordenan por (created_at, id).
+    
+    Se usa en alertas, reportes y colas ordenadas por su propia clave, donde
+    KeysetPagination no aplica. El tamaño por defecto y el máximo pueden
+    ajustarse por vista.
+    """
+    
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 500
+    
+    def __init__(self, page_size: int = None, max_page_size: int = None):
+        if page_size is not None:
+            self.page_size = page_size
+        if max_page_size is not None:
+            self.max_page_size = max_page_size
@@ -0,0 +1,224 @@
+"""
+Enrutamiento de lecturas de reportes y dashboard a la réplica de lectura.
+
+- ``ReplicaRouter`` envía todas las escrituras a ``default`` y las lecturas a
+  ``replica`` solo dentro de vistas marcadas con ``use_replica``.
+- Tras una escritura, las lecturas de la misma request y las del mismo usuario
+  durante ``DATABASE_REPLICA_MAX_LAG`` segundos se quedan en el primario
+  (read-after-write). La marca se guarda en la cache, así que la réplica solo
+  se activa con una cache compartida entre workers (Redis, Memcached, BD):
+  con LocMemCache otro worker no vería la marca y leería datos atrasados.
+- Si la réplica está atrasada más de ``DATABASE_REPLICA_MAX_LAG`` segundos (o
+  la replicación está detenida) las lecturas vuelven al primario.
+
+Sin alias ``replica`` en DATABASES todo sigue en ``default``.
+"""
+
+import asyncio
+import functools
+import logging
+import threading
+import time
+from contextvars import ContextVar
+from typing import Dict, Optional
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.http import StreamingHttpResponse
+
+from fotostudio.cache import cache_is_shared
+
+logger = logging.getLogger(__name__)
+
+REPLICA_DB_ALIAS = 'replica'
+PIN_CACHE_PREFIX = 'replica:pin'
+
+# Estado de la request en curso (lo inicializa ReplicaPinMiddleware)
+_request_state: ContextVar[Optional[Dict]] = ContextVar('replica_request_state', default=None)
+_use_replica: ContextVar[bool] = ContextVar('replica_use_replica', default=False)
+
+
+_local_cache_warned = False
+
+
+def replica_configured() -> bool:
+    """Réplica definida en DATABASES y cache compartida para las marcas read-after-write."""
+    global _local_cache_warned
+    if REPLICA_DB_ALIAS not in settings.DATABASES:
+        return False
+    if not cache_is_shared():
+        if not _local_cache_warned:
+            _local_cache_warned = True
+            logger.warning(
+                'Réplica de lectura desactivada: la cache por proceso no comparte '
+                'las marcas read-after-write entre workers (configure CACHE_BACKEND)'
+            )
+        return False
+    return True
+
+
+def max_lag() -> float:
+    return getattr(settings, 'DATABASE_REPLICA_MAX_LAG', 5)
+
+
+class ReplicaLagMonitor:
+    """Retraso de la réplica, medido como mucho cada DATABASE_REPLICA_LAG_CHECK_INTERVAL segundos."""
+    
+    _lock = threading.Lock()
+    _checked_at = None
+    _lag = 0.0
+    
+    @staticmethod
+    def _measure() -> Optional[float]:
+        """Segundos de retraso; None si la replicación está detenida o no se puede medir."""
+        conexion = connections[REPLICA_DB_ALIAS]
+        if conexion.vendor != 'mysql':
+            # Réplicas locales (p. ej. una segunda base SQLite) se consideran al día
+            return 0.0
+        with conexion.cursor() as cursor:
+            for sentencia, columna in (
+                ('SHOW REPLICA STATUS', 'Seconds_Behind_Source'),
+                ('SHOW SLAVE STATUS', 'Seconds_Behind_Master'),
+            ):
+                try:
+                    cursor.execute(sentencia)
+                except Exception:
+                    continue
+                fila = cursor.fetchone()
+                if fila is None:
+                    # El servidor no es una réplica (p. ej. el mismo primario)
+                    return 0.0
+                columnas = [col[0] for col in cursor.description]
+                valor = dict(zip(columnas, fila)).get(columna)
+                return None if valor is None else float(valor)
+        return None
+    
+    @classmethod
+    def lag(cls) -> Optional[float]:
+        intervalo = getattr(settings, 'DATABASE_REPLICA_LAG_CHECK_INTERVAL', 5)
+        ahora = time.monotonic()
+        with cls._lock:
+            if cls._checked_at is not None and ahora - cls._checked_at < intervalo:
+                return cls._lag
+            cls._checked_at = ahora
+        try:
+            lag = cls._measure()
+        except Exception:
+            logger.warning('No se pudo medir el retraso de la réplica', exc_info=True)
+            lag = None
+        with cls._lock:
+            cls._lag = lag
+        return lag
+    
+    @classmethod
+    def healthy(cls) -> bool:
+        lag = cls.lag()
+        return lag is not None and lag <= max_lag()
+
+
+def _pin_key(request) -> Optional[str]:
+    user = getattr(request, 'user', None)
+    if user is not None and getattr(user, 'is_authenticated', False):
+        return f'{PIN_CACHE_PREFIX}:{user.pk}'
+    return None
+
+
+def _pinned(request) -> bool:
+    key = _pin_key(request)
+    return bool(key and cache.get(key))
+
+
+def _replica_available(request) -> bool:
+    return replica_configured() and not _pinned(request) and ReplicaLagMonitor.healthy()
+
+
+def use_replica(view_func):
+    """Ejecutar las lecturas de la vista en la réplica (si está configurada y al día).
+    
+    Para vistas de clase: ``@method_decorator(use_replica, name='get')``. Acepta
+    también vistas async.
+    """
+    if asyncio.iscoroutinefunction(view_func):
+        @functools.wraps(view_func)
+        async def _async_wrapped(request, *args, **kwargs):
+            if not await sync_to_async(_replica_available)(request):
+                return await view_func(request, *args, **kwargs)
+            token = _use_replica.set(True)
+            try:
+                return await view_func(request, *args, **kwargs)
+            finally:
+                _use_replica.reset(token)
+        return _async_wrapped
+    
+    @functools.wraps(view_func)
+    def _wrapped(request, *args, **kwargs):
+        if not _replica_available(request):
+            return view_func(request, *args, **kwargs)
+        
+        token = _use_replica.set(True)
+        try:
+            response = view_func(request, *args, **kwargs)
+        finally:
+            _use_replica.reset(token)
+        
+        if isinstance(response, StreamingHttpResponse):
+            # El contenido se genera después de salir de la vista
+            response.streaming_content = _stream_from_replica(response.streaming_content)
+        return response
+    return _wrapped
+
+
+def _stream_from_replica(contenido):
+    token = _use_replica.set(True)
+    try:
+        yield from contenido
+    finally:
+        _use_replica.reset(token)
+
+
+class ReplicaRouter:
+    """Router de lecturas a la réplica dentro de vistas marcadas con use_replica."""
+    
+    def db_for_read(self, model, **hints):
+        if not _use_replica.get():
+            return None
+        estado = _request_state.get()
+        if estado is not None and estado['escribio']:
+            return DEFAULT_DB_ALIAS
+        return REPLICA_DB_ALIAS
+    
+    def db_for_write(self, model, **hints):
+        estado = _request_state.get()
+        if estado is not None:
+            estado['escribio'] = True
+        return DEFAULT_DB_ALIAS
+    
+    def allow_relation(self, obj1, obj2, **hints):
+        # Ambos alias contienen los mismos datos
+        aliases = {DEFAULT_DB_ALIAS, REPLICA_DB_ALIAS}
+        if obj1._state.db in aliases and obj2._state.db in aliases:
+            return True
+        return None
+
+
+class ReplicaPinMiddleware:
+    """Mantiene en el primario las lecturas del usuario que acaba de escribir."""
+    
+    def __init__(self, get_response):
+        self.get_response = get_response
+    
+    def __call__(self, request):
+        estado = {'escribio': False}
+        token = _request_state.set(estado)
+        try:
+            response = self.get_response(request)
+        finally:
+            _request_state.reset(token)
+        
+        if estado['escribio'] and replica_configured():
+            key = _pin_key(request)
+            if key:
+                cache.set(key, True, max_lag())
+        return response
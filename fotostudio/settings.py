@@ -33,6 +33,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'fotostudio.db_pool.middleware.PoolMetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -40,6 +41,8 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'apps.tenants.middleware.TenantMiddleware',
+    'fotostudio.replica.ReplicaPinMiddleware',
 ]
 
 ROOT_URLCONF = 'fotostudio.urls'
@@ -63,7 +66,8 @@ WSGI_APPLICATION = 'fotostudio.wsgi.application'
 
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.mysql',
+        # Backend MySQL con pool de conexiones (ver fotostudio/db_pool)
+        'ENGINE': 'fotostudio.db_pool',
         'NAME': 'AV1',  # Cambiar por el nombre de la base de datos
         'USER': 'root',   # Cambiar por el usuario de la base de datos
         'PASSWORD': '123456',   # Cambiar por la contraseña de la base de datos
@@ -71,10 +75,85 @@ DATABASES = {
         'PORT': '3306',
         'OPTIONS': {
             'charset': 'utf8mb4'
-        }
+        },
+        # El pool reutiliza las conexiones: Django las "cierra" al final de
+        # cada request y vuelven al pool sin repetir el handshake
+        'CONN_MAX_AGE': 0,
+        'POOL': {
+            'SIZE': int(os.environ.get('DB_POOL_SIZE', 10)),
+            'TIMEOUT': float(os.environ.get('DB_POOL_TIMEOUT', 10)),
+            'MAX_AGE': float(os.environ.get('DB_POOL_MAX_AGE', 1800)),
+            'HEALTH_CHECK_INTERVAL': float(os.environ.get('DB_POOL_HEALTH_CHECK_INTERVAL', 30)),
+        },
+    }
+}
+
+# Réplica de lectura para reportes y dashboard (ver fotostudio/replica.py).
+# Con DB_REPLICA_ENGINE=django.db.backends.sqlite3 y DB_REPLICA_NAME=<archivo>
+# se puede probar localmente con una segunda base SQLite.
+if os.environ.get('DB_REPLICA_HOST') or os.environ.get('DB_REPLICA_ENGINE'):
+    DATABASES['replica'] = {
+        **DATABASES['default'],
+        'ENGINE': os.environ.get('DB_REPLICA_ENGINE', DATABASES['default']['ENGINE']),
+        'NAME': os.environ.get('DB_REPLICA_NAME', DATABASES['default']['NAME']),
+        'USER': os.environ.get('DB_REPLICA_USER', DATABASES['default']['USER']),
+        'PASSWORD': os.environ.get('DB_REPLICA_PASSWORD', DATABASES['default']['PASSWORD']),
+        'HOST': os.environ.get('DB_REPLICA_HOST', DATABASES['default']['HOST']),
+        'PORT': os.environ.get('DB_REPLICA_PORT', DATABASES['default']['PORT']),
+        'TEST': {'MIRROR': 'default'},
+    }
+    if DATABASES['replica']['ENGINE'] == 'django.db.backends.sqlite3':
+        DATABASES['replica'] = {k: v for k, v in DATABASES['replica'].items() if k not in ('OPTIONS', 'POOL')}
+
+DATABASE_ROUTERS = ['fotostudio.replica.ReplicaRouter']
+
+# Segundos de retraso tolerado en la réplica: pasado ese valor las lecturas vuelven
+# al primario, y es también lo que un usuario lee del primario tras escribir
+DATABASE_REPLICA_MAX_LAG = float(os.environ.get('DB_REPLICA_MAX_LAG', 5))
+DATABASE_REPLICA_LAG_CHECK_INTERVAL = float(os.environ.get('DB_REPLICA_LAG_CHECK_INTERVAL', 5))
+
+# Cache en memoria por proceso; en producción puede apuntar a Redis/Memcached.
+# La réplica de lectura y la invalidación de tenants entre workers necesitan una cache compartida
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.environ.get('CACHE_LOCATION', 'fotostudio'),
     }
 }
 
+# Segundos que se reutilizan las métricas del dashboard antes de recalcularlas
+DASHBOARD_CACHE_TTL = int(os.environ.get('DASHBOARD_CACHE_TTL', 10))
+
+# Segundos que se reutiliza el reporte de stock en modo snapshot (?snapshot=1)
+INVENTORY_STOCK_REPORT_TTL = int(os.environ.get('INVENTORY_STOCK_REPORT_TTL', 300))
+
+# Segundos que el snapshot de stock deja de margen antes del corte, para
+# incluir los asientos de transacciones que aún no confirmaron
+INVENTORY_SNAPSHOT_DELAY = int(os.environ.get('INVENTORY_SNAPSHOT_DELAY', 300))
+
+# Días que un lote ya vencido sigue apareciendo en las alertas de vencimiento
+INVENTORY_EXPIRED_LOOKBACK_DAYS = int(os.environ.get('INVENTORY_EXPIRED_LOOKBACK_DAYS', 30))
+
+# Segundos que se reutilizan los reportes de producción en modo snapshot
+PRODUCTION_REPORT_CACHE_TTL = int(os.environ.get('PRODUCTION_REPORT_CACHE_TTL', 300))
+
+# Cache en memoria de tenants por subdominio: entradas, vida (s) y cada cuánto
+# se consulta la versión compartida para ver invalidaciones de otros procesos
+TENANT_CACHE_SIZE = int(os.environ.get('TENANT_CACHE_SIZE', 1024))
+TENANT_CACHE_TTL = int(os.environ.get('TENANT_CACHE_TTL', 300))
+TENANT_CACHE_SYNC_INTERVAL = float(os.environ.get('TENANT_CACHE_SYNC_INTERVAL', 1))
+# Vida (s) de las entradas cuando la cache es por proceso y no hay invalidación entre workers
+TENANT_CACHE_LOCAL_TTL = int(os.environ.get('TENANT_CACHE_LOCAL_TTL', 5))
+
+# Segundos que se reutiliza cada día del calendario de citas
+AGENDA_CALENDAR_CACHE_TTL = int(os.environ.get('AGENDA_CALENDAR_CACHE_TTL', 30))
+
+# Agenda: duración de citas sin fin, duración máxima, jornada y paso de los horarios libres
+AGENDA_DEFAULT_DURATION_MINUTES = int(os.environ.get('AGENDA_DEFAULT_DURATION_MINUTES', 60))
+AGENDA_MAX_DURATION_HOURS = int(os.environ.get('AGENDA_MAX_DURATION_HOURS', 12))
+AGENDA_WORKDAY = (os.environ.get('AGENDA_WORKDAY_START', '09:00'), os.environ.get('AGENDA_WORKDAY_END', '19:00'))
+AGENDA_SLOT_STEP_MINUTES = int(os.environ.get('AGENDA_SLOT_STEP_MINUTES', 30))
+
 AUTH_PASSWORD_VALIDATORS = [
     {'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator'},
     {'NAME': 'django.contrib.auth.password_validation.MinimumLengthValidator'},
@@ -100,6 +179,11 @@ REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',
     ),
+    'DEFAULT_FILTER_BACKENDS': (
+        'apps.tenants.filters.TenantFilterBackend',
+    ),
+    'DEFAULT_PAGINATION_CLASS': 'fotostudio.pagination.KeysetPagination',
+    'PAGE_SIZE': 50,
 }
 
 SIMPLE_JWT = {
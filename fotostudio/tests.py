@@ -0,0 +1,118 @@
+import base64
+import json
+import os
+import tempfile
+from types import SimpleNamespace
+from unittest import mock, skipUnless
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from rest_framework.exceptions import NotFound
+from rest_framework.request import Request
+
+from apps.inventory.models import Varilla
+from fotostudio.pagination import KeysetPagination
+from fotostudio.replica import (
+    REPLICA_DB_ALIAS, ReplicaLagMonitor, ReplicaPinMiddleware, use_replica,
+)
+
+HAS_REPLICA = REPLICA_DB_ALIAS in settings.DATABASES
+
+SHARED_CACHE = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.path.join(tempfile.gettempdir(), 'fotostudio-test-cache'),
+    }
+}
+
+
+@use_replica
+def leer_varillas(request):
+    return HttpResponse(str(Varilla.objects.count()))
+
+
+def crear_varilla(request):
+    Varilla.objects.create(tenant_id=1, nombre='v', longitud=1, precio=1)
+    return HttpResponse('ok')
+
+
+@use_replica
+def crear_y_leer(request):
+    crear_varilla(request)
+    return leer_varillas.__wrapped__(request)
+
+
+@skipUnless(HAS_REPLICA, 'Requiere el alias replica (DB_REPLICA_ENGINE)')
+@override_settings(CACHES=SHARED_CACHE, DATABASE_REPLICA_MAX_LAG=5)
+class ReplicaRouterTests(TransactionTestCase):
+    """La réplica es un espejo de default: se comprueba qué conexión ejecuta cada consulta."""
+
+    databases = {DEFAULT_DB_ALIAS, REPLICA_DB_ALIAS} if HAS_REPLICA else {DEFAULT_DB_ALIAS}
+
+    def setUp(self):
+        cache.clear()
+        ReplicaLagMonitor._checked_at = None
+        self.factory = RequestFactory()
+
+    def request(self, vista, user_id, method='get'):
+        request = getattr(self.factory, method)('/')
+        request.user = SimpleNamespace(pk=user_id, is_authenticated=True)
+        with CaptureQueriesContext(connections[DEFAULT_DB_ALIAS]) as primario, \
+                CaptureQueriesContext(connections[REPLICA_DB_ALIAS]) as replica:
+            ReplicaPinMiddleware(vista)(request)
+        return len(primario), len(replica)
+
+    def test_lecturas_van_a_la_replica(self):
+        self.assertEqual(self.request(leer_varillas, 1), (0, 1))
+
+    def test_lecturas_tras_escribir_en_la_misma_request(self):
+        primario, replica = self.request(crear_y_leer, 1, 'post')
+        self.assertEqual(replica, 0)
+        self.assertGreaterEqual(primario, 2)
+
+    def test_usuario_que_escribio_queda_en_el_primario(self):
+        self.request(crear_varilla, 1, 'post')
+        self.assertEqual(self.request(leer_varillas, 1), (1, 0))
+        # Otro usuario sigue leyendo de la réplica
+        self.assertEqual(self.request(leer_varillas, 2), (0, 1))
+
+    def test_marca_expira_con_el_retraso_maximo(self):
+        with override_settings(DATABASE_REPLICA_MAX_LAG=1):
+            self.request(crear_varilla, 1, 'post')
+        with mock.patch('django.core.cache.backends.filebased.time.time', return_value=10 ** 10):
+            self.assertEqual(self.request(leer_varillas, 1), (0, 1))
+
+    def test_replica_atrasada_vuelve_al_primario(self):
+        with mock.patch.object(ReplicaLagMonitor, '_measure', return_value=30.0):
+            self.assertEqual(self.request(leer_varillas, 1), (1, 0))
+
+    def test_replicacion_detenida_vuelve_al_primario(self):
+        with mock.patch.object(ReplicaLagMonitor, '_measure', return_value=None):
+            self.assertEqual(self.request(leer_varillas, 1), (1, 0))
+
+    def test_cache_local_desactiva_la_replica(self):
+        locmem = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+        with override_settings(CACHES=locmem):
+            self.assertEqual(self.request(leer_varillas, 1), (1, 0))
+
+
+class KeysetCursorTests(TestCase):
+    """Un cursor manipulado responde 404, no 500."""
+
+    def paginar(self, crudo):
+        cursor = base64.urlsafe_b64encode(json.dumps(crudo).encode()).decode()
+        request = Request(RequestFactory().get('/', {'cursor': cursor}))
+        return KeysetPagination().paginate_queryset(Varilla.objects.all(), request)
+
+    def test_cursores_malformados(self):
+        for crudo in ([0, {'created_at': 1, 'id': 2}], [0, 5], [0], [0, [None, 1]], [0, ['2025-01-01T00:00:00', 'x']]):
+            with self.subTest(crudo=crudo), self.assertRaises(NotFound):
+                self.paginar(crudo)
+
+    def test_cursor_valido(self):
+        self.assertEqual(self.paginar([0, ['2025-01-01T00:00:00', 1]]), [])